@@ -0,0 +1,67 @@
+# check_import_time.py
+"""Measure the import time of the headless core and enforce a budget.
+
+Each sample runs in a fresh interpreter so nothing is cached in sys.modules.
+Exits non-zero if the best sample exceeds the budget or if importing the core
+(or the GUI entry module) drags in any of the GUI-only dependencies.
+
+Usage: python check_import_time.py [--budget SECONDS] [--runs N]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+# Best-of-N wall time for `import chord_dht` in a fresh interpreter.
+IMPORT_BUDGET = 0.05
+
+HEAVY_MODULES = ('matplotlib', 'networkx', 'numpy', 'tkinter')
+
+_PROBE = """
+import sys, time, json
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure(module, runs=5):
+    """Return (best import time in seconds, heavy modules loaded) for module."""
+    best = None
+    heavy = []
+    for _ in range(runs):
+        probe = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+        out = subprocess.run([sys.executable, '-c', probe], check=True,
+                             capture_output=True, text=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        heavy = result['heavy']
+        if best is None or result['elapsed'] < best:
+            best = result['elapsed']
+    return best, heavy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget', type=float, default=IMPORT_BUDGET)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    ok = True
+    for module, budget in (('chord_dht', args.budget), ('chord_dht_gui', None)):
+        elapsed, heavy = measure(module, args.runs)
+        status = 'ok'
+        if heavy:
+            status = f"FAIL (imported {', '.join(heavy)})"
+            ok = False
+        elif budget is not None and elapsed > budget:
+            status = f"FAIL (budget {budget * 1000:.1f} ms)"
+            ok = False
+        print(f"import {module}: {elapsed * 1000:.1f} ms  {status}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
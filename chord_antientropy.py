@@ -0,0 +1,313 @@
+# chord_antientropy.py
+"""Merkle-tree anti-entropy: find and repair divergent replicas.
+
+Every node store is wrapped in a MerkleKeyStore that keeps a fixed-depth
+Merkle tree over the ring: leaf i covers the ring ids whose top `depth` bits
+are i, and each tree node holds the XOR of 64-bit digests of (key, version)
+for every key below it. XOR makes updates incremental: a write toggles the
+old and new digests into the depth + 1 tree nodes on its leaf's path, and
+nothing is rehashed.
+
+AntiEntropy walks the ring in the background. For each node it compares the
+tree with every replica peer over the node's primary range (predecessor,
+node], descending only into subtrees whose hashes differ, and at differing
+leaves ships just the keys whose digests differ, newest version winning. Sync
+cost therefore follows the number of differences, not the number of keys.
+
+Enable it by composing the store factory, e.g.
+DHT(m, storage=merkle_storage(m)) or merkle_storage(m, durable_storage(root)).
+"""
+
+import bisect
+import hashlib
+import logging
+from array import array
+
+from chord_storage import KeyStore, Versioned, version_of
+
+transfer_log = logging.getLogger('chord.transfer')
+
+MERKLE_DEPTH = 10  # Tree levels below the root; 2^depth leaves per node
+ANTI_ENTROPY_PERIOD = 5.0  # Seconds between background anti-entropy rounds
+ANTI_ENTROPY_NODES = 8  # Nodes whose ranges are synced per background round
+
+
+def digest(key, value):
+    """64-bit digest of a stored entry; replicas holding the same version agree."""
+    if isinstance(value, Versioned):
+        text = f"{key!r}\0{value.version}"
+    else:
+        text = f"{key!r}\0{value!r}"
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'big')
+
+
+class MerkleTree:
+    """XOR Merkle tree over an m-bit ring, stored as one array per level."""
+
+    def __init__(self, m, depth=MERKLE_DEPTH):
+        self.m = m
+        self.depth = min(depth, m)
+        self.shift = m - self.depth
+        self.levels = [array('Q', bytes(8 << d)) for d in range(self.depth + 1)]
+
+    def toggle(self, ring_id, value):
+        """Add or remove (they are the same for XOR) one entry digest."""
+        i = ring_id >> self.shift
+        for level in reversed(self.levels):
+            level[i] ^= value
+            i >>= 1
+
+    def hash(self, level, i):
+        return self.levels[level][i]
+
+    def bounds(self, level, i):
+        """Inclusive ring-id bounds [first, last] covered by tree node (level, i)."""
+        width = self.m - level
+        return i << width, ((i + 1) << width) - 1
+
+    @property
+    def root(self):
+        return self.levels[0][0]
+
+
+class MerkleKeyStore:
+    """A node store (KeyStore by default) that keeps a MerkleTree in step with its writes.
+
+    Reads are passed through unchanged; put, put_many, delete and pop_range
+    update the tree with the digests of the entries they replace and add.
+    """
+
+    def __init__(self, m, inner=None, depth=MERKLE_DEPTH):
+        self.inner = inner if inner is not None else KeyStore()
+        self.tree = MerkleTree(m, depth)
+        self.concurrent_reads = self.inner.concurrent_reads
+        # Data already on disk (a reopened durable store) goes into the tree once.
+        for key, value, ring_id in self.inner.range_items(0, 0):
+            self.tree.toggle(ring_id, digest(key, value))
+
+    def __len__(self):
+        return len(self.inner)
+
+    def __contains__(self, key):
+        return key in self.inner
+
+    def __iter__(self):
+        return iter(self.inner)
+
+    def __getitem__(self, key):
+        return self.inner[key]
+
+    def get(self, key, default=None):
+        return self.inner.get(key, default)
+
+    def keys(self):
+        return self.inner.keys()
+
+    def items(self):
+        return self.inner.items()
+
+    def ring_id(self, key):
+        return self.inner.ring_id(key)
+
+    def range_items(self, start, end):
+        return self.inner.range_items(start, end)
+
+    def range_chunk(self, start, end, after=None, limit=1000):
+        return self.inner.range_chunk(start, end, after, limit)
+
+    def count_range(self, start, end):
+        return self.inner.count_range(start, end)
+
+    def _forget(self, key):
+        old = self.inner.get(key)
+        if old is not None:
+            self.tree.toggle(self.inner.ring_id(key), digest(key, old))
+
+    def put(self, key, value, ring_id):
+        self._forget(key)
+        self.inner.put(key, value, ring_id)
+        self.tree.toggle(ring_id, digest(key, value))
+
+    def put_many(self, entries):
+        entries = list(entries)
+        latest = {}  # key -> (value, ring_id), for keys repeated within the batch
+        toggles = []
+        for key, value, ring_id in entries:
+            if key in latest:
+                old, old_id = latest[key]
+            else:
+                old, old_id = self.inner.get(key), self.inner.ring_id(key)
+            if old is not None:
+                toggles.append((old_id, digest(key, old)))
+            toggles.append((ring_id, digest(key, value)))
+            latest[key] = (value, ring_id)
+        self.inner.put_many(entries)
+        for ring_id, value in toggles:
+            self.tree.toggle(ring_id, value)
+
+    def delete(self, key):
+        self._forget(key)
+        return self.inner.delete(key)
+
+    def pop_range(self, start, end):
+        popped = self.inner.pop_range(start, end)
+        for key, value, ring_id in popped:
+            self.tree.toggle(ring_id, digest(key, value))
+        return popped
+
+    def close(self):
+        self.inner.close()
+
+
+def merkle_storage(m, inner=None, depth=MERKLE_DEPTH):
+    """Return a DHT storage factory whose stores keep a Merkle tree.
+
+    `inner` is another storage factory (e.g. chord_storage.durable_storage)
+    to wrap; None wraps in-memory KeyStores. `m` must match the DHT's.
+    """
+    def factory(node_id, key_id):
+        return MerkleKeyStore(m, inner(node_id, key_id) if inner else None, depth)
+    return factory
+
+
+def _pieces(start, end, m):
+    """Split the ring interval (start, end] into inclusive [first, last] id ranges."""
+    top = (1 << m) - 1
+    if start == end:
+        return [(0, top)]
+    if start < end:
+        return [(start + 1, end)]
+    pieces = [(0, end)]
+    if start < top:
+        pieces.append((start + 1, top))
+    return pieces
+
+
+class AntiEntropy:
+    """Background task that syncs each node's primary range with its replicas.
+
+    It is registered with the DHT's scheduler like a node (start()), or
+    driven by hand with run_round(). Every node's store must be a
+    MerkleKeyStore; see merkle_storage().
+    """
+
+    id = 'anti-entropy'
+
+    def __init__(self, dht, nodes_per_round=ANTI_ENTROPY_NODES):
+        self.dht = dht
+        self.nodes_per_round = nodes_per_round
+        self.alive = False
+        self._next = 0  # Ring index where the next background round resumes
+        r = dht.metrics.registry
+        self.rounds = r.counter('chord_anti_entropy_syncs_total', "Replica pairs compared by anti-entropy.")
+        self.compared = r.counter('chord_merkle_nodes_compared_total', "Merkle tree nodes compared.")
+        self.repaired = r.counter('chord_anti_entropy_keys_repaired_total', "Keys shipped to repair a replica.")
+
+    def start(self, period=ANTI_ENTROPY_PERIOD):
+        self.alive = True
+        self.dht.scheduler.register(self, period)
+
+    def stop(self):
+        self.alive = False
+        self.dht.scheduler.unregister(self)
+
+    def maintain(self):
+        """One background round: sync the next nodes_per_round nodes in ring order."""
+        nodes = self.dht.membership.nodes
+        for _ in range(min(self.nodes_per_round, len(nodes))):
+            self._next %= len(nodes)
+            node = nodes[self._next]
+            self._next += 1
+            if node.alive:
+                self.sync_node(node)
+
+    def run_round(self):
+        """Sync every node once; returns {'compared': tree nodes, 'repaired': keys}."""
+        totals = {'compared': 0, 'repaired': 0}
+        for node in self.dht.membership.nodes:
+            if node.alive:
+                for name, count in self.sync_node(node).items():
+                    totals[name] += count
+        return totals
+
+    def sync_node(self, node):
+        """Sync node's primary range (predecessor, node] with its replica peers."""
+        snapshot = self.dht.membership
+        i = bisect.bisect_left(snapshot.ids, node.id)
+        if i == len(snapshot.ids) or snapshot.ids[i] != node.id:
+            return {'compared': 0, 'repaired': 0}
+        start = snapshot.ids[i - 1]
+        peers = self.dht._replica_set(node, min(self.dht.r, len(snapshot)))[1:]
+        totals = {'compared': 0, 'repaired': 0}
+        # A newer version pulled from a later peer has to reach the earlier
+        # ones too, so any repair triggers a second pass.
+        for _ in range(2):
+            repaired_before = totals['repaired']
+            for peer in peers:
+                compared, repaired = self.sync_pair(node, peer, start, node.id)
+                totals['compared'] += compared
+                totals['repaired'] += repaired
+            if totals['repaired'] == repaired_before or len(peers) < 2:
+                break
+        return totals
+
+    def sync_pair(self, a, b, start, end):
+        """Make a and b agree on the keys in (start, end]; returns (tree nodes compared, keys shipped).
+
+        Subtrees with equal hashes are skipped; a subtree that only partly
+        overlaps the range can differ because of keys outside it, so it is
+        descended into and filtered at the leaves.
+        """
+        ta, tb = a.data.tree, b.data.tree
+        if ta.m != self.dht.m or tb.m != self.dht.m:
+            raise ValueError("Merkle trees were built for a different identifier size.")
+        pieces = _pieces(start, end, ta.m)
+        compared = 0
+        repaired = 0
+        stack = [(0, 0)]
+        while stack:
+            level, i = stack.pop()
+            first, last = ta.bounds(level, i)
+            if not any(lo <= last and first <= hi for lo, hi in pieces):
+                continue
+            compared += 1
+            if ta.hash(level, i) == tb.hash(level, i):
+                continue
+            if level < ta.depth:
+                stack.append((level + 1, 2 * i + 1))
+                stack.append((level + 1, 2 * i))
+                continue
+            for lo, hi in pieces:
+                lo, hi = max(lo, first), min(hi, last)
+                if lo <= hi:
+                    repaired += self._sync_leaf(a, b, lo - 1, hi)
+        self.rounds.inc()
+        self.compared.inc(compared)
+        self.repaired.inc(repaired)
+        if repaired:
+            transfer_log.info("Anti-entropy: Nodes %s and %s exchanged %d keys in (%s, %s].",
+                              a.id, b.id, repaired, start, end)
+        return compared, repaired
+
+    def _sync_leaf(self, a, b, start, end):
+        """Exchange the differing entries of one leaf range; a wins unversioned conflicts."""
+        with a.lock:
+            ours = {key: (value, ring_id) for key, value, ring_id in a.data.range_items(start, end)}
+        with b.lock:
+            theirs = {key: (value, ring_id) for key, value, ring_id in b.data.range_items(start, end)}
+        to_b = []
+        to_a = []
+        for key, (value, ring_id) in ours.items():
+            other = theirs.get(key)
+            if other is None or (digest(key, value) != digest(key, other[0])
+                                 and version_of(value) >= version_of(other[0])):
+                to_b.append((key, value, ring_id))
+        for key, (value, ring_id) in theirs.items():
+            mine = ours.get(key)
+            if mine is None or version_of(value) > version_of(mine[0]):
+                to_a.append((key, value, ring_id))
+        if to_b:
+            b.store_many(to_b)
+        if to_a:
+            a.store_many(to_a)
+        return len(to_a) + len(to_b)
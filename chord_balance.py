@@ -0,0 +1,245 @@
+# chord_balance.py
+"""Load reports and a rebalancer for hosts that own several virtual nodes.
+
+A host added with DHT.add_host() owns several ring positions (Node objects
+tagged with node.host). Its load is measured per position as the keys it owns,
+i.e. those in (predecessor, position], and the client requests routed to it
+(node.requests), and is summed per host and divided by the host's weight
+(capacity). The imbalance of a metric is the most loaded host's share over the
+fair share, plus the coefficient of variation across hosts.
+
+Rebalancer.rebalance() repeatedly takes the most and least loaded hosts and
+either reassigns one of the heavy host's positions to the light host or, when
+no whole position fits the gap, adds a position for the light host inside the
+heavy host's busiest range so it takes over just the excess keys. Replicas
+still follow ring positions, so with virtual nodes two replicas of a key may
+sit on the same host.
+
+Usage: python chord_balance.py [--hosts N] [--vnodes V] [--keys K] [--seed N]
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import sys
+
+from chord_dht import DHT
+
+dht_log = logging.getLogger('chord.dht')
+
+BALANCE_M = 32  # Identifier bits for the demo ring
+KEY_WEIGHT = 0.5  # Weight of owned keys (vs. requests) in a position's load
+TOLERANCE = 0.05  # Stop once the heaviest host is within this fraction of the fair share
+MAX_MOVES = 64  # Moves allowed per rebalance() call
+
+
+def _owned_keys(dht):
+    """Return {node: [ring ids of the keys it owns]} in ring order, from the membership snapshot."""
+    snapshot = dht.membership
+    owned = {}
+    for i, node in enumerate(snapshot.nodes):
+        with node.lock:
+            entries = node.data.range_items(snapshot.ids[i - 1], node.id)
+        owned[node] = [ring_id for _, _, ring_id in entries]
+    return owned
+
+
+def _imbalance(values, weights):
+    """max/fair share and coefficient of variation of per-weight load."""
+    total = sum(values)
+    fair = total / sum(weights) if weights else 0.0
+    if not fair:
+        return {'max_over_fair': 1.0, 'cv': 0.0}
+    per = [v / w / fair for v, w in zip(values, weights)]
+    mean = sum(per) / len(per)
+    return {
+        'max_over_fair': max(per),
+        'cv': math.sqrt(sum((p - mean) ** 2 for p in per) / len(per)) / mean,
+    }
+
+
+def load_report(dht, baseline=None):
+    """Per-host key and request totals with their imbalance.
+
+    `baseline` maps node id -> requests already counted, so a report can
+    cover only the requests since then (see Rebalancer).
+    """
+    baseline = baseline or {}
+    owned = _owned_keys(dht)
+    hosts = []
+    for host, nodes in sorted(dht.host_nodes().items(), key=lambda e: str(e[0])):
+        hosts.append({
+            'host': host,
+            'weight': dht.host_weight(host),
+            'vnodes': len(nodes),
+            'keys': sum(len(owned[n]) for n in nodes),
+            'requests': sum(n.requests - baseline.get(n.id, 0) for n in nodes),
+        })
+    weights = [h['weight'] for h in hosts]
+    return {
+        'hosts': hosts,
+        'keys': _imbalance([h['keys'] for h in hosts], weights),
+        'requests': _imbalance([h['requests'] for h in hosts], weights),
+    }
+
+
+class Rebalancer:
+    """Moves virtual positions between hosts until their weighted load is even.
+
+    A position's load blends its share of all owned keys and its share of the
+    requests seen since the previous rebalance(), weighted by key_weight.
+    """
+
+    def __init__(self, dht, key_weight=KEY_WEIGHT, tolerance=TOLERANCE):
+        self.dht = dht
+        self.key_weight = key_weight
+        self.tolerance = tolerance
+        self.baseline = {}  # node id -> requests at the last rebalance
+
+    def _loads(self, owned):
+        keys_total = sum(len(ids) for ids in owned.values()) or 1
+        requests = {n: n.requests - self.baseline.get(n.id, 0) for n in owned}
+        requests_total = sum(requests.values()) or 1
+        kw = self.key_weight
+        return {n: kw * len(owned[n]) / keys_total + (1 - kw) * requests[n] / requests_total
+                for n in owned}, requests
+
+    def rebalance(self, max_moves=MAX_MOVES):
+        """Even out host load; returns the list of moves made."""
+        dht = self.dht
+        owned = _owned_keys(dht)
+        loads, requests = self._loads(owned)
+        hosts = {}
+        for node in owned:
+            hosts.setdefault(node.host, []).append(node)
+        if len(hosts) < 2:
+            return []
+        weight = {h: dht.host_weight(h) for h in hosts}
+        fair = sum(loads.values()) / sum(weight.values())
+        moves = []
+        while len(moves) < max_moves:
+            host_load = {h: sum(loads[n] for n in nodes) / weight[h] for h, nodes in hosts.items()}
+            heavy = max(host_load, key=host_load.get)
+            light = min(host_load, key=host_load.get)
+            high, low = host_load[heavy], host_load[light]
+            if high <= fair * (1 + self.tolerance):
+                break
+            wh, wl = weight[heavy], weight[light]
+            # Raw load to move so both hosts end up at the same per-weight load.
+            gap = (high - low) * wh * wl / (wh + wl)
+
+            candidates = hosts[heavy] if len(hosts[heavy]) > 1 else []
+            whole = min(candidates, key=lambda n: abs(loads[n] - gap), default=None)
+            whole_peak = max(high - loads[whole] / wh, low + loads[whole] / wl) if whole else high
+            busiest = max(hosts[heavy], key=loads.get)
+            split = min(gap, loads[busiest])
+            split_peak = max(high - split / wh, low + split / wl)
+
+            if whole and whole_peak <= split_peak:
+                whole.host = light
+                hosts[heavy].remove(whole)
+                hosts[light].append(whole)
+                dht.metrics.keys_transferred('rebalance', len(whole.data))
+                moves.append({'kind': 'reassign', 'node': whole.id, 'from': heavy, 'to': light,
+                              'keys': len(owned[whole])})
+            else:
+                node = self._split(busiest, split, light, owned, loads, requests)
+                if node is None:
+                    break
+                hosts[light].append(node)
+                moves.append({'kind': 'split', 'node': node.id, 'from': heavy, 'to': light,
+                              'keys': len(owned[node])})
+        self.baseline = {n.id: n.requests for n in dht.membership.nodes}
+        if moves:
+            dht_log.info("DHT: Rebalanced with %d virtual node moves.", len(moves))
+        return moves
+
+    def _split(self, node, amount, host, owned, loads, requests):
+        """Add a position for `host` that takes about `amount` load from the start of node's range."""
+        ids = owned[node]
+        if len(ids) < 2 or not loads[node]:
+            return None
+        # Keys are owned in ring order, so the first ones are what a new
+        # position just before them would take over.
+        take = min(len(ids) - 1, max(1, round(len(ids) * amount / loads[node])))
+        new_id = ids[take - 1]
+        if new_id == node.id or new_id in self.dht.membership:
+            return None
+        new = self.dht.add_node(new_id, host=host)
+        fraction = take / len(ids)
+        owned[new], owned[node] = ids[:take], ids[take:]
+        loads[new], loads[node] = loads[node] * fraction, loads[node] * (1 - fraction)
+        requests[new] = round(requests[node] * fraction)
+        requests[node] -= requests[new]
+        return new
+
+
+def demo(hosts, vnodes, keys, requests, moves, seed=1, m=BALANCE_M):
+    """Report imbalance with one position per host, with vnodes, and after rebalancing."""
+    report = {'hosts': hosts, 'vnodes': vnodes, 'keys': keys, 'requests': requests}
+    rng = random.Random(seed)
+    names = [f"key-{i}" for i in range(keys)]
+    # Zipf-like request popularity, so request load is skewed even when keys are not.
+    cumulative = []
+    total = 0.0
+    for i in range(keys):
+        total += 1.0 / (i + 1)
+        cumulative.append(total)
+    stream = rng.choices(names, cum_weights=cumulative, k=requests)
+
+    def run(positions):
+        dht = DHT(m=m, vnodes=positions)
+        try:
+            for h in range(hosts):
+                dht.add_host(weight=2.0 if h % 4 == 0 else 1.0)
+            dht.multi_store({k: i for i, k in enumerate(names)})
+            for n in dht.membership.nodes:
+                n.requests = 0  # Count reads only
+            dht.multi_get(stream)
+            before = load_report(dht)
+            if not moves:
+                return {'before': before}
+            made = Rebalancer(dht).rebalance(moves)
+            # Replay the same requests against the new placement.
+            baseline = {n.id: n.requests for n in dht.membership.nodes}
+            dht.multi_get(stream)
+            after = load_report(dht, baseline)
+            return {'before': before, 'moves': len(made), 'after': after}
+        finally:
+            dht.shutdown()
+
+    def summary(result):
+        # Per-host rows are left out; the imbalance figures are what runs are compared on.
+        return {k: ({'keys': v['keys'], 'requests': v['requests']} if isinstance(v, dict) else v)
+                for k, v in result.items()}
+
+    report['single_position'] = summary(run(1))
+    report['virtual_nodes'] = summary(run(vnodes))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Virtual node load imbalance report.")
+    parser.add_argument('--hosts', type=int, default=32)
+    parser.add_argument('--vnodes', type=int, default=8, help="virtual positions per unit of host weight")
+    parser.add_argument('--keys', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=100000)
+    parser.add_argument('--moves', type=int, default=MAX_MOVES, help="rebalancer moves allowed")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    random.seed(args.seed)  # DHT picks node ids and entry nodes from the module RNG
+    report = demo(args.hosts, args.vnodes, args.keys, args.requests, args.moves, args.seed)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+# chord_bench.py
+"""Headless benchmark suite for the Chord DHT.
+
+Measures lookup hops and latency against ring size, store/retrieve throughput
+at several replication factors, join/leave cost including key transfer, and
+the number of maintenance rounds needed to re-converge after churn. Results are
+written as JSON so runs can be compared across versions.
+
+Usage: python chord_bench.py [--quick] [--seed N] [--output FILE]
+"""
+
+import argparse
+import bisect
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from chord_dht import DHT
+from chord_metrics import percentile
+from chord_scheduler import ManualScheduler
+
+try:
+    from chord_oracle import RingOracle
+except ImportError:  # numpy is not installed
+    RingOracle = None
+
+BENCH_M = 32  # Identifier bits used by the benchmarks; large enough to avoid collisions
+
+FULL = {
+    'ring_sizes': [16, 64, 256, 1024],
+    'lookups': 2000,
+    'replication_factors': [1, 2, 3, 5],
+    'storage_nodes': 64,
+    'storage_keys': 5000,
+    'churn_nodes': 128,
+    'churn_keys': 5000,
+    'churn_events': 16,
+    'max_rounds': 200,
+}
+
+QUICK = {
+    'ring_sizes': [16, 64],
+    'lookups': 300,
+    'replication_factors': [1, 3],
+    'storage_nodes': 16,
+    'storage_keys': 500,
+    'churn_nodes': 32,
+    'churn_keys': 500,
+    'churn_events': 4,
+    'max_rounds': 100,
+}
+
+
+def _summary(values):
+    return {
+        'mean': sum(values) / len(values) if values else 0.0,
+        'p50': percentile(values, 0.50),
+        'p99': percentile(values, 0.99),
+        'max': max(values) if values else 0.0,
+    }
+
+
+def build_ring(n, m=BENCH_M, r=3, cache_size=0):
+    """Return (dht, scheduler) with n bootstrapped nodes, stepped by hand."""
+    scheduler = ManualScheduler()
+    dht = DHT(m=m, r=r, scheduler=scheduler, cache_size=cache_size)
+    dht.add_nodes(n)
+    return dht, scheduler
+
+
+def ring_errors(dht):
+    """Count successor, predecessor and finger pointers that differ from the ideal ring."""
+    if RingOracle is not None:
+        report = RingOracle.from_dht(dht).diff(dht, max_details=0)
+        return report['successor_errors'] + report['predecessor_errors'] + report['finger_errors']
+    # Without numpy: the same checks as RingOracle.diff, one node at a time.
+    ids = dht.get_ring()
+    size = 2 ** dht.m
+    errors = 0
+    for i, node_id in enumerate(ids):
+        node = dht.nodes[node_id]
+        errors += node.successor.id != ids[(i + 1) % len(ids)]
+        errors += node.predecessor is None or node.predecessor.id != ids[i - 1]
+        for j, finger in enumerate(node.finger):
+            start = (node_id + 2 ** j) % size
+            expected = ids[bisect.bisect_left(ids, start) % len(ids)]
+            errors += finger is None or not finger.alive or finger.id != expected
+    return errors
+
+
+def converge(dht, scheduler, max_rounds):
+    """Run maintenance rounds until the ring is ideal; return (rounds, seconds)."""
+    started = time.perf_counter()
+    rounds = 0
+    while ring_errors(dht) and rounds < max_rounds:
+        scheduler.run_round()
+        rounds += 1
+    return rounds, time.perf_counter() - started
+
+
+def bench_lookup(cfg, rng):
+    results = []
+    for n in cfg['ring_sizes']:
+        dht, scheduler = build_ring(n)
+        converge(dht, scheduler, cfg['max_rounds'])
+        nodes = list(dht.nodes.values())
+        hops, latency = [], []
+        for _ in range(cfg['lookups']):
+            start = rng.choice(nodes)
+            key_id = rng.randrange(2 ** dht.m)
+            t = time.perf_counter()
+            _, h = start.lookup(key_id)
+            latency.append((time.perf_counter() - t) * 1e6)
+            hops.append(h)
+        results.append({'nodes': n, 'hops': _summary(hops), 'latency_us': _summary(latency)})
+        dht.shutdown()
+    return results
+
+
+def bench_storage(cfg, rng):
+    results = []
+    keys = [f"key-{i}" for i in range(cfg['storage_keys'])]
+    for r in cfg['replication_factors']:
+        dht, scheduler = build_ring(cfg['storage_nodes'], r=r, cache_size=4096)
+        row = {'replication': r, 'keys': len(keys)}
+        t = time.perf_counter()
+        for k in keys:
+            dht.store(k, k)
+        row['store_ops_per_s'] = len(keys) / (time.perf_counter() - t)
+        t = time.perf_counter()
+        for k in keys:
+            dht.retrieve(k)
+        row['retrieve_ops_per_s'] = len(keys) / (time.perf_counter() - t)
+        t = time.perf_counter()
+        dht.multi_store({k: k for k in keys})
+        row['multi_store_keys_per_s'] = len(keys) / (time.perf_counter() - t)
+        t = time.perf_counter()
+        dht.multi_get(keys)
+        row['multi_get_keys_per_s'] = len(keys) / (time.perf_counter() - t)
+        row['routing_cache'] = dht.routing_stats()
+        results.append(row)
+        dht.shutdown()
+    return results
+
+
+def bench_membership(cfg, rng):
+    dht, scheduler = build_ring(cfg['churn_nodes'])
+    dht.multi_store({f"key-{i}": i for i in range(cfg['churn_keys'])})
+    joins, leaves = [], []
+    for _ in range(cfg['churn_events']):
+        t = time.perf_counter()
+        node = dht.add_node()
+        elapsed = time.perf_counter() - t
+        joins.append({'seconds': elapsed, 'keys_moved': len(node.data)})
+        victim = rng.choice([nid for nid in dht.nodes if nid != node.id])
+        keys_held = len(dht.nodes[victim].data)
+        t = time.perf_counter()
+        dht.remove_node(victim)
+        leaves.append({'seconds': time.perf_counter() - t, 'keys_moved': keys_held})
+    dht.shutdown()
+    return {
+        'nodes': cfg['churn_nodes'],
+        'keys': cfg['churn_keys'],
+        'join_seconds': _summary([j['seconds'] for j in joins]),
+        'join_keys_moved': _summary([j['keys_moved'] for j in joins]),
+        'leave_seconds': _summary([j['seconds'] for j in leaves]),
+        'leave_keys_moved': _summary([j['keys_moved'] for j in leaves]),
+    }
+
+
+def bench_convergence(cfg, rng):
+    dht, scheduler = build_ring(cfg['churn_nodes'])
+    converge(dht, scheduler, cfg['max_rounds'])
+    for _ in range(cfg['churn_events']):
+        dht.add_node()
+        dht.remove_node(rng.choice(list(dht.nodes)))
+    errors = ring_errors(dht)
+    rounds, seconds = converge(dht, scheduler, cfg['max_rounds'])
+    result = {
+        'nodes': len(dht.nodes),
+        'churn_events': cfg['churn_events'],
+        'errors_after_churn': errors,
+        'rounds_to_converge': rounds,
+        'seconds_to_converge': seconds,
+        'converged': ring_errors(dht) == 0,
+    }
+    dht.shutdown()
+    return result
+
+
+def bench_import():
+    from check_import_time import measure
+    elapsed, heavy = measure('chord_dht', runs=3)
+    return {'chord_dht_seconds': elapsed, 'heavy_modules': heavy}
+
+
+BENCHMARKS = {
+    'lookup': bench_lookup,
+    'storage': bench_storage,
+    'membership': bench_membership,
+    'convergence': bench_convergence,
+}
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(cfg, seed, only=None):
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'revision': _git_revision(),
+            'seed': seed,
+            'm': BENCH_M,
+            'config': cfg,
+        },
+        'import': bench_import(),
+    }
+    for name, bench in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        random.seed(seed)  # DHT picks node ids and entry nodes from the module RNG
+        rng = random.Random(seed)
+        t = time.perf_counter()
+        report[name] = bench(cfg, rng)
+        print(f"{name}: {time.perf_counter() - t:.2f} s", file=sys.stderr)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help="smaller sizes for a fast smoke run")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS))
+    parser.add_argument('--output', help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = run(QUICK if args.quick else FULL, args.seed, args.only)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# chord_codec.py
+"""Compact binary encoding for Chord RPC messages and stored values.
+
+Supports None, bool, int (any size, as zigzag varints so 160-bit ids stay
+small), float, str, bytes, list/tuple and dict. Every value is a one-byte tag
+followed by its payload; containers carry a varint element count.
+"""
+
+import struct
+
+_FLOAT = struct.Struct('>d')
+
+
+class CodecError(ValueError):
+    pass
+
+
+def _write_varint(out, n):
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise CodecError("Truncated varint.")
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7f) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _encode(obj, out):
+    if obj is None:
+        out.append(0x4e)  # N
+    elif obj is True:
+        out.append(0x54)  # T
+    elif obj is False:
+        out.append(0x46)  # F
+    elif isinstance(obj, int):
+        out.append(0x69)  # i
+        _write_varint(out, obj << 1 if obj >= 0 else ((-obj) << 1) - 1)
+    elif isinstance(obj, float):
+        out.append(0x66)  # f
+        out += _FLOAT.pack(obj)
+    elif isinstance(obj, str):
+        raw = obj.encode('utf-8')
+        out.append(0x73)  # s
+        _write_varint(out, len(raw))
+        out += raw
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        out.append(0x62)  # b
+        _write_varint(out, len(obj))
+        out += obj
+    elif isinstance(obj, (list, tuple)):
+        out.append(0x6c)  # l
+        _write_varint(out, len(obj))
+        for item in obj:
+            _encode(item, out)
+    elif isinstance(obj, dict):
+        out.append(0x64)  # d
+        _write_varint(out, len(obj))
+        for k, v in obj.items():
+            _encode(k, out)
+            _encode(v, out)
+    else:
+        raise CodecError(f"Cannot encode {type(obj).__name__}.")
+
+
+def _decode(data, pos):
+    if pos >= len(data):
+        raise CodecError("Truncated value.")
+    tag = data[pos]
+    pos += 1
+    if tag == 0x4e:
+        return None, pos
+    if tag == 0x54:
+        return True, pos
+    if tag == 0x46:
+        return False, pos
+    if tag == 0x69:
+        z, pos = _read_varint(data, pos)
+        return (z >> 1) if not z & 1 else -((z + 1) >> 1), pos
+    if tag == 0x66:
+        return _FLOAT.unpack_from(data, pos)[0], pos + 8
+    if tag in (0x73, 0x62):
+        n, pos = _read_varint(data, pos)
+        if pos + n > len(data):
+            raise CodecError("Truncated string.")
+        raw = bytes(data[pos:pos + n])
+        return (raw.decode('utf-8') if tag == 0x73 else raw), pos + n
+    if tag == 0x6c:
+        n, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(n):
+            item, pos = _decode(data, pos)
+            items.append(item)
+        return items, pos
+    if tag == 0x64:
+        n, pos = _read_varint(data, pos)
+        result = {}
+        for _ in range(n):
+            k, pos = _decode(data, pos)
+            v, pos = _decode(data, pos)
+            result[k] = v
+        return result, pos
+    raise CodecError(f"Unknown tag {tag:#x}.")
+
+
+def encode(obj):
+    """Encode obj to bytes."""
+    out = bytearray()
+    _encode(obj, out)
+    return bytes(out)
+
+
+def decode(data):
+    """Decode a value produced by encode(); tuples come back as lists."""
+    obj, pos = _decode(data, 0)
+    if pos != len(data):
+        raise CodecError("Trailing bytes after value.")
+    return obj
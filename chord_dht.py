@@ -0,0 +1,1114 @@
+# chord_dht.py
+"""Headless Chord DHT engine: protocol, storage and replication.
+
+This module has no third-party dependencies (it imports only the standard
+library and the other headless chord_* modules) so it can be used from batch
+jobs and test workers without a display. The Tk/matplotlib
+front end lives in chord_gui.py and is started through chord_dht_gui.py.
+"""
+
+import bisect
+import hashlib
+import threading
+import time
+import random
+import logging
+
+from chord_handoff import HANDOFF_CHUNK, HANDOFF_RATE, Handoff
+from chord_metrics import ChordMetrics, timed
+from chord_quorum import ALL, ONE, ReplicaBusy, ReplicaCoordinator, ReplicaUnavailable, required
+from chord_scheduler import ThreadPoolScheduler
+from chord_storage import KeyStore, Versioned, newer_entries, plain, version_of
+
+# Category loggers (see chord_logging.configure); messages use lazy %-formatting.
+node_log = logging.getLogger('chord.node')
+transfer_log = logging.getLogger('chord.transfer')
+key_log = logging.getLogger('chord.keys')
+dht_log = logging.getLogger('chord.dht')
+
+# Constants
+M = 5  # Default number of bits in the identifier space (0 to 31)
+MAX_M = 160  # Full SHA-1 identifier space
+R = 3 # Replication factor (Adjusted to 2 for reliability in small rings)
+FINGERS_PER_ROUND = 4  # Finger lookups allowed per node per maintenance round
+BATCH_SIZE = 10000  # Keys per batch for the streaming multi-key API
+ROUTING_CACHE_SIZE = 4096  # Maximum number of ranges in the DHT's routing cache
+VNODES = 8  # Default virtual ring positions per host added with add_host()
+
+
+def hash_key(key, m=M):
+    """Generate a hash for the given key and map it to an m-bit identifier space."""
+    return int(hashlib.sha1(key.encode()).hexdigest(), 16) % (2 ** m)
+
+
+def in_interval(start, end, id_, inclusive_start=False, inclusive_end=False):
+    """Check if id_ is in interval (start, end) on the ring of the DHT's m-bit identifiers."""
+    if start == end:
+        # The interval is the entire ring
+        return True
+    elif start < end:
+        if inclusive_start and inclusive_end:
+            return start <= id_ <= end
+        elif inclusive_start:
+            return start <= id_ < end
+        elif inclusive_end:
+            return start < id_ <= end
+        else:
+            return start < id_ < end
+    else:
+        # The interval wraps around
+        if inclusive_start and inclusive_end:
+            return id_ >= start or id_ <= end
+        elif inclusive_start:
+            return id_ >= start or id_ < end
+        elif inclusive_end:
+            return id_ > start or id_ <= end
+        else:
+            return id_ > start or id_ < end
+
+
+class Node:
+    def __init__(self, identifier, dht, host=None):
+        self.id = identifier
+        self.dht = dht
+        # Physical host this ring position (virtual node) belongs to; a plain node is its own host.
+        self.host = identifier if host is None else host
+        self.requests = 0  # Client keys routed here as owner; read by chord_balance
+        self.finger = [None] * dht.m
+        self.next_finger = 0  # Where the next incremental fix_fingers round resumes
+        self.successor = self
+        self.successor_list = []  # The next few nodes after successor, refreshed by stabilize
+        self.predecessor = None
+        self.data = dht.storage(identifier, dht.key_id) if dht.storage else KeyStore()
+        self.lock = dht.metrics.lock('node')
+        self.alive = True
+        self.incoming = []  # Handoffs streaming keys to this node (copy-on-write; see chord_handoff)
+        self.outgoing = []  # Handoffs streaming keys from this node (copy-on-write)
+
+    def maintain(self):
+        """Run one round of periodic maintenance; invoked by the DHT's scheduler."""
+        if not self.alive:
+            return
+        self.stabilize()
+        self.fix_fingers()
+        self.check_predecessor()
+
+    def find_successor(self, id_):
+        pred = self.find_predecessor(id_)
+        return pred.live_successor()
+
+    def live_successor(self):
+        """Return the first live node among successor and the successor list."""
+        if self.successor.alive:
+            return self.successor
+        for n in self.successor_list:
+            if n.alive:
+                return n
+        return self
+
+    def find_predecessor(self, id_):
+        return self.lookup(id_)[0]
+
+    def lookup(self, id_, path=None):
+        """Return (predecessor of id_, number of finger hops taken to reach it).
+
+        If a list is passed as `path`, every node visited after this one is
+        appended to it (the simulator charges a latency per hop).
+        """
+        n = self
+        hops = 0
+        while not in_interval(n.id, n.live_successor().id, id_, inclusive_end=True):
+            nxt = n.closest_preceding_finger(id_)
+            if nxt is n or nxt is self:
+                break  # No closer node is known (e.g. before stabilization); avoid looping
+            n = nxt
+            hops += 1
+            if path is not None:
+                path.append(n)
+        self.dht.metrics.lookup_hops.observe(hops)
+        return n, hops
+
+    def closest_preceding_finger(self, id_):
+        for i in reversed(range(self.dht.m)):
+            finger = self.finger[i]
+            if finger and finger.alive and in_interval(self.id, id_, finger.id):
+                return finger
+        # Fall back on the successor pointer, which leave() and join() update
+        # directly while fingers catch up in fix_fingers, and on the successor
+        # list so a dead first successor is routed around.
+        for n in (*reversed(self.successor_list), self.successor):
+            if n.alive and in_interval(self.id, id_, n.id):
+                return n
+        return self
+
+    def stabilize(self):
+        succ = self.live_successor()
+        if succ is not self.successor:
+            node_log.info("Node %s: Successor Node %s is dead, failing over to Node %s",
+                          self.id, self.successor.id, succ.id)
+            self.successor = succ
+            self.dht.bump_epoch()
+        x = self.successor.predecessor
+        if x and x.alive and in_interval(self.id, self.successor.id, x.id):
+            self.successor = x
+            self.dht.bump_epoch()
+            node_log.info("Node %s: Successor updated to Node %s", self.id, x.id)
+        self.successor.notify(self)
+        self.update_successor_list()
+
+    def update_successor_list(self):
+        """Rebuild the successor list from the successor's own list."""
+        if self.successor is self:
+            self.successor_list = []
+            return
+        size = self.dht.successor_list_size
+        new_list = [self.successor]
+        for n in self.successor.successor_list:
+            if len(new_list) >= size:
+                break
+            if n is self or n in new_list:
+                break  # Wrapped around a small ring
+            if n.alive:
+                new_list.append(n)
+        self.successor_list = new_list
+
+    def notify(self, n):
+        if (self.predecessor is None or not self.predecessor.alive
+                or in_interval(self.predecessor.id, self.id, n.id)):
+            self.predecessor = n
+            self.dht.bump_epoch()
+            node_log.info("Node %s: Predecessor updated to Node %s", self.id, n.id)
+            # Stream the new predecessor the keys in (self, n] that it now owns
+            # or replicates, then drop whatever falls outside our replica window.
+            if n is not self:
+                self.dht.handoff(self, n, self.id, n.id, 'notify').run()
+                self.trim()
+
+    def fix_fingers(self, max_lookups=None):
+        """Incrementally repair the finger table.
+
+        Fingers whose start lies before the successor are set to it in one
+        step. The others are checked round-robin starting where the previous
+        round stopped; one is kept without a lookup if its start still falls in
+        (finger.predecessor, finger], i.e. its interval has not changed, or if
+        the previous finger covers it. At most `max_lookups` full
+        find_successor lookups are made per round, so upkeep stays bounded
+        even for m = 160.
+        """
+        m = self.dht.m
+        space = 1 << m
+        if max_lookups is None:
+            max_lookups = self.dht.fingers_per_round
+        lookups = 0
+        changed = False
+        finger = self.finger
+        succ = self.live_successor()
+        # finger[i] starts 2^i past this node, so exactly the first
+        # gap.bit_length() fingers fall in (self, succ].
+        gap = (succ.id - self.id) % space or space
+        local = min(m, gap.bit_length())
+        if finger[:local] != [succ] * local:
+            finger[:local] = [succ] * local
+            changed = True
+        resume = max(self.next_finger, local)
+        for i in (*range(resume, m), *range(local, resume)):
+            if lookups >= max_lookups:
+                self.next_finger = i
+                break
+            start = (self.id + (1 << i)) % space
+            for candidate in (finger[i], finger[i - 1]):
+                if not (candidate and candidate.alive and candidate.predecessor):
+                    continue
+                # in_interval(candidate.predecessor.id, candidate.id, start, inclusive_end=True)
+                low = candidate.predecessor.id
+                width = (candidate.id - low) % space
+                if not width or 0 < (start - low) % space <= width:
+                    new = candidate
+                    break
+            else:
+                new = self.find_successor(start)
+                lookups += 1
+                node_log.debug("Node %s: Finger[%d] set to Node %s", self.id, i, new.id)
+            if finger[i] is not new:
+                finger[i] = new
+                changed = True
+        if changed:
+            self.dht.bump_version()
+
+    def check_predecessor(self):
+        if self.predecessor and not self.predecessor.alive:
+            node_log.info("Node %s: Predecessor Node %s is dead.", self.id, self.predecessor.id)
+            self.predecessor = None
+            self.dht.bump_epoch()
+
+    def join(self, known_node):
+        if known_node:
+            self.init_finger_table(known_node)
+            # Serve our new range from the successor until its keys have arrived.
+            handoff = None
+            if self.successor is not self:
+                handoff = self.dht.handoff(self.successor, self, self.successor.id, self.id, 'move_keys')
+                handoff.begin()
+            # Splice us in on the predecessor's side too, rather than waiting for
+            # stabilize: an interleaved leave or join would otherwise rewire
+            # pointers around a node its neighbours do not know about yet.
+            pred = self.predecessor
+            if pred and pred is not self and in_interval(pred.id, pred.successor.id, self.id):
+                pred.successor = self
+                node_log.info("Node %s: Updated Node %s's successor to Node %s", self.id, pred.id, self.id)
+            self.update_successor_list()
+            self.update_others()
+            # Left open until the DHT publishes us, so writes routed to the
+            # successor in the meantime are still mirrored here.
+            return self.move_keys(handoff, commit=False)
+        else:
+            for i in range(self.dht.m):
+                self.finger[i] = self
+            self.successor = self
+            self.predecessor = self
+            node_log.info("Node %s: Joined as the only node in the DHT.", self.id)
+
+    def init_finger_table(self, known_node):
+        m = self.dht.m
+        self.finger[0] = known_node.find_successor((self.id + 1) % (2 ** m))
+        self.successor = self.finger[0]
+        self.predecessor = self.successor.predecessor
+        if self.successor.predecessor and self.successor.predecessor != self:
+            self.successor.predecessor = self
+            node_log.info("Node %s: Updated Node %s's predecessor to Node %s", self.id, self.successor.id, self.id)
+        node_log.info("Node %s: Initialized finger[0] to Node %s", self.id, self.finger[0].id)
+        for i in range(m - 1):
+            start = (self.id + 2 ** (i + 1)) % (2 ** m)
+            if in_interval(self.id, self.finger[i].id, start, inclusive_start=True):
+                self.finger[i + 1] = self.finger[i]
+            else:
+                self.finger[i + 1] = known_node.find_successor(start)
+            node_log.debug("Node %s: Initialized finger[%d] to Node %s", self.id, i + 1, self.finger[i + 1].id)
+
+    def update_others(self):
+        m = self.dht.m
+        for i in range(m):
+            pred_id = (self.id - 2 ** i) % (2 ** m)
+            p = self.find_predecessor(pred_id)
+            if p != self:
+                p.update_finger_table(self, i)
+
+    def update_finger_table(self, s, i):
+        if in_interval(self.id, self.finger[i].id, s.id, inclusive_end=True):
+            self.finger[i] = s
+            if i == 0:
+                # finger[0] is the successor in the Chord paper; keep them in step.
+                self.successor = s
+            node_log.debug("Node %s: Finger[%d] updated to Node %s", self.id, i, s.id)
+            p = self.predecessor
+            if p and p != self:
+                p.update_finger_table(s, i)
+
+    def move_keys(self, handoff=None, commit=True):
+        # The successor holds every key we now own or replicate: those outside
+        # (self, successor]. It keeps a copy of what is still in its own window.
+        # With commit False the handoff is returned still open; the caller commits it.
+        succ = self.successor
+        if succ is self:
+            if handoff:
+                handoff.commit()
+            return None
+        if handoff is None or handoff.source is not succ:
+            if handoff:
+                handoff.commit()
+            handoff = self.dht.handoff(succ, self, succ.id, self.id, 'move_keys')
+        handoff.run(commit=commit)
+        # Every successor inside our replica window now sees one more node
+        # before it, so the oldest range it replicated falls out of its window.
+        # Walk successor pointers: the successor list may still name nodes
+        # that have left since the last stabilize.
+        n = succ
+        for _ in range(self.dht.r):
+            if n is self:
+                break
+            n.trim()
+            n = n.live_successor()
+        return None if commit else handoff
+
+    def replica_window_start(self):
+        """Return the id x such that this node should hold exactly the keys in (x, self].
+
+        That is the R-th predecessor; if the ring has R nodes or fewer the window
+        is the whole ring and self.id is returned.
+        """
+        n = self
+        for _ in range(self.dht.r):
+            n = n.predecessor
+            if n is None or n is self:
+                return self.id
+        return n.id
+
+    def trim(self):
+        """Drop keys that fall outside this node's replica window."""
+        start = self.replica_window_start()
+        if start == self.id:
+            return
+        with self.lock:
+            dropped = self.data.pop_range(self.id, start)
+        if dropped:
+            transfer_log.info("Node %s: Dropped %d keys outside its replica window", self.id, len(dropped))
+
+    def store(self, key, value, ring_id=None, forward=True):
+        """Store a value; a Versioned value older than the one held is ignored.
+
+        While a handoff to or from this node is running, a write in its range
+        is also applied on the other side unless `forward` is False.
+        """
+        if ring_id is None:
+            ring_id = hash_key(key, self.dht.m)
+        with self.lock:
+            if isinstance(value, Versioned) and version_of(self.data.get(key)) > value.version:
+                return
+            self.data.put(key, value, ring_id)
+        if forward:
+            for handoff in self.incoming:
+                if handoff.source.alive and handoff.covers(ring_id):
+                    handoff.source.store(key, value, ring_id, forward=False)
+            for handoff in self.outgoing:
+                if handoff.covers(ring_id):
+                    handoff.target.store(key, value, ring_id, forward=False)
+        key_log.info("Node %s: Stored key '%s' with value '%s'", self.id, key, value)
+
+    def store_many(self, entries, forward=True):
+        """Store (key, value, ring_id) triples under a single lock acquisition.
+
+        As with store(), entries older than the version already held are skipped,
+        so key transfers never roll back a newer write; a key repeated within the
+        batch ends up as if the entries were stored one by one. While a handoff to
+        or from this node is running, entries in its range are also written on
+        the other side unless `forward` is False (the handoff's own chunks).
+        """
+        entries = list(entries)
+        with self.lock:
+            self.data.put_many(newer_entries(self.data, entries))
+        if forward:
+            for handoff in self.incoming:
+                if handoff.source.alive:
+                    covered = [e for e in entries if handoff.covers(e[2])]
+                    if covered:
+                        handoff.source.store_many(covered, forward=False)
+            for handoff in self.outgoing:
+                covered = [e for e in entries if handoff.covers(e[2])]
+                if covered:
+                    handoff.target.store_many(covered, forward=False)
+
+    def _forwarded(self, key):
+        """Read a key that is not here yet from the source of a running handoff."""
+        incoming = self.incoming
+        if not incoming:
+            return None
+        ring_id = hash_key(key, self.dht.m)
+        for handoff in incoming:
+            if handoff.covers(ring_id):
+                stored = handoff.fetch(key)
+                if stored is not None:
+                    return stored
+        return None
+
+    def read(self, key, blocking=True):
+        """Return the stored value with its version, for consistency-level reads.
+
+        Stores that allow concurrent readers are read without the node lock.
+        Raises ReplicaUnavailable if the node is down, and ReplicaBusy if
+        blocking is False and the node's lock is held.
+        """
+        if not self.alive:
+            raise ReplicaUnavailable(f"Node {self.id} is down.")
+        data = self.data
+        if data.concurrent_reads:
+            stored = data.get(key, None)
+        else:
+            if not self.lock.acquire(blocking):
+                raise ReplicaBusy(f"Node {self.id} is busy.")
+            try:
+                stored = data.get(key, None)
+            finally:
+                self.lock.release()
+        return stored if stored is not None else self._forwarded(key)
+
+    def retrieve(self, key):
+        data = self.data
+        if data.concurrent_reads:
+            stored = data.get(key, None)
+        else:
+            with self.lock:
+                stored = data.get(key, None)
+        return plain(stored if stored is not None else self._forwarded(key))
+
+    def retrieve_many(self, keys):
+        """Return {key: value} for the given keys that this node holds."""
+        data = self.data
+        if data.concurrent_reads:
+            found = self._collect(data, keys)
+        else:
+            with self.lock:
+                found = self._collect(data, keys)
+        if self.incoming:
+            for k in keys:
+                if k not in found:
+                    stored = self._forwarded(k)
+                    if stored is not None:
+                        found[k] = plain(stored)
+        return found
+
+    @staticmethod
+    def _collect(data, keys):
+        # One get per key, so a concurrent delete cannot fail the read halfway.
+        found = {}
+        for k in keys:
+            stored = data.get(k, None)
+            if stored is not None:
+                found[k] = plain(stored)
+        return found
+
+    def leave(self):
+        # Register the handoff first so the successor forwards reads to us
+        # (now marked down) until all of our keys have been streamed to it.
+        handoff = None
+        if self.successor is not self:
+            handoff = self.dht.handoff(self, self.successor, self.id, self.id, 'leave')
+            handoff.begin()
+        self.alive = False
+        if handoff:
+            handoff.run()
+        # Update predecessor and successor, unless a join in between already
+        # pointed them at a node other than us.
+        if self.predecessor and self.predecessor != self and self.predecessor.successor is self:
+            self.predecessor.successor = self.successor
+            node_log.info("Node %s: Updated predecessor Node %s's successor to Node %s", self.id, self.predecessor.id, self.successor.id)
+        if self.successor and self.successor != self:
+            if self.successor.predecessor is self:
+                self.successor.predecessor = self.predecessor
+                node_log.info("Node %s: Updated successor Node %s's predecessor to Node %s", self.id, self.successor.id, self.predecessor.id)
+            self.successor.trim()
+            self.extend_replicas()
+
+    def extend_replicas(self):
+        """After leaving, copy each range we replicated to the node that now joins its replica set.
+
+        The range owned by our j-th predecessor (j = 0 is ours) was held by
+        R consecutive nodes, the last one R - 1 - j places after us; with us
+        gone, the successor R - j places after us takes our place in that set.
+        """
+        r = self.dht.r
+        bounds = [self.id]  # our id, then those of our R predecessors
+        n = self
+        for _ in range(r):
+            n = n.predecessor
+            if n is None or n is self:
+                return  # Ring of R nodes or fewer: every node already holds every key
+            bounds.append(n.id)
+        # Walk successor pointers rather than our successor list, which can
+        # still name nodes that left before us.
+        succs = [self.successor]
+        while len(succs) < r:
+            succs.append(succs[-1].live_successor())
+        for i, succ in enumerate(succs[1:], 2):
+            with self.lock:
+                entries = self.data.range_items(bounds[r - i + 1], bounds[r - i])
+            if entries:
+                succ.store_many(entries)
+                self.dht.metrics.keys_transferred('leave', len(entries))
+
+
+class Membership:
+    """Immutable snapshot of the ring: node ids in ring order and the nodes themselves.
+
+    The DHT builds a new snapshot (copy-on-write) under its lock whenever a
+    node is added, removed or fails and publishes it with a single attribute
+    assignment, so readers take `dht.membership` once and use it without
+    locking. `version` increases with every published snapshot.
+    """
+
+    __slots__ = ('version', 'ids', 'nodes')
+
+    def __init__(self, version=0, ids=(), nodes=()):
+        self.version = version
+        self.ids = ids  # sorted tuple of node ids
+        self.nodes = nodes  # tuple of nodes, aligned with ids
+
+    @classmethod
+    def of(cls, nodes, version=0):
+        ring = sorted(nodes, key=lambda n: n.id)
+        return cls(version, tuple(n.id for n in ring), tuple(ring))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, node_id):
+        return self.get(node_id) is not None
+
+    def get(self, node_id):
+        i = bisect.bisect_left(self.ids, node_id)
+        if i < len(self.ids) and self.ids[i] == node_id:
+            return self.nodes[i]
+        return None
+
+    def random_node(self, rng=random):
+        return self.nodes[rng.randrange(len(self.nodes))]
+
+    def with_node(self, node):
+        """Return a new snapshot that also contains `node`."""
+        i = bisect.bisect_left(self.ids, node.id)
+        return Membership(self.version + 1,
+                          self.ids[:i] + (node.id,) + self.ids[i:],
+                          self.nodes[:i] + (node,) + self.nodes[i:])
+
+    def without(self, node_id):
+        """Return a new snapshot without `node_id`."""
+        i = bisect.bisect_left(self.ids, node_id)
+        if i == len(self.ids) or self.ids[i] != node_id:
+            return self
+        return Membership(self.version + 1,
+                          self.ids[:i] + self.ids[i + 1:],
+                          self.nodes[:i] + self.nodes[i + 1:])
+
+
+class RoutingCache:
+    """Client-side cache mapping ring-id ranges (low, owner.id] to their owner.
+
+    Repeat lookups skip the O(log N) finger walk. The whole cache is dropped
+    whenever the DHT's membership epoch moves (add_node, remove_node, or a
+    stabilization that changed a successor or predecessor pointer).
+
+    get() takes no lock: the sorted range ends are an immutable tuple replaced
+    on every put, and a range whose entry has just been evicted simply misses.
+    Puts are serialized by a lock and evict with the CLOCK algorithm, an LRU
+    approximation whose hits only set a flag.
+    """
+
+    def __init__(self, capacity=ROUTING_CACHE_SIZE):
+        self.capacity = capacity
+        self.epoch = None
+        self._entries = {}  # owner id -> (low, owner, hops), insertion order is the clock hand
+        self._ends = ()  # sorted owner ids, for bisecting a key id to its range
+        self._referenced = set()  # owner ids hit since the clock hand last passed them
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.hops_saved = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _sync(self, epoch):
+        """Drop everything if `epoch` is newer; return whether it is current. Lock held."""
+        if self.epoch is None or epoch > self.epoch:
+            if self._entries:
+                self.invalidations += 1
+            # Rebind rather than clear, so lock-free readers keep a consistent view.
+            self._entries = {}
+            self._ends = ()
+            self._referenced = set()
+            self.epoch = epoch
+        return epoch == self.epoch
+
+    def get(self, key_id, epoch):
+        """Return (low, owner) for the cached range containing key_id, or None."""
+        if epoch == self.epoch:
+            ends = self._ends
+            if ends:
+                end = ends[bisect.bisect_left(ends, key_id) % len(ends)]
+                entry = self._entries.get(end)
+                if entry is not None:
+                    low, owner, hops = entry
+                    if owner.alive and in_interval(low, end, key_id, inclusive_end=True):
+                        self._referenced.add(end)
+                        self.hits += 1
+                        self.hops_saved += hops
+                        return low, owner
+        self.misses += 1
+        return None
+
+    def put(self, low, owner, hops, epoch):
+        """Cache the range (low, owner.id] resolved by a lookup of `hops` hops."""
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            if not self._sync(epoch):
+                return  # Resolved against an older membership; do not cache.
+            end = owner.id
+            entries = self._entries
+            if end not in entries:
+                ends = list(self._ends)
+                if len(entries) >= self.capacity:
+                    evicted = self._evict()
+                    del ends[bisect.bisect_left(ends, evicted)]
+                bisect.insort(ends, end)
+                entries[end] = (low, owner, hops)
+                self._ends = tuple(ends)
+            else:
+                entries[end] = (low, owner, hops)
+
+    def _evict(self):
+        """Remove and return the first unreferenced entry past the clock hand."""
+        entries = self._entries
+        referenced = self._referenced
+        while True:
+            end = next(iter(entries))
+            entry = entries.pop(end)
+            if end in referenced:
+                referenced.discard(end)
+                entries[end] = entry  # Second chance: move behind the hand
+            else:
+                return end
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'hops_saved': self.hops_saved,
+            'invalidations': self.invalidations,
+        }
+
+
+class DHT:
+    def __init__(self, m=M, r=R, scheduler=None, fingers_per_round=FINGERS_PER_ROUND,
+                 cache_size=ROUTING_CACHE_SIZE, metrics=None, successor_list_size=None,
+                 storage=None, read_consistency=ONE, write_consistency=ALL, vnodes=VNODES,
+                 handoff_chunk=HANDOFF_CHUNK, handoff_rate=HANDOFF_RATE,
+                 rng=None, clock=None, replica_executor=None):
+        if not 1 <= m <= MAX_M:
+            raise ValueError(f"Identifier bit-width must be between 1 and {MAX_M}.")
+        self.m = m
+        self.r = r
+        # Successor list length; it must cover the R - 1 replicas after the owner.
+        self.successor_list_size = max(successor_list_size or r, 1)
+        self.fingers_per_round = fingers_per_round
+        self.nodes = {}
+        # Published copy-on-write after every membership change; read it without the lock.
+        self.membership = Membership()
+        self.metrics = metrics if metrics is not None else ChordMetrics()
+        self.metrics.watch_dht(self)
+        self.lock = self.metrics.lock('dht')
+        # Shared driver for node maintenance; nodes do not own threads.
+        self.scheduler = scheduler if scheduler is not None else ThreadPoolScheduler()
+        # Membership epoch; bumped whenever a node's successor or predecessor changes.
+        self.epoch = 0
+        # Topology version for observers such as the visualizer; also bumped on finger changes.
+        self.version = 0
+        self.routing_cache = RoutingCache(cache_size)
+        # Node store factory, called as storage(node_id, key_id); None keeps data in memory.
+        self.storage = storage
+        # Default consistency levels for store()/retrieve(); see chord_quorum.
+        self.read_consistency = read_consistency
+        self.write_consistency = write_consistency
+        self.replicas = ReplicaCoordinator(self.metrics, executor=replica_executor)
+        # Source of node ids and lookup entry nodes (default: the random module),
+        # and of write versions (default: wall-clock time); chord_sim swaps in
+        # a seeded Random and its virtual clock.
+        self.rng = rng if rng is not None else random
+        self.clock = clock
+        # Virtual positions per unit of host weight, and host -> weight for add_host().
+        self.vnodes = vnodes
+        self.hosts = {}
+        # Key handoffs on join/notify/leave: keys per chunk, keys/s throttle, and those running.
+        self.handoff_chunk = handoff_chunk
+        self.handoff_rate = handoff_rate
+        self.handoffs = []
+        self._clock_lock = threading.Lock()
+        self._last_version = 0
+
+    def next_version(self):
+        """Return a write version: wall-clock nanoseconds, strictly increasing."""
+        with self._clock_lock:
+            now = time.time_ns() if self.clock is None else int(self.clock() * 1e9)
+            self._last_version = max(now, self._last_version + 1)
+            return self._last_version
+
+    def key_id(self, key):
+        return hash_key(key, self.m)
+
+    def bump_epoch(self):
+        self.epoch += 1
+        self.version += 1
+
+    def bump_version(self):
+        self.version += 1
+
+    def locate(self, key_id, path=None):
+        """Return (low, owner) where owner is responsible for key_id's range (low, owner.id].
+
+        Served from the routing cache when possible; otherwise a lookup is made
+        from a random entry node and its result cached. A `path` list receives
+        the entry node and every hop of such a lookup, and stays empty on a hit.
+        """
+        epoch = self.epoch
+        cached = self.routing_cache.get(key_id, epoch)
+        if cached:
+            return cached
+        node = self.membership.random_node(self.rng)
+        if path is not None:
+            path.append(node)
+        pred, hops = node.lookup(key_id, path)
+        owner = pred.live_successor()
+        self.routing_cache.put(pred.id, owner, hops, epoch)
+        return pred.id, owner
+
+    def handoff(self, source, target, start, end, reason):
+        """Return a Handoff of (start, end] from source to target using the DHT's chunk/rate settings."""
+        return Handoff(source, target, start, end, reason, self.handoff_chunk, self.handoff_rate)
+
+    def handoff_progress(self):
+        """Progress of every running key handoff (keys moved of total, chunks, seconds)."""
+        return [h.progress() for h in self.handoffs]
+
+    def routing_stats(self):
+        """Hit/miss counters of the routing cache, including lookup hops it saved."""
+        return self.routing_cache.stats()
+
+    def add_node(self, node_id=None, host=None):
+        with self.lock:
+            if node_id is None:
+                node_id = self.rng.randint(0, 2 ** self.m - 1)
+                while node_id in self.nodes:
+                    node_id = self.rng.randint(0, 2 ** self.m - 1)
+            new_node = Node(node_id, self, host)
+            handoff = None
+            if self.nodes:
+                known_node = self.membership.random_node(self.rng)
+                handoff = new_node.join(known_node)
+            else:
+                new_node.join(None)
+            self.nodes[node_id] = new_node
+            self.membership = self.membership.with_node(new_node)
+            self.bump_epoch()
+            if handoff:
+                handoff.commit()
+            self.scheduler.register(new_node)
+            dht_log.info("DHT: Node %s added to the DHT.", node_id)
+            return new_node
+
+    def add_host(self, host=None, weight=1.0, vnodes=None):
+        """Add a physical host owning round(weight * vnodes) virtual ring positions.
+
+        Each position joins like add_node() and is tagged with `host`; weight
+        is the host's relative capacity and is what chord_balance evens load
+        against. Returns the host's new nodes.
+        """
+        count = max(1, round(weight * (self.vnodes if vnodes is None else vnodes)))
+        with self.lock:
+            if len(self.nodes) + count > 2 ** self.m:
+                raise ValueError(f"Cannot fit {count} more nodes in a {self.m}-bit ring.")
+            if host is None:
+                n = len(self.hosts)
+                while f"host-{n}" in self.hosts:
+                    n += 1
+                host = f"host-{n}"
+            self.hosts[host] = weight
+        nodes = [self.add_node(host=host) for _ in range(count)]
+        dht_log.info("DHT: Host %s added with %d virtual nodes.", host, count)
+        return nodes
+
+    def remove_host(self, host):
+        """Remove every ring position of `host`, handing its keys to successors."""
+        for node in self.host_nodes().get(host, []):
+            self.remove_node(node.id)
+        with self.lock:
+            self.hosts.pop(host, None)
+
+    def host_weight(self, host):
+        return self.hosts.get(host, 1.0)
+
+    def host_nodes(self):
+        """Return {host: [nodes in ring order]} from the current membership snapshot."""
+        result = {}
+        for node in self.membership.nodes:
+            result.setdefault(node.host, []).append(node)
+        return result
+
+    def add_nodes(self, count, items=None):
+        """Add `count` nodes with random ids through bootstrap(); returns the new nodes."""
+        space = 2 ** self.m
+        with self.lock:
+            if len(self.nodes) + count > space:
+                raise ValueError(f"Cannot fit {count} more nodes in a {self.m}-bit ring.")
+            ids = set()
+            while len(ids) < count:
+                node_id = self.rng.randrange(space)
+                if node_id not in self.nodes:
+                    ids.add(node_id)
+        return self.bootstrap(ids, items)
+
+    def bootstrap(self, node_ids, items=None):
+        """Build a converged ring from `node_ids` in one pass, without joins.
+
+        Existing and new nodes are sorted once; every node's successor,
+        successor list, predecessor and fingers are then set directly from the
+        sorted ids (a bisect per finger that differs from the successor), and
+        the keys already held plus any `items` ({key: value} or pairs) are
+        placed on their owner and replicas with one store_many per node. Of the
+        copies held, the newest version of each key is kept. Keys are only
+        dropped from a node once the new ring is published, so lock-free
+        readers never miss one. Returns the newly created nodes.
+        """
+        with self.lock:
+            new_ids = sorted(set(node_ids) - set(self.nodes))
+            entries = {}
+            for node in self.nodes.values():
+                with node.lock:
+                    held = node.data.range_items(node.id, node.id)
+                for key, value, key_id in held:
+                    current = entries.get(key)
+                    if current is None or version_of(value) > version_of(current[1]):
+                        entries[key] = (key, value, key_id)
+            if items is not None:
+                if hasattr(items, 'items'):
+                    items = items.items()
+                for key, value in items:
+                    entries[key] = (key, Versioned(self.next_version(), value), hash_key(key, self.m))
+            new_nodes = [Node(node_id, self) for node_id in new_ids]
+            for node in new_nodes:
+                self.nodes[node.id] = node
+            membership = Membership.of(self.nodes.values(), self.membership.version + 1)
+            ring, ids = membership.nodes, membership.ids
+            n = len(ring)
+            if not n:
+                return []
+            space = 2 ** self.m
+            size = min(self.successor_list_size, n - 1)
+            for i, node in enumerate(ring):
+                succ = ring[(i + 1) % n]
+                node.successor = succ
+                node.predecessor = ring[i - 1]
+                node.successor_list = [ring[(i + j) % n] for j in range(1, size + 1)]
+                # Fingers whose start lies in (node, succ] are the successor; only
+                # the rest need a search.
+                gap = (succ.id - node.id) % space or space
+                for k in range(self.m):
+                    step = 1 << k
+                    if step <= gap:
+                        node.finger[k] = succ
+                    else:
+                        node.finger[k] = ring[bisect.bisect_left(ids, (node.id + step) % space) % n]
+                node.next_finger = 0
+
+            replicas = min(self.r, n)
+            placed = {}
+            for entry in entries.values():
+                owner = bisect.bisect_left(ids, entry[2]) % n
+                for j in range(replicas):
+                    placed.setdefault((owner + j) % n, []).append(entry)
+            for i, batch in placed.items():
+                ring[i].store_many(batch, forward=False)
+
+            self.membership = membership
+            self.bump_epoch()
+            if replicas < n:
+                # Drop what now lies outside each node's replica window.
+                for i, node in enumerate(ring):
+                    with node.lock:
+                        node.data.pop_range(node.id, ring[i - replicas].id)
+            for node in new_nodes:
+                self.scheduler.register(node)
+            dht_log.info("DHT: Bootstrapped %d nodes (%d total) and placed %d keys.",
+                         len(new_nodes), n, len(entries))
+            return new_nodes
+
+    def remove_node(self, node_id):
+        with self.lock:
+            node = self.nodes.get(node_id)
+            if node:
+                node.leave()
+                self.scheduler.unregister(node)
+                del self.nodes[node_id]
+                self.membership = self.membership.without(node_id)
+                self.bump_epoch()
+                dht_log.info("DHT: Node %s removed from the DHT.", node_id)
+            else:
+                dht_log.warning("DHT: Node %s not found.", node_id)
+
+    def fail_node(self, node_id):
+        """Crash a node: it stops responding without handing off keys or pointers."""
+        with self.lock:
+            node = self.nodes.pop(node_id, None)
+            if node is None:
+                dht_log.warning("DHT: Node %s not found.", node_id)
+                return
+            node.alive = False
+            self.scheduler.unregister(node)
+            self.membership = self.membership.without(node_id)
+            self.bump_epoch()
+            dht_log.info("DHT: Node %s failed.", node_id)
+
+    @timed('store_seconds')
+    def store(self, key, value, consistency=None):
+        """Write key to its replicas; returns True once `consistency` replicas have it.
+
+        consistency is ONE, QUORUM or ALL (default: write_consistency); the
+        remaining replicas are written in the background.
+        """
+        replicas = min(self.r, len(self.membership))
+        if replicas == 0:
+            dht_log.warning("DHT: No nodes in the DHT.")
+            return False
+        needed = required(consistency or self.write_consistency, replicas)
+        key_id = hash_key(key, self.m)
+        _, succ = self.locate(key_id)
+        succ.requests += 1
+        # The owner and the live successors after it (see _replica_set)
+        nodes = self._replica_set(succ, replicas)
+        acks = self.replicas.write(nodes, key, Versioned(self.next_version(), value), key_id, needed)
+        if acks < needed:
+            dht_log.warning("DHT: Key '%s' written to %d of %d required replicas.", key, acks, needed)
+            return False
+        key_log.info("DHT: Key '%s' stored in the DHT with value '%s'.", key, value)
+        return True
+
+    @timed('retrieve_seconds')
+    def retrieve(self, key, consistency=None):
+        """Read key from its replicas in parallel and return the newest value.
+
+        consistency is ONE, QUORUM or ALL (default: read_consistency). A hedged
+        request goes to one more replica if the first ones are slow, and stale
+        replicas are repaired in the background.
+        """
+        replicas = min(self.r, len(self.membership))
+        if replicas == 0:
+            dht_log.warning("DHT: No nodes in the DHT.")
+            return None
+        needed = required(consistency or self.read_consistency, replicas)
+        key_id = hash_key(key, self.m)
+        _, owner = self.locate(key_id)
+        owner.requests += 1
+        try:
+            stored = self.replicas.read(self._replica_set(owner, replicas), key, key_id, needed)
+        except ReplicaUnavailable as exc:
+            dht_log.warning("DHT: Key '%s' could not be read: %s", key, exc)
+            return None
+        if stored is None:
+            key_log.warning("DHT: Key '%s' not found in any replicas.", key)
+            return None
+        value = plain(stored)
+        key_log.info("DHT: Retrieved key '%s' with value '%s'.", key, value)
+        return value
+
+    def _group_by_owner(self, entries):
+        """Group (key_id, key, value) entries by the node responsible for them.
+
+        Entries are sorted by ring id and walked in ring order, so one lookup is
+        made per responsible node range; when the next id falls just past the
+        current owner we step to its successor instead of looking it up.
+        Returns a list of (owner, entries) pairs.
+        """
+        entries = sorted(entries, key=lambda e: e[0])
+        groups = []
+        owner = None
+        low = None
+        for entry in entries:
+            key_id = entry[0]
+            if owner is None or not in_interval(low, owner.id, key_id, inclusive_end=True):
+                if owner is not None and in_interval(owner.id, owner.live_successor().id, key_id,
+                                                     inclusive_end=True):
+                    low, owner = owner.id, owner.live_successor()
+                else:
+                    low, owner = self.locate(key_id)
+                groups.append((owner, []))
+            groups[-1][1].append(entry)
+        return groups
+
+    def _replica_set(self, owner, replicas):
+        """Return the owner followed by up to replicas - 1 distinct live successors.
+
+        Walks successor pointers, which joins and leaves update at once, rather
+        than successor lists, which only catch up at the next stabilize; a
+        failed successor is skipped through its predecessor's list.
+        """
+        nodes = [owner]
+        replica = owner.live_successor()
+        while len(nodes) < replicas and replica is not owner and replica not in nodes:
+            nodes.append(replica)
+            replica = replica.live_successor()
+        return nodes
+
+    @timed('multi_store_seconds')
+    def multi_store(self, items):
+        """Store many key/value pairs at once.
+
+        `items` is a mapping or an iterable of (key, value) pairs. Keys are
+        hashed together, grouped by responsible node, and each group is written
+        to the owner and its replicas with one bulk store per node.
+        """
+        replicas = min(self.r, len(self.membership))
+        if replicas == 0:
+            dht_log.warning("DHT: No nodes in the DHT.")
+            return False
+        if hasattr(items, 'items'):
+            items = items.items()
+        version = self.next_version()
+        entries = [(hash_key(k, self.m), k, Versioned(version, v)) for k, v in items]
+        for owner, group in self._group_by_owner(entries):
+            owner.requests += len(group)
+            batch = [(k, v, key_id) for key_id, k, v in group]
+            for replica in self._replica_set(owner, replicas):
+                replica.store_many(batch)
+        dht_log.info("DHT: Stored %d keys in the DHT.", len(entries))
+        return True
+
+    @timed('multi_get_seconds')
+    def multi_get(self, keys):
+        """Retrieve many keys at once; returns {key: value}, with None for missing keys.
+
+        Each responsible node is asked for its whole group in one call; keys it
+        lacks are looked for on its replicas in ring order.
+        """
+        keys = list(keys)
+        result = dict.fromkeys(keys)
+        replicas = min(self.r, len(self.membership))
+        if replicas == 0:
+            dht_log.warning("DHT: No nodes in the DHT.")
+            return result
+        entries = [(hash_key(k, self.m), k, None) for k in set(keys)]
+        missing = 0
+        for owner, group in self._group_by_owner(entries):
+            owner.requests += len(group)
+            wanted = [k for _, k, _ in group]
+            for replica in self._replica_set(owner, replicas):
+                found = replica.retrieve_many(wanted)
+                result.update(found)
+                wanted = [k for k in wanted if k not in found]
+                if not wanted:
+                    break
+            missing += len(wanted)
+        if missing:
+            dht_log.warning("DHT: %d of %d keys not found in any replicas.", missing, len(entries))
+        return result
+
+    def iter_multi_get(self, keys, batch_size=BATCH_SIZE):
+        """Stream (key, value) pairs for an iterable of keys, batch_size keys at a time."""
+        batch = []
+        for key in keys:
+            batch.append(key)
+            if len(batch) >= batch_size:
+                yield from self.multi_get(batch).items()
+                batch = []
+        if batch:
+            yield from self.multi_get(batch).items()
+
+    def get_ring(self):
+        """Returns a list of node IDs sorted in the ring order."""
+        return list(self.membership.ids)
+
+    def get_finger_table(self, node_id):
+        node = self.membership.get(node_id)
+        if not node:
+            return []
+        return [finger.id for finger in node.finger if finger]
+
+    def shutdown(self):
+        """Stop background maintenance for every node and close their stores."""
+        self.scheduler.stop()
+        self.replicas.shutdown()
+        with self.lock:
+            for node in self.nodes.values():
+                with node.lock:
+                    node.data.close()
@@ -0,0 +1,651 @@
+# chord_gui.py
+"""Tk/matplotlib front end for the Chord DHT simulation.
+
+Importing this module pulls in matplotlib (TkAgg), numpy and tkinter, so it
+is only loaded by the GUI entry point in chord_dht_gui.py.
+
+DHT operations never run on the Tk main thread: the app submits them to a
+small worker pool, and workers hand results and progress back through a queue
+that the main thread drains with `after` callbacks, so joins, key transfers
+and bulk actions (file import, adding many nodes, the canned benchmark) leave
+the window responsive.
+"""
+
+import matplotlib
+matplotlib.use('TkAgg')  # Use TkAgg backend for embedding in Tkinter
+
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.collections import LineCollection
+from matplotlib.patches import FancyArrowPatch
+import numpy as np
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from matplotlib.lines import Line2D
+
+import chord_logging
+from chord_dht import DHT
+
+LOG_POLL_MS = 500  # How often the status pane pulls new engine log lines
+REFRESH_MS = 1000  # How often the visualizer checks the DHT for topology changes
+RING_RADIUS = 10
+DETAIL_MAX_NODES = 64  # Above this, draw the level-of-detail view
+LOD_SECTORS = 32  # Angular sectors finger edges are aggregated into in LOD mode
+GUI_WORKERS = 2  # Worker threads running GUI-triggered DHT operations
+RESULT_POLL_MS = 50  # How often worker results are applied to the widgets
+PROGRESS_INTERVAL = 0.2  # Seconds between progress updates from a bulk action
+IMPORT_CHUNK = 1000  # Keys per multi_store() call when importing a file
+BENCH_KEYS = 2000  # Keys written and read by the canned benchmark
+
+
+class Cancelled(Exception):
+    """Raised inside a bulk action when the user presses Cancel."""
+
+
+def read_key_values(path):
+    """Parse a key/value file into a list of (key, value) pairs.
+
+    A file starting with '{' is read as a JSON object; otherwise every
+    non-blank line not starting with '#' is 'key<TAB>value', 'key,value' or
+    'key=value', split at the first separator found in that order.
+    """
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    if text.lstrip().startswith('{'):
+        return [(str(k), v) for k, v in json.loads(text).items()]
+    pairs = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        for sep in ('\t', ',', '='):
+            if sep in line:
+                key, value = line.split(sep, 1)
+                pairs.append((key.strip(), value.strip()))
+                break
+        else:
+            raise ValueError(f"Line {number} has no key/value separator.")
+    return pairs
+
+
+class ChordVisualizer:
+    """Draws the ring and redraws only when the DHT's topology version moves.
+
+    Drawing objects are created once and updated in place. Up to
+    DETAIL_MAX_NODES nodes, every successor and finger edge is an arrow patch
+    kept in a dict and only added, moved or removed when it changes. Larger
+    rings switch to a level-of-detail view: the successor ring is one line
+    collection and finger edges are aggregated between angular sectors, with
+    line width showing how many fingers each sector pair carries.
+    """
+
+    def __init__(self, parent_frame, dht):
+        self.dht = dht
+        self.fig, self.ax = plt.subplots(figsize=(8, 8))
+        self.canvas = FigureCanvasTkAgg(self.fig, master=parent_frame)
+        self.widget = self.canvas.get_tk_widget()
+        self.widget.pack(fill=tk.BOTH, expand=True)
+        self.ax.set_xlim(-RING_RADIUS * 1.25, RING_RADIUS * 1.25)
+        self.ax.set_ylim(-RING_RADIUS * 1.25, RING_RADIUS * 1.25)
+        self.ax.set_aspect('equal')
+        self.ax.axis('off')
+        legend_elements = [
+            Line2D([0], [0], color='blue', lw=2, label='Successor', linestyle='solid'),
+            Line2D([0], [0], color='red', lw=2, label='Finger Table', linestyle='dashed')
+        ]
+        self.ax.legend(handles=legend_elements, loc='upper right')
+        self.nodes_artist = self.ax.scatter([], [], s=1000, c='lightblue', edgecolors='black',
+                                            linewidths=1.5, zorder=3)
+        self.labels = []
+        self.edges = {}  # (src, dst, kind) -> FancyArrowPatch, detail mode only
+        self.succ_lines = LineCollection([], colors='blue', linewidths=1, zorder=2)
+        self.finger_lines = LineCollection([], colors='red', linestyles='dashed', alpha=0.5, zorder=1)
+        self.ax.add_collection(self.succ_lines)
+        self.ax.add_collection(self.finger_lines)
+        self.ring = ()
+        self.pos = {}
+        self.drawn_version = None
+        self.frames_skipped = 0
+        self.widget.after(REFRESH_MS, self.tick)
+
+    def tick(self):
+        self.update()
+        self.widget.after(REFRESH_MS, self.tick)
+
+    def update(self, frame=None):
+        version = self.dht.version
+        if version == self.drawn_version:
+            self.frames_skipped += 1
+            return False
+        self.drawn_version = version
+        ring = tuple(self.dht.get_ring())
+        if ring != self.ring:
+            self.layout(ring)
+        if not ring:
+            self.ax.set_title("Chord DHT Ring (No Nodes)")
+            self.clear_detail_edges()
+            self.succ_lines.set_segments([])
+            self.finger_lines.set_segments([])
+        elif len(ring) <= DETAIL_MAX_NODES:
+            self.ax.set_title("Chord DHT Ring")
+            self.succ_lines.set_segments([])
+            self.finger_lines.set_segments([])
+            self.update_detail_edges()
+        else:
+            self.ax.set_title(f"Chord DHT Ring ({len(ring)} nodes, fingers aggregated)")
+            self.clear_detail_edges()
+            self.update_aggregate_edges()
+        self.canvas.draw_idle()
+        return True
+
+    def layout(self, ring):
+        """Place nodes evenly on the circle (vectorized) and refresh markers and labels."""
+        self.ring = ring
+        angles = np.linspace(0, 2 * np.pi, len(ring), endpoint=False)
+        self.xy = RING_RADIUS * np.column_stack((np.cos(angles), np.sin(angles)))
+        self.pos = {node_id: tuple(p) for node_id, p in zip(ring, self.xy)}
+        detail = len(ring) <= DETAIL_MAX_NODES
+        self.nodes_artist.set_offsets(self.xy if len(ring) else np.empty((0, 2)))
+        self.nodes_artist.set_sizes([1000 if detail else max(10, 20000 / max(len(ring), 1))])
+        shown = ring if detail else ()
+        while len(self.labels) < len(shown):
+            self.labels.append(self.ax.text(0, 0, '', ha='center', va='center', fontsize=12,
+                                            fontweight='bold', zorder=4))
+        for label, node_id in zip(self.labels, shown):
+            label.set_position(self.pos[node_id])
+            label.set_text(str(node_id))
+            label.set_visible(True)
+        for label in self.labels[len(shown):]:
+            label.set_visible(False)
+        # Every node moved, so existing arrows need new endpoints.
+        for (src, dst, _), patch in self.edges.items():
+            if src in self.pos and dst in self.pos:
+                patch.set_positions(self.pos[src], self.pos[dst])
+
+    def current_edges(self):
+        """Return the set of (src, dst, kind) edges for the live ring."""
+        edges = set()
+        for node_id in self.ring:
+            node = self.dht.nodes.get(node_id)
+            if node is None:
+                continue
+            succ = node.successor
+            if succ and succ.alive and succ.id != node_id and succ.id in self.pos:
+                edges.add((node_id, succ.id, 'successor'))
+            for finger in set(node.finger):
+                if finger and finger.id != node_id and finger.id in self.pos:
+                    edges.add((node_id, finger.id, 'finger'))
+        return edges
+
+    def update_detail_edges(self):
+        wanted = self.current_edges()
+        for edge in set(self.edges) - wanted:
+            self.edges.pop(edge).remove()
+        for edge in wanted - set(self.edges):
+            src, dst, kind = edge
+            if kind == 'successor':
+                patch = FancyArrowPatch(self.pos[src], self.pos[dst], color='blue', arrowstyle='-|>',
+                                        mutation_scale=30, connectionstyle='arc3,rad=0.1', lw=2,
+                                        shrinkA=15, shrinkB=15, zorder=2)
+            else:
+                patch = FancyArrowPatch(self.pos[src], self.pos[dst], color='red', linestyle='dashed',
+                                        arrowstyle='-|>', mutation_scale=25, connectionstyle='arc3,rad=0.2',
+                                        lw=2, shrinkA=15, shrinkB=15, zorder=1)
+            self.ax.add_patch(patch)
+            self.edges[edge] = patch
+
+    def clear_detail_edges(self):
+        for patch in self.edges.values():
+            patch.remove()
+        self.edges.clear()
+
+    def update_aggregate_edges(self):
+        index = {node_id: i for i, node_id in enumerate(self.ring)}
+        succ_segments = []
+        sectors = min(LOD_SECTORS, len(self.ring))
+        counts = {}
+        for src, dst, kind in self.current_edges():
+            if kind == 'successor':
+                succ_segments.append((self.pos[src], self.pos[dst]))
+            else:
+                pair = (index[src] * sectors // len(self.ring), index[dst] * sectors // len(self.ring))
+                if pair[0] != pair[1]:
+                    counts[pair] = counts.get(pair, 0) + 1
+        self.succ_lines.set_segments(succ_segments)
+        if counts:
+            angles = (np.arange(sectors) + 0.5) * 2 * np.pi / sectors
+            centers = 0.95 * RING_RADIUS * np.column_stack((np.cos(angles), np.sin(angles)))
+            pairs = np.array(list(counts))
+            weights = np.array(list(counts.values()), dtype=float)
+            self.finger_lines.set_segments(np.stack((centers[pairs[:, 0]], centers[pairs[:, 1]]), axis=1))
+            self.finger_lines.set_linewidths(0.5 + 4 * weights / weights.max())
+        else:
+            self.finger_lines.set_segments([])
+
+
+class ChordDHTApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Chord DHT Simulation")
+        self.dht = DHT()
+
+        # DHT operations run on the pool; their results come back through
+        # self.results and are applied on the main thread by poll_results().
+        self.executor = ThreadPoolExecutor(max_workers=GUI_WORKERS, thread_name_prefix='chord-gui')
+        self.results = queue.Queue()
+        self.cancel_events = set()  # One per running bulk action; only touched on the main thread
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Setup GUI layout
+        self.setup_gui()
+
+    def setup_gui(self):
+        # Frames
+        control_frame = ttk.Frame(self.root, padding="10")
+        control_frame.pack(side=tk.LEFT, fill=tk.Y)
+
+        visualization_frame = ttk.Frame(self.root, padding="10")
+        visualization_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+
+        # Control Widgets
+        # Add Node
+        add_node_label = ttk.Label(control_frame, text="Add Node", font=('Helvetica', 10, 'bold'))
+        add_node_label.pack(pady=5)
+
+        add_node_id_label = ttk.Label(control_frame, text="Node ID (optional):")
+        add_node_id_label.pack()
+        self.add_node_id_entry = ttk.Entry(control_frame)
+        self.add_node_id_entry.pack(pady=5)
+        add_node_button = ttk.Button(control_frame, text="Add Node", command=self.add_node)
+        add_node_button.pack(pady=5)
+
+        # Remove Node
+        remove_node_label = ttk.Label(control_frame, text="Remove Node", font=('Helvetica', 10, 'bold'))
+        remove_node_label.pack(pady=10)
+
+        remove_node_id_label = ttk.Label(control_frame, text="Node ID:")
+        remove_node_id_label.pack()
+        self.remove_node_id_entry = ttk.Entry(control_frame)
+        self.remove_node_id_entry.pack(pady=5)
+        remove_node_button = ttk.Button(control_frame, text="Remove Node", command=self.remove_node)
+        remove_node_button.pack(pady=5)
+
+        # Store Key-Value
+        store_kv_label = ttk.Label(control_frame, text="Store Key-Value", font=('Helvetica', 10, 'bold'))
+        store_kv_label.pack(pady=10)
+
+        store_key_label = ttk.Label(control_frame, text="Key:")
+        store_key_label.pack()
+        self.store_key_entry = ttk.Entry(control_frame)
+        self.store_key_entry.pack(pady=5)
+
+        store_value_label = ttk.Label(control_frame, text="Value:")
+        store_value_label.pack()
+        self.store_value_entry = ttk.Entry(control_frame)
+        self.store_value_entry.pack(pady=5)
+
+        store_button = ttk.Button(control_frame, text="Store", command=self.store_key)
+        store_button.pack(pady=5)
+
+        # Retrieve Key
+        retrieve_kv_label = ttk.Label(control_frame, text="Retrieve Key", font=('Helvetica', 10, 'bold'))
+        retrieve_kv_label.pack(pady=10)
+
+        retrieve_key_label = ttk.Label(control_frame, text="Key:")
+        retrieve_key_label.pack()
+        self.retrieve_key_entry = ttk.Entry(control_frame)
+        self.retrieve_key_entry.pack(pady=5)
+        retrieve_button = ttk.Button(control_frame, text="Retrieve", command=self.retrieve_key)
+        retrieve_button.pack(pady=5)
+
+        # Query Node Successor and Predecessor
+        query_node_label = ttk.Label(control_frame, text="Query Node", font=('Helvetica', 10, 'bold'))
+        query_node_label.pack(pady=10)
+
+        query_node_id_label = ttk.Label(control_frame, text="Node ID:")
+        query_node_id_label.pack()
+        self.query_node_id_entry = ttk.Entry(control_frame)
+        self.query_node_id_entry.pack(pady=5)
+        query_node_button = ttk.Button(control_frame, text="Find Successor & Predecessor", command=self.query_node)
+        query_node_button.pack(pady=5)
+
+        # Successor and Predecessor Display
+        self.query_result_label = ttk.Label(control_frame, text="", foreground="blue")
+        self.query_result_label.pack(pady=5)
+
+        # Bulk Actions
+        bulk_label = ttk.Label(control_frame, text="Bulk Actions", font=('Helvetica', 10, 'bold'))
+        bulk_label.pack(pady=10)
+
+        add_many_frame = ttk.Frame(control_frame)
+        add_many_frame.pack(pady=5)
+        self.add_many_entry = ttk.Entry(add_many_frame, width=8)
+        self.add_many_entry.insert(0, "8")
+        self.add_many_entry.pack(side=tk.LEFT, padx=2)
+        add_many_button = ttk.Button(add_many_frame, text="Add N Nodes", command=self.add_nodes)
+        add_many_button.pack(side=tk.LEFT, padx=2)
+
+        import_button = ttk.Button(control_frame, text="Import Key/Value File...", command=self.import_file)
+        import_button.pack(pady=5)
+        bench_button = ttk.Button(control_frame, text="Run Benchmark", command=self.run_benchmark)
+        bench_button.pack(pady=5)
+
+        self.progress = ttk.Progressbar(control_frame, length=200, maximum=1.0)
+        self.progress.pack(pady=5)
+        self.progress_label = ttk.Label(control_frame, text="Idle")
+        self.progress_label.pack()
+        cancel_button = ttk.Button(control_frame, text="Cancel", command=self.cancel_actions)
+        cancel_button.pack(pady=5)
+
+        # Status Display
+        status_label = ttk.Label(control_frame, text="Status", font=('Helvetica', 10, 'bold'))
+        status_label.pack(pady=10)
+
+        self.status_text = tk.Text(control_frame, height=10, width=30, state='disabled')
+        self.status_text.pack(pady=5)
+
+        # Visualization
+        self.visualizer = ChordVisualizer(visualization_frame, self.dht)
+
+        # Tail the engine's in-memory log buffer into the status pane
+        self.log_seq = 0
+        self.root.after(LOG_POLL_MS, self.poll_engine_log)
+
+        # Apply worker results and progress on the main thread
+        self.root.after(RESULT_POLL_MS, self.poll_results)
+
+    def run_in_background(self, work, on_done, *args, cancel=None):
+        """Run work(*args) on the worker pool and call on_done(result) on the main thread.
+
+        An exception raised by work is logged to the status pane instead.
+        `cancel` is the action's event from new_cancel_event(), released when
+        the work finishes.
+        """
+        future = self.executor.submit(work, *args)
+        future.add_done_callback(lambda f: self.post(self.finish, f, on_done, cancel))
+
+    def post(self, callback, *args):
+        """Queue callback(*args) to run on the main thread; safe to call from workers."""
+        self.results.put((callback, args))
+
+    def poll_results(self):
+        while True:
+            try:
+                callback, args = self.results.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+        self.root.after(RESULT_POLL_MS, self.poll_results)
+
+    def finish(self, future, on_done, cancel=None):
+        self.cancel_events.discard(cancel)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if isinstance(error, Cancelled):
+            self.show_progress(0.0, "Cancelled.")
+            self.log_status("Cancelled.")
+        elif error is not None:
+            self.log_status(f"Error: {error}")
+        else:
+            on_done(future.result())
+
+    def new_cancel_event(self):
+        """A cancel event for one bulk action; the Cancel button sets those of all running actions."""
+        cancel = threading.Event()
+        self.cancel_events.add(cancel)
+        return cancel
+
+    def cancel_actions(self):
+        for cancel in self.cancel_events:
+            cancel.set()
+
+    def progress_reporter(self, label, total, cancel):
+        """Return report(done) for a worker: posts progress and throughput at most every PROGRESS_INTERVAL.
+
+        It raises Cancelled once `cancel` (from new_cancel_event()) is set.
+        """
+        started = time.perf_counter()
+        last = [0.0]
+
+        def report(done, force=False):
+            if cancel.is_set():
+                raise Cancelled()
+            now = time.perf_counter()
+            if not force and now - last[0] < PROGRESS_INTERVAL:
+                return
+            last[0] = now
+            elapsed = now - started
+            rate = done / elapsed if elapsed else 0.0
+            self.post(self.show_progress, done / total if total else 1.0,
+                      f"{label}: {done}/{total} ({rate:,.0f}/s)")
+        return report
+
+    def show_progress(self, fraction, text):
+        self.progress['value'] = fraction
+        self.progress_label.config(text=text)
+
+    def add_node(self):
+        node_id_str = self.add_node_id_entry.get().strip()
+        if node_id_str:
+            try:
+                node_id = int(node_id_str)
+            except ValueError:
+                messagebox.showerror("Error", "Node ID must be an integer.")
+                return
+            if node_id < 0 or node_id >= 2 ** self.dht.m:
+                messagebox.showerror("Error", f"Node ID must be between 0 and {2 ** self.dht.m -1}.")
+                return
+            if node_id in self.dht.membership:
+                messagebox.showerror("Error", f"Node ID {node_id} already exists.")
+                return
+            self.run_in_background(self.dht.add_node,
+                                   lambda node: self.log_status(f"Added node {node.id}."), node_id)
+        else:
+            self.run_in_background(self.dht.add_node,
+                                   lambda node: self.log_status(f"Added a node with ID {node.id}."))
+
+        self.add_node_id_entry.delete(0, tk.END)
+
+    def remove_node(self):
+        node_id_str = self.remove_node_id_entry.get().strip()
+        if not node_id_str:
+            messagebox.showerror("Error", "Please enter a Node ID to remove.")
+            return
+        try:
+            node_id = int(node_id_str)
+        except ValueError:
+            messagebox.showerror("Error", "Node ID must be an integer.")
+            return
+        if node_id not in self.dht.membership:
+            messagebox.showerror("Error", f"Node ID {node_id} does not exist.")
+            return
+        self.run_in_background(self.dht.remove_node,
+                               lambda _: self.log_status(f"Removed node {node_id}."), node_id)
+        self.remove_node_id_entry.delete(0, tk.END)
+
+    def store_key(self):
+        key = self.store_key_entry.get().strip()
+        value = self.store_value_entry.get().strip()
+        if not key or not value:
+            messagebox.showerror("Error", "Please enter both key and value.")
+            return
+
+        def done(success):
+            if success:
+                self.log_status(f"Stored key '{key}' with value '{value}'.")
+            else:
+                self.log_status("Failed to store key-value pair.")
+        self.run_in_background(self.dht.store, done, key, value)
+        self.store_key_entry.delete(0, tk.END)
+        self.store_value_entry.delete(0, tk.END)
+
+    def retrieve_key(self):
+        key = self.retrieve_key_entry.get().strip()
+        if not key:
+            messagebox.showerror("Error", "Please enter a key to retrieve.")
+            return
+
+        def done(value):
+            if value is not None:
+                self.log_status(f"Retrieved key '{key}': {value}")
+                messagebox.showinfo("Retrieve", f"Key '{key}' has value '{value}'.")
+            else:
+                self.log_status(f"Key '{key}' not found.")
+                messagebox.showinfo("Retrieve", f"Key '{key}' not found.")
+        self.run_in_background(self.dht.retrieve, done, key)
+        self.retrieve_key_entry.delete(0, tk.END)
+
+    def add_nodes(self):
+        try:
+            count = int(self.add_many_entry.get().strip())
+        except ValueError:
+            messagebox.showerror("Error", "Node count must be an integer.")
+            return
+        free = 2 ** self.dht.m - len(self.dht.membership)
+        if not 0 < count <= free:
+            messagebox.showerror("Error", f"Node count must be between 1 and {free} (free ring ids).")
+            return
+        cancel = self.new_cancel_event()
+        report = self.progress_reporter("Adding nodes", count, cancel)
+
+        def work():
+            # One join at a time, so keys move and the ring animates as it grows.
+            started = time.perf_counter()
+            for done in range(count):
+                report(done)
+                self.dht.add_node()
+            report(count, force=True)
+            return time.perf_counter() - started
+
+        self.run_in_background(work, lambda seconds: self.log_status(
+            f"Added {count} nodes in {seconds:.2f}s ({count / seconds:,.0f} joins/s)."), cancel=cancel)
+
+    def import_file(self):
+        path = filedialog.askopenfilename(
+            title="Import key/value pairs",
+            filetypes=[("Key/value files", "*.json *.csv *.tsv *.txt"), ("All files", "*")])
+        if not path:
+            return
+        if not len(self.dht.membership):
+            messagebox.showerror("Error", "Add nodes before importing keys.")
+            return
+
+        cancel = self.new_cancel_event()
+
+        def work():
+            pairs = read_key_values(path)
+            report = self.progress_reporter("Importing", len(pairs), cancel)
+            started = time.perf_counter()
+            for i in range(0, len(pairs), IMPORT_CHUNK):
+                report(i)
+                self.dht.multi_store(pairs[i:i + IMPORT_CHUNK])
+            report(len(pairs), force=True)
+            return len(pairs), time.perf_counter() - started
+
+        def done(result):
+            count, seconds = result
+            self.log_status(f"Imported {count} keys in {seconds:.2f}s "
+                            f"({count / seconds if seconds else 0:,.0f} keys/s).")
+        self.run_in_background(work, done, cancel=cancel)
+
+    def run_benchmark(self):
+        """Time single and bulk stores and retrieves of BENCH_KEYS keys on a scratch ring.
+
+        The scratch ring has the current ring's size and settings, so the
+        user's DHT is neither written to nor slowed down by the run.
+        """
+        size = len(self.dht.membership)
+        if not size:
+            messagebox.showerror("Error", "Add nodes before running the benchmark.")
+            return
+        keys = [f"bench-{i}" for i in range(BENCH_KEYS)]
+        settings = dict(m=self.dht.m, r=self.dht.r, read_consistency=self.dht.read_consistency,
+                        write_consistency=self.dht.write_consistency)
+        cancel = self.new_cancel_event()
+        report = self.progress_reporter("Benchmark", 2 * BENCH_KEYS + 2, cancel)
+
+        def work():
+            dht = DHT(**settings)
+            try:
+                dht.add_nodes(size)
+                phases = [
+                    ('store', lambda k: dht.store(k, k)),
+                    ('retrieve', dht.retrieve),
+                ]
+                results = {}
+                done = 0
+                for name, op in phases:
+                    started = time.perf_counter()
+                    for key in keys:
+                        op(key)
+                        done += 1
+                        report(done)
+                    results[name] = BENCH_KEYS / (time.perf_counter() - started)
+                started = time.perf_counter()
+                dht.multi_store({k: k for k in keys})
+                results['multi_store'] = BENCH_KEYS / (time.perf_counter() - started)
+                report(done + 1, force=True)
+                started = time.perf_counter()
+                dht.multi_get(keys)
+                results['multi_get'] = BENCH_KEYS / (time.perf_counter() - started)
+                report(done + 2, force=True)
+                return results
+            finally:
+                dht.shutdown()
+
+        def done(results):
+            self.log_status(f"Benchmark ({BENCH_KEYS} keys, scratch ring of {size} nodes), ops/s:")
+            for name, rate in results.items():
+                self.log_status(f"  {name}: {rate:,.0f}")
+        self.run_in_background(work, done, cancel=cancel)
+
+    def query_node(self):
+        node_id_str = self.query_node_id_entry.get().strip()
+        if not node_id_str:
+            messagebox.showerror("Error", "Please enter a Node ID to query.")
+            return
+        try:
+            node_id = int(node_id_str)
+            # Read the membership snapshot, so a join running on a worker does not block the UI.
+            node = self.dht.membership.get(node_id)
+            if node is None:
+                messagebox.showerror("Error", f"Node ID {node_id} does not exist.")
+                self.query_result_label.config(text="")
+                return
+            successor = node.successor.id if node.successor else "None"
+            predecessor = node.predecessor.id if node.predecessor else "None"
+            result_text = f"Node {node_id}:\nSuccessor: {successor}\nPredecessor: {predecessor}"
+            self.query_result_label.config(text=result_text)
+            self.log_status(f"Queried Node {node_id}: Successor={successor}, Predecessor={predecessor}")
+        except ValueError:
+            messagebox.showerror("Error", "Node ID must be an integer.")
+            self.query_result_label.config(text="")
+            return
+        self.query_node_id_entry.delete(0, tk.END)
+
+    def log_status(self, message):
+        self.status_text.configure(state='normal')
+        self.status_text.insert(tk.END, message + "\n")
+        self.status_text.see(tk.END)
+        self.status_text.configure(state='disabled')
+
+    def poll_engine_log(self):
+        ring = chord_logging.ring_buffer()
+        if ring is not None:
+            self.log_seq, lines = ring.since(self.log_seq)
+            for line in lines:
+                self.log_status(line)
+        self.root.after(LOG_POLL_MS, self.poll_engine_log)
+
+    def close(self):
+        """Stop bulk actions and background work, then close the window."""
+        self.cancel_actions()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.dht.shutdown()
+        self.root.destroy()
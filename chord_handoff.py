@@ -0,0 +1,135 @@
+# chord_handoff.py
+"""Chunked, throttled key handoff between nodes on join, notify and leave.
+
+A Handoff streams the keys of a ring range (start, end] from a source node
+to a target node in chunks of at most `chunk` keys. The source's lock is only
+held while one chunk is read and the target's while it is written, so both
+keep serving reads and writes between chunks; `rate` (keys per second)
+optionally throttles the stream.
+
+Until the handoff commits, the two nodes share ownership of the range. The
+target is already reachable by lookups, so reads that miss on the target are
+forwarded to the source, and writes to the target are also applied to a
+still-live source so the chunks that follow never carry stale data. Writers
+still routed to the source are covered the other way round: its writes in the
+range are mirrored to the target, including those to parts already copied
+(versioned writes are last-writer-wins, so neither a chunk nor a mirrored
+write can roll back a newer one).
+Active handoffs are listed with their progress by DHT.handoff_progress().
+"""
+
+import logging
+import threading
+import time
+
+transfer_log = logging.getLogger('chord.transfer')
+
+HANDOFF_CHUNK = 1000  # Keys copied per chunk; node locks are released in between
+HANDOFF_RATE = None  # Keys per second a handoff may move; None is unthrottled
+
+# Serializes updates of the copy-on-write node.incoming and dht.handoffs lists,
+# which readers iterate without locking.
+_registry_lock = threading.Lock()
+
+
+def _covers(start, end, ring_id):
+    """Whether ring_id lies in the ring interval (start, end]; start == end is the whole ring."""
+    if start == end:
+        return True
+    if start < end:
+        return start < ring_id <= end
+    return ring_id > start or ring_id <= end
+
+
+class Handoff:
+    """Streams the keys of (start, end] from source to target; see the module docstring."""
+
+    def __init__(self, source, target, start, end, reason, chunk=HANDOFF_CHUNK, rate=HANDOFF_RATE):
+        self.source = source
+        self.target = target
+        self.start = start
+        self.end = end
+        self.reason = reason
+        self.chunk = chunk
+        self.rate = rate
+        self.total = None
+        self.moved = 0
+        self.chunks = 0
+        self.started = None
+        self.finished = None
+
+    def covers(self, ring_id):
+        return _covers(self.start, self.end, ring_id)
+
+    def fetch(self, key):
+        """Read a key from the source, bypassing its liveness check (it may be leaving)."""
+        data = self.source.data
+        if data.concurrent_reads:
+            return data.get(key, None)
+        with self.source.lock:
+            return data.get(key, None)
+
+    def begin(self):
+        """Make the target forward misses and writes to the source, and the source mirror its writes."""
+        dht = self.target.dht
+        with self.source.lock:
+            self.total = self.source.data.count_range(self.start, self.end)
+        self.started = time.monotonic()
+        with _registry_lock:
+            self.target.incoming = self.target.incoming + [self]
+            self.source.outgoing = self.source.outgoing + [self]
+            dht.handoffs = dht.handoffs + [self]
+
+    def run(self, commit=True):
+        """Copy the range chunk by chunk, then commit; returns the number of keys moved.
+
+        With commit False the handoff stays open (forwarding and mirroring)
+        until the caller commits it, e.g. once the new owner is published.
+        If copying fails the handoff is committed regardless.
+        """
+        if self.started is None:
+            self.begin()
+        try:
+            after = None
+            while True:
+                with self.source.lock:
+                    entries = self.source.data.range_chunk(self.start, self.end, after, self.chunk)
+                if not entries:
+                    break
+                self.target.store_many(entries, forward=False)
+                self.moved += len(entries)
+                self.chunks += 1
+                self.target.dht.metrics.keys_transferred(self.reason, len(entries))
+                after = (entries[-1][2], entries[-1][0])
+                if self.rate:
+                    time.sleep(len(entries) / self.rate)
+        except BaseException:
+            self.commit()
+            raise
+        if commit:
+            self.commit()
+        if self.moved:
+            transfer_log.info("Node %s: Streamed %d keys to Node %s in %d chunks (%s).",
+                              self.source.id, self.moved, self.target.id, self.chunks, self.reason)
+        return self.moved
+
+    def commit(self):
+        """End dual ownership: the target now serves the range on its own."""
+        dht = self.target.dht
+        with _registry_lock:
+            self.target.incoming = [h for h in self.target.incoming if h is not self]
+            self.source.outgoing = [h for h in self.source.outgoing if h is not self]
+            dht.handoffs = [h for h in dht.handoffs if h is not self]
+        self.finished = time.monotonic()
+
+    def progress(self):
+        return {
+            'reason': self.reason,
+            'source': self.source.id,
+            'target': self.target.id,
+            'range': (self.start, self.end),
+            'moved': self.moved,
+            'total': self.total,
+            'chunks': self.chunks,
+            'seconds': (self.finished or time.monotonic()) - self.started if self.started else 0.0,
+        }
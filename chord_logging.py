@@ -0,0 +1,179 @@
+# chord_logging.py
+"""Queue-backed, low-overhead logging for the Chord DHT.
+
+The engine logs through a few category loggers under ``chord`` using lazy
+%-style arguments, so nothing is formatted unless a record is enabled. Calling
+``configure()`` routes those loggers through a QueueHandler: the calling thread
+only enqueues the unformatted record, and a background QueueListener formats it
+and does the I/O. Per-key messages can be rate limited or sampled, and a ring
+buffer keeps the most recent lines for the GUI status pane to tail.
+"""
+
+import collections
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+LOG_FORMAT = '%(asctime)s %(levelname)s:%(message)s'
+RING_BUFFER_SIZE = 1000  # Formatted lines kept in memory for the GUI
+
+# Categories used by the engine.
+NODE = 'chord.node'  # Successor/predecessor/finger changes, joins and leaves
+TRANSFER = 'chord.transfer'  # Key hand-offs between nodes
+KEYS = 'chord.keys'  # Per-key store/retrieve messages
+DHT = 'chord.dht'  # Membership and client-level messages
+MAINTENANCE = 'chord.maintenance'  # Scheduler errors
+NET = 'chord.net'  # Networked-mode node servers
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket: let through at most `rate` records per second, bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self.dropped = 0
+
+    def filter(self, record):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        self.dropped += 1
+        return False
+
+
+class SampleFilter(logging.Filter):
+    """Let through one record out of every `every`."""
+
+    def __init__(self, every):
+        super().__init__()
+        self.every = every
+        self._seen = 0
+
+    def filter(self, record):
+        self._seen += 1
+        return self._seen % self.every == 1 or self.every == 1
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last `capacity` formatted lines with increasing sequence numbers."""
+
+    def __init__(self, capacity=RING_BUFFER_SIZE):
+        super().__init__()
+        self.lines = collections.deque(maxlen=capacity)
+        self.seq = 0
+
+    def emit(self, record):
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        self.seq += 1
+        self.lines.append((self.seq, line))
+
+    def since(self, seq):
+        """Return (latest seq, [lines newer than seq])."""
+        lines = [line for s, line in list(self.lines) if s > seq]
+        return self.seq, lines
+
+    def tail(self, n=50):
+        return [line for _, line in list(self.lines)[-n:]]
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread.
+
+    The stock handler formats every record before enqueueing it, which would put
+    the formatting cost back on the caller.
+    """
+
+    def prepare(self, record):
+        if record.exc_info:
+            # Tracebacks reference frames that may change; render them now.
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self.queue.put_nowait(record)
+
+
+class LoggingPipeline:
+    """Handle returned by configure(); owns the listener thread."""
+
+    def __init__(self, listener, handler, ring):
+        self.listener = listener
+        self.handler = handler
+        self.ring = ring
+
+    def stop(self):
+        """Flush pending records and detach the queue handler."""
+        self.listener.stop()
+        logging.getLogger('chord').removeHandler(self.handler)
+
+
+_lock = threading.Lock()
+_pipeline = None
+
+
+def configure(level=logging.INFO, levels=None, handlers=None, ring_buffer=RING_BUFFER_SIZE,
+              key_rate=None, key_sample=None, fmt=LOG_FORMAT):
+    """Route the ``chord`` loggers through a background queue listener.
+
+    level       -- default level for all chord categories
+    levels      -- per-category overrides, e.g. {KEYS: logging.WARNING}
+    handlers    -- output handlers run on the listener thread (default: stderr)
+    ring_buffer -- size of the in-memory buffer for the GUI (0 disables it)
+    key_rate    -- max per-key records per second (token bucket), or None
+    key_sample  -- keep one of every N per-key records, or None
+
+    Returns a LoggingPipeline; calling configure() again replaces it.
+    """
+    global _pipeline
+    with _lock:
+        if _pipeline is not None:
+            _pipeline.stop()
+        formatter = logging.Formatter(fmt)
+        handlers = list(handlers) if handlers is not None else [logging.StreamHandler()]
+        ring = RingBufferHandler(ring_buffer) if ring_buffer else None
+        if ring is not None:
+            handlers.append(ring)
+        for h in handlers:
+            if h.formatter is None:
+                h.setFormatter(formatter)
+        q = queue.SimpleQueue()
+        handler = LazyQueueHandler(q)
+        root = logging.getLogger('chord')
+        root.setLevel(level)
+        root.propagate = False
+        root.addHandler(handler)
+        for name in (NODE, TRANSFER, KEYS, DHT, MAINTENANCE, NET):
+            logging.getLogger(name).setLevel(logging.NOTSET)
+        for name, lvl in (levels or {}).items():
+            logging.getLogger(name).setLevel(lvl)
+        keys = logging.getLogger(KEYS)
+        for f in list(keys.filters):
+            if isinstance(f, (RateLimitFilter, SampleFilter)):
+                keys.removeFilter(f)
+        if key_sample:
+            keys.addFilter(SampleFilter(key_sample))
+        if key_rate:
+            keys.addFilter(RateLimitFilter(key_rate))
+        listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+        listener.start()
+        _pipeline = LoggingPipeline(listener, handler, ring)
+        return _pipeline
+
+
+def ring_buffer():
+    """The RingBufferHandler of the active pipeline, or None."""
+    return _pipeline.ring if _pipeline is not None else None
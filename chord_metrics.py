@@ -0,0 +1,246 @@
+# chord_metrics.py
+"""Low-overhead metrics for the Chord DHT with a Prometheus text exporter.
+
+Counters and histograms are plain Python objects updated without locks on the
+hot path (a lost increment under heavy thread contention is acceptable for
+monitoring). A MetricsRegistry renders them in the Prometheus text exposition
+format, either to a file or over a small local HTTP endpoint.
+"""
+
+import bisect
+import functools
+import threading
+import time
+
+HOP_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 12, 16, 20, 24, 32)
+LATENCY_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0)
+
+
+def percentile(values, q):
+    """The q-quantile (0 <= q <= 1) of values by the nearest-rank method; 0.0 if empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    body = ','.join(f'{k}="{str(v)}"' for k, v in labels)
+    return '{' + body + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            yield f"{name}_bucket", labels + (('le', _format_value(bound)),), cumulative
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, self.count
+
+
+class MetricsRegistry:
+    """Named metric families, each holding one series per label set."""
+
+    def __init__(self):
+        self._families = {}  # name -> [type, help, {labels: metric}]
+        self._callbacks = {}  # name -> [type, help, fn]
+        self._lock = threading.Lock()
+
+    def _series(self, kind, name, help_, labels, factory):
+        key = tuple(sorted(labels.items()))
+        family = self._families.get(name)
+        if family is None or key not in family[2]:
+            with self._lock:
+                family = self._families.setdefault(name, [kind, help_, {}])
+                if family[0] != kind:
+                    raise ValueError(f"Metric {name} already registered as a {family[0]}.")
+                family[2].setdefault(key, factory())
+        return family[2][key]
+
+    def counter(self, name, help_, **labels):
+        return self._series('counter', name, help_, labels, Counter)
+
+    def gauge(self, name, help_, **labels):
+        return self._series('gauge', name, help_, labels, Gauge)
+
+    def histogram(self, name, help_, buckets=LATENCY_BUCKETS, **labels):
+        return self._series('histogram', name, help_, labels, lambda: Histogram(buckets))
+
+    def gauge_callback(self, name, help_, fn):
+        """Register a gauge computed at render time; fn returns [(labels dict, value)]."""
+        self._callbacks[name] = ['gauge', help_, fn]
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            families = [(name, f[0], f[1], list(f[2].items())) for name, f in self._families.items()]
+        for name, kind, help_, series in sorted(families):
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in series:
+                for sample, sample_labels, value in metric.samples(name, labels):
+                    lines.append(f"{sample}{_format_labels(sample_labels)} {_format_value(value)}")
+        for name, (kind, help_, fn) in sorted(self._callbacks.items()):
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in fn():
+                lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            f.write(self.render())
+
+    def serve(self, port=0, host='127.0.0.1'):
+        """Serve /metrics over HTTP from a daemon thread; returns the server."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='chord-metrics', daemon=True).start()
+        return server
+
+
+class InstrumentedLock:
+    """threading.Lock wrapper that records acquire wait time and hold time."""
+
+    def __init__(self, wait_histogram, hold_histogram):
+        self._lock = threading.Lock()
+        self._wait = wait_histogram
+        self._hold = hold_histogram
+        self._acquired_at = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        if acquired:
+            self._acquired_at = now = time.perf_counter()
+            self._wait.observe(now - start)
+        return acquired
+
+    def release(self):
+        self._hold.observe(time.perf_counter() - self._acquired_at)
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def timed(histogram):
+    """Decorator for methods: observe their latency in self.metrics.<histogram>."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(self, *args, **kwargs)
+            finally:
+                getattr(self.metrics, histogram).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+class ChordMetrics:
+    """The series the DHT and its nodes update on their hot paths."""
+
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else MetricsRegistry()
+        r = self.registry
+        self.lookup_hops = r.histogram('chord_lookup_hops', "Finger hops per lookup.", HOP_BUCKETS)
+        self.store_seconds = r.histogram('chord_store_seconds', "DHT.store latency.")
+        self.retrieve_seconds = r.histogram('chord_retrieve_seconds', "DHT.retrieve latency.")
+        self.multi_store_seconds = r.histogram('chord_multi_store_seconds', "DHT.multi_store latency.")
+        self.multi_get_seconds = r.histogram('chord_multi_get_seconds', "DHT.multi_get latency.")
+        self._transfers = {}
+
+    def lock(self, kind):
+        """Return an InstrumentedLock reporting under lock=kind."""
+        wait = self.registry.histogram('chord_lock_wait_seconds', "Time spent waiting for a lock.", lock=kind)
+        hold = self.registry.histogram('chord_lock_hold_seconds', "Time a lock was held.", lock=kind)
+        return InstrumentedLock(wait, hold)
+
+    def keys_transferred(self, path, count):
+        """Count keys handed between nodes by notify, move_keys or leave."""
+        counter = self._transfers.get(path)
+        if counter is None:
+            counter = self._transfers[path] = self.registry.counter(
+                'chord_keys_transferred_total', "Keys copied between nodes on membership changes.", path=path)
+        counter.inc(count)
+
+    def watch_dht(self, dht):
+        """Export per-node key counts and ring size, read at render time."""
+        self.registry.gauge_callback(
+            'chord_node_keys', "Keys stored on each node, replicas included.",
+            lambda: [({'node': n.id}, len(n.data)) for n in dht.membership.nodes])
+        self.registry.gauge_callback(
+            'chord_ring_nodes', "Nodes in the ring.", lambda: [({}, len(dht.membership))])
+
+    def render(self):
+        return self.registry.render()
+
+    def write(self, path):
+        self.registry.write(path)
+
+    def serve(self, port=0, host='127.0.0.1'):
+        return self.registry.serve(port, host)
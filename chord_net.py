@@ -0,0 +1,812 @@
+# chord_net.py
+"""Networked mode: every Chord node is an asyncio TCP server on localhost.
+
+Nodes talk to each other only through RPCs (find_successor, notify, store,
+retrieve and the maintenance calls), so message costs can be measured and tuned.
+The wire format is a 4-byte big-endian length followed by a chord_codec
+payload: [request id, op, args] for requests and [request id, ok, result] for
+responses. Connections are persistent and pooled per peer, requests are
+pipelined (many in flight per connection, matched by id), and frames written in
+the same event-loop iteration are coalesced into one write.
+
+NetNode is its own implementation of the Chord protocol over RPC, not a
+transport under chord_dht.Node: it has no Handoff objects, quorum levels or
+successor-list failover for client requests. It does share the store and the
+last-writer-wins rule. Every value travels with its write version (entries on
+the wire are [key, version, value, key id]), so a key copied by a join, a
+notify or a leave never overwrites a newer write. An owner also forwards
+writes for a range it just handed to a new predecessor, and a leaving node
+forwards writes to its successor until it stops.
+
+The in-process DHT in chord_dht.py remains the fast path; this module is for
+running a real multi-process cluster on one machine:
+
+    python chord_net.py cluster --nodes 8
+    python chord_net.py bench --nodes 8 --keys 2000
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import random
+import socket
+import struct
+import sys
+import time
+
+from chord_codec import CodecError, decode, encode
+from chord_dht import FINGERS_PER_ROUND, R, hash_key, in_interval
+from chord_storage import KeyStore, Versioned, newer_entries, plain, version_of
+
+log = logging.getLogger('chord.net')
+
+HOST = '127.0.0.1'
+FRAME = struct.Struct('>I')
+MAX_FRAME = 64 * 1024 * 1024
+NET_M = 32  # Identifier bits for networked clusters
+NET_MAINTENANCE_PERIOD = 0.5  # Seconds between maintenance rounds of one node
+RPC_TIMEOUT = 5.0
+POOL_SIZE = 2  # Connections kept per peer
+MAX_HOPS = 64  # Give up on a lookup after this many hops
+BASE_PORT = 7400
+
+
+class RPCError(Exception):
+    """A peer reported an error, timed out or could not be reached."""
+
+
+def _ref(value):
+    """Normalize a decoded node reference ([id, port] list) to a tuple."""
+    return tuple(value) if value is not None else None
+
+
+def _to_wire(entries):
+    """(key, stored value, key id) entries as [key, version, value, key id] rows."""
+    return [[key, version_of(value), plain(value), key_id] for key, value, key_id in entries]
+
+
+def _from_wire(rows):
+    return [(key, Versioned(version, value), key_id) for key, version, value, key_id in rows]
+
+
+async def read_frame(reader):
+    header = await reader.readexactly(FRAME.size)
+    (length,) = FRAME.unpack(header)
+    if length > MAX_FRAME:
+        raise RPCError(f"Frame of {length} bytes exceeds the limit.")
+    return await reader.readexactly(length)
+
+
+class FrameWriter:
+    """Buffers outgoing frames and flushes them once per event-loop iteration."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self._out = []
+        self._scheduled = False
+
+    def send(self, payload):
+        self._out.append(FRAME.pack(len(payload)))
+        self._out.append(payload)
+        if not self._scheduled:
+            self._scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+
+    def _flush(self):
+        self._scheduled = False
+        if self._out and not self.writer.is_closing():
+            self.writer.write(b''.join(self._out))
+        self._out.clear()
+
+
+class Connection:
+    """One client connection carrying many pipelined requests."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.out = FrameWriter(writer)
+        self.closed = False
+        self._pending = {}  # request id -> future
+        self._ids = itertools.count(1)
+        self._reader_task = asyncio.get_running_loop().create_task(self._read_loop())
+
+    @classmethod
+    async def open(cls, port):
+        reader, writer = await asyncio.open_connection(HOST, port)
+        return cls(reader, writer)
+
+    @property
+    def in_flight(self):
+        return len(self._pending)
+
+    async def call(self, op, args, timeout=RPC_TIMEOUT):
+        if self.closed:
+            raise RPCError("Connection closed.")
+        req_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = future
+        self.out.send(encode([req_id, op, args]))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise RPCError(f"{op} timed out.") from None
+        finally:
+            self._pending.pop(req_id, None)
+
+    async def _read_loop(self):
+        try:
+            while True:
+                req_id, ok, result = decode(await read_frame(self.reader))
+                future = self._pending.get(req_id)
+                if future is not None and not future.done():
+                    if ok:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(RPCError(result))
+        except (asyncio.IncompleteReadError, ConnectionError, OSError, CodecError, RPCError):
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.out.writer.close()
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(RPCError("Connection lost."))
+
+
+class ConnectionPool:
+    """Persistent connections per peer port, up to `size` each.
+
+    Calls go to the least-loaded connection; another one is opened only when
+    every existing connection already has requests in flight.
+    """
+
+    def __init__(self, size=POOL_SIZE):
+        self.size = size
+        self.calls = 0
+        self._conns = {}  # port -> [Connection]
+        self._locks = {}
+
+    async def _connection(self, port):
+        conns = [c for c in self._conns.get(port, ()) if not c.closed]
+        best = min(conns, key=lambda c: c.in_flight) if conns else None
+        if best is not None and (best.in_flight == 0 or len(conns) >= self.size):
+            return best
+        async with self._locks.setdefault(port, asyncio.Lock()):
+            conns = [c for c in self._conns.get(port, ()) if not c.closed]
+            if len(conns) < self.size:
+                try:
+                    conns.append(await Connection.open(port))
+                except OSError as exc:
+                    raise RPCError(f"Cannot reach port {port}: {exc}") from None
+            self._conns[port] = conns
+            return min(conns, key=lambda c: c.in_flight)
+
+    async def call(self, port, op, *args, timeout=RPC_TIMEOUT):
+        self.calls += 1
+        conn = await self._connection(port)
+        return await conn.call(op, list(args), timeout)
+
+    def close(self):
+        for conns in self._conns.values():
+            for conn in conns:
+                conn.close()
+        self._conns.clear()
+
+
+class NetNode:
+    """A Chord node whose neighbours are (id, port) references reached over RPC."""
+
+    def __init__(self, node_id, port, m=NET_M, r=R, period=NET_MAINTENANCE_PERIOD,
+                 pool_size=POOL_SIZE):
+        self.id = node_id
+        self.port = port
+        self.ref = (node_id, port)
+        self.m = m
+        self.r = r
+        self.period = period
+        self.successor = self.ref
+        self.successor_list = []
+        self.predecessor = None
+        self.finger = [None] * m
+        self.next_finger = 0
+        self.data = KeyStore()
+        self.trim_pending = False  # A trim after a predecessor change is still to be done
+        self.leaving = False  # Keys were handed to the successor; forward writes there
+        self.pool = ConnectionPool(pool_size)
+        self.served = {}  # op -> requests handled
+        self.server = None
+        self._maintenance = None
+        self.handlers = {
+            'ping': self.rpc_ping,
+            'state': self.rpc_state,
+            'step': self.rpc_step,
+            'find_successor': self.rpc_find_successor,
+            'notify': self.rpc_notify,
+            'transfer': self.rpc_transfer,
+            'trim': self.rpc_trim,
+            'predecessor_left': self.rpc_predecessor_left,
+            'successor_left': self.rpc_successor_left,
+            'store': self.rpc_store,
+            'store_many': self.rpc_store_many,
+            'retrieve': self.rpc_retrieve,
+            'retrieve_many': self.rpc_retrieve_many,
+            'put': self.rpc_put,
+            'put_many': self.rpc_put_many,
+            'get': self.rpc_get,
+            'get_many': self.rpc_get_many,
+            'stats': self.rpc_stats,
+        }
+
+    # -- Transport -------------------------------------------------------
+
+    async def call(self, ref, op, *args):
+        """Call `op` on the node `ref`; calls to ourselves skip the network."""
+        if ref == self.ref:
+            return await self.dispatch(op, list(args))
+        return await self.pool.call(ref[1], op, *args)
+
+    async def dispatch(self, op, args):
+        handler = self.handlers.get(op)
+        if handler is None:
+            raise RPCError(f"Unknown op {op!r}.")
+        self.served[op] = self.served.get(op, 0) + 1
+        result = handler(*args)
+        if asyncio.iscoroutine(result):
+            result = await result
+        return result
+
+    async def _serve_connection(self, reader, writer):
+        out = FrameWriter(writer)
+        tasks = set()
+        try:
+            while True:
+                req_id, op, args = decode(await read_frame(reader))
+                # Each request runs as its own task so pipelined requests overlap.
+                task = asyncio.create_task(self._respond(out, req_id, op, args))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError, CodecError, RPCError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, out, req_id, op, args):
+        try:
+            payload = encode([req_id, True, await self.dispatch(op, args)])
+        except Exception as exc:
+            payload = encode([req_id, False, f"{type(exc).__name__}: {exc}"])
+        out.send(payload)
+
+    # -- Routing ---------------------------------------------------------
+
+    def closest_preceding(self, key_id):
+        for ref in reversed(self.finger):
+            if ref and in_interval(self.id, key_id, ref[0]):
+                return ref
+        # The successor pointer is fresher than the list after a join next to us.
+        for ref in (*reversed(self.successor_list), self.successor):
+            if in_interval(self.id, key_id, ref[0]):
+                return ref
+        return self.ref
+
+    def forget(self, ref):
+        """Drop a dead node from the finger table and successor list."""
+        self.finger = [None if f == ref else f for f in self.finger]
+        self.successor_list = [s for s in self.successor_list if s != ref]
+        if self.successor == ref:
+            self.successor = self.successor_list[0] if self.successor_list else self.ref
+
+    async def find_successor(self, key_id):
+        """Iterative lookup: one `step` RPC per hop, starting locally."""
+        current = self.ref
+        for _ in range(MAX_HOPS):
+            try:
+                done, ref = await self.call(current, 'step', key_id)
+            except RPCError:
+                if current == self.ref:
+                    raise
+                self.forget(current)
+                current = self.ref
+                continue
+            if done:
+                return _ref(ref)
+            current = _ref(ref)
+        raise RPCError(f"Lookup for {key_id} exceeded {MAX_HOPS} hops.")
+
+    # -- RPC handlers ----------------------------------------------------
+
+    def rpc_ping(self):
+        return True
+
+    def rpc_state(self):
+        return [self.ref, self.successor, self.predecessor, self.successor_list]
+
+    def rpc_step(self, key_id):
+        """One lookup hop: [True, owner] if our successor owns key_id, else [False, next hop]."""
+        if in_interval(self.id, self.successor[0], key_id, inclusive_end=True):
+            return [True, self.successor]
+        nxt = self.closest_preceding(key_id)
+        if nxt == self.ref:
+            return [True, self.successor]
+        return [False, nxt]
+
+    async def rpc_find_successor(self, key_id):
+        return await self.find_successor(key_id)
+
+    async def rpc_notify(self, ref):
+        ref = _ref(ref)
+        if self.predecessor is None or in_interval(self.predecessor[0], self.id, ref[0]):
+            self.predecessor = ref
+            if ref != self.ref:
+                # Send the new predecessor the keys it owns or replicates, then
+                # drop what falls outside our replica window, as Node.notify does.
+                entries = self.data.range_items(self.id, ref[0])
+                if entries:
+                    await self.call(ref, 'store_many', _to_wire(entries))
+                self.trim_pending = True
+                await self.trim()
+                # Our replicas' windows shrank by one node as well.
+                for replica in self._replicas():
+                    try:
+                        await self.call(replica, 'trim')
+                    except RPCError:
+                        pass
+        return True
+
+    async def replica_window_start(self):
+        """Id of our R-th predecessor, so we hold exactly the keys in (it, self]; None if unknown.
+
+        None is also returned when the walk comes back to us: a ring of R
+        nodes or fewer, where every node holds every key.
+        """
+        ref = self.predecessor
+        for i in range(self.r):
+            if ref is None:
+                return None
+            if ref == self.ref:
+                self.trim_pending = False  # Small ring: nothing to drop
+                return None
+            if i == self.r - 1:
+                return ref[0]
+            try:
+                ref = _ref((await self.call(ref, 'state'))[2])
+            except RPCError:
+                return None
+
+    async def trim(self):
+        """Drop keys that fall outside this node's replica window.
+
+        A new predecessor may not know its own predecessor yet, which leaves
+        the window unknown; trim_pending then stays set and maintenance retries.
+        """
+        start = await self.replica_window_start()
+        if start is None:
+            return
+        self.trim_pending = False
+        dropped = self.data.pop_range(self.id, start)
+        if dropped:
+            log.info("Node %s: Dropped %d keys outside its replica window.", self.id, len(dropped))
+
+    async def rpc_trim(self):
+        self.trim_pending = True
+        await self.trim()
+        return True
+
+    def rpc_predecessor_left(self, ref, predecessor):
+        """Our predecessor `ref` left; its own predecessor is ours now."""
+        if self.predecessor == _ref(ref):
+            self.predecessor = _ref(predecessor)
+        self.forget(_ref(ref))
+        return True
+
+    def rpc_successor_left(self, ref, successor):
+        """Our successor `ref` left; its own successor is ours now."""
+        ref, successor = _ref(ref), _ref(successor)
+        if self.successor == ref:
+            self.successor = successor
+            self.successor_list = [successor] + [s for s in self.successor_list if s != successor]
+        self.forget(ref)
+        return True
+
+    def rpc_transfer(self, ref):
+        """Keys a joining node `ref` (our new predecessor) owns or replicates."""
+        return _to_wire(self.data.range_items(self.id, ref[0]))
+
+    def store_many(self, entries):
+        """Store (key, Versioned, key id) entries; ones older than the copy held are skipped."""
+        entries = newer_entries(self.data, entries)
+        if entries:
+            self.data.put_many(entries)
+        return entries
+
+    async def rpc_store(self, key, version, value, key_id):
+        return await self.rpc_store_many([[key, version, value, key_id]])
+
+    async def rpc_store_many(self, rows):
+        self.store_many(_from_wire(rows))
+        if self.leaving and self.successor != self.ref:
+            await self.call(self.successor, 'store_many', rows)
+        return True
+
+    def rpc_retrieve(self, key):
+        return plain(self.data.get(key))
+
+    def rpc_retrieve_many(self, keys):
+        return {k: plain(self.data[k]) for k in keys if k in self.data}
+
+    def _replicas(self):
+        return [s for s in self.successor_list if s != self.ref][:self.r - 1]
+
+    async def rpc_put(self, key, version, value, key_id):
+        return await self.rpc_put_many([[key, version, value, key_id]])
+
+    async def rpc_put_many(self, rows, forwarded=False):
+        """Store as owner and write to the replicas in parallel.
+
+        Rows for keys outside (predecessor, self] belong to a node that joined
+        in front of us after the client looked us up; it gets them too (one
+        hop only, `forwarded`), as does our successor if we are leaving.
+        """
+        self.store_many(_from_wire(rows))
+        targets = self._replicas()
+        if self.leaving and self.successor != self.ref and self.successor not in targets:
+            targets.append(self.successor)
+        calls = [self.call(s, 'store_many', rows) for s in targets]
+        pred = self.predecessor
+        if not forwarded and pred and pred != self.ref:
+            moved = [row for row in rows if not in_interval(pred[0], self.id, row[3], inclusive_end=True)]
+            if moved:
+                calls.append(self.call(pred, 'put_many', moved, True))
+        await asyncio.gather(*calls, return_exceptions=True)
+        return True
+
+    async def rpc_get(self, key):
+        value = plain(self.data.get(key))
+        if value is not None:
+            return value
+        for ref in self._replicas():
+            try:
+                value = await self.call(ref, 'retrieve', key)
+            except RPCError:
+                continue
+            if value is not None:
+                return value
+        return None
+
+    async def rpc_get_many(self, keys):
+        result = {k: plain(self.data[k]) for k in keys if k in self.data}
+        missing = [k for k in keys if k not in result]
+        for ref in self._replicas():
+            if not missing:
+                break
+            try:
+                result.update(await self.call(ref, 'retrieve_many', missing))
+            except RPCError:
+                continue
+            missing = [k for k in missing if k not in result]
+        return result
+
+    def rpc_stats(self):
+        return {'id': self.id, 'port': self.port, 'keys': len(self.data),
+                'served': self.served, 'calls_made': self.pool.calls}
+
+    # -- Maintenance -----------------------------------------------------
+
+    async def stabilize(self):
+        state = None
+        for candidate in [self.successor] + self.successor_list:
+            try:
+                state = await self.call(candidate, 'state')
+                break
+            except RPCError:
+                self.forget(candidate)
+        if state is None:
+            self.successor = self.ref
+            return
+        succ, _, x, succ_list = _ref(state[0]), state[1], _ref(state[2]), state[3]
+        if x and x != self.ref and (succ == self.ref or in_interval(self.id, succ[0], x[0])):
+            try:
+                state = await self.call(x, 'state')
+                succ, succ_list = x, state[3]
+            except RPCError:
+                pass
+        self.successor = succ
+        if succ != self.ref:
+            await self.call(succ, 'notify', self.ref)
+        new_list = [succ] if succ != self.ref else []
+        for ref in map(_ref, succ_list):
+            if len(new_list) >= self.r or ref == self.ref or ref in new_list:
+                break
+            new_list.append(ref)
+        self.successor_list = new_list
+
+    async def fix_fingers(self):
+        lookups = 0
+        for _ in range(self.m):
+            if lookups >= FINGERS_PER_ROUND:
+                break
+            i = self.next_finger
+            self.next_finger = (i + 1) % self.m
+            start = (self.id + 2 ** i) % (2 ** self.m)
+            if in_interval(self.id, self.successor[0], start, inclusive_end=True):
+                self.finger[i] = self.successor
+            else:
+                self.finger[i] = await self.find_successor(start)
+                lookups += 1
+
+    async def check_predecessor(self):
+        if self.predecessor and self.predecessor != self.ref:
+            try:
+                await self.call(self.predecessor, 'ping')
+            except RPCError:
+                self.predecessor = None
+
+    async def _maintenance_loop(self):
+        rng = random.Random(self.id)
+        while True:
+            await asyncio.sleep(self.period * rng.uniform(0.8, 1.2))
+            try:
+                await self.stabilize()
+                await self.fix_fingers()
+                await self.check_predecessor()
+                if self.trim_pending:
+                    await self.trim()
+            except RPCError as exc:
+                log.info("Node %s: Maintenance round failed: %s", self.id, exc)
+
+    # -- Lifecycle -------------------------------------------------------
+
+    async def start(self, bootstrap_port=None):
+        self.server = await asyncio.start_server(self._serve_connection, HOST, self.port)
+        if bootstrap_port is not None:
+            await self.join(bootstrap_port)
+        self._maintenance = asyncio.create_task(self._maintenance_loop())
+        log.info("Node %s: Serving on port %s.", self.id, self.port)
+
+    async def join(self, bootstrap_port):
+        self.successor = _ref(await self.pool.call(bootstrap_port, 'find_successor', self.id))
+        self.store_many(_from_wire(await self.call(self.successor, 'transfer', self.ref)))
+        await self.stabilize()
+
+    async def leave(self):
+        """Leave gracefully: relink our neighbours, hand our keys on, then stop.
+
+        Every key held goes to each node of the successor list, which covers
+        the replica windows that grow by one node; they trim the surplus. Writes
+        that reach us before we stop are forwarded to the successor.
+        """
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+            self._maintenance = None
+        successor, pred = self.successor, self.predecessor
+        if successor != self.ref:
+            self.leaving = True
+            await self.call(successor, 'predecessor_left', self.ref, pred)
+            if pred and pred != self.ref:
+                try:
+                    await self.call(pred, 'successor_left', self.ref, successor)
+                except RPCError:
+                    pass
+            rows = _to_wire(self.data.range_items(self.id, self.id))  # The whole store
+            receivers = [successor] + [s for s in self.successor_list if s not in (successor, self.ref)]
+            await asyncio.gather(*(self.call(s, 'store_many', rows) for s in receivers),
+                                 return_exceptions=True)
+            await asyncio.gather(*(self.call(s, 'trim') for s in receivers), return_exceptions=True)
+            log.info("Node %s: Left, handing %d keys to Node %s.", self.id, len(rows), successor[0])
+        await self.stop()
+
+    async def stop(self):
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.pool.close()
+
+
+def run_node(node_id, port, bootstrap_port=None, m=NET_M, r=R, period=NET_MAINTENANCE_PERIOD):
+    """Process entry point: serve one node until the process is terminated."""
+    async def main():
+        node = NetNode(node_id, port, m, r, period)
+        await node.start(bootstrap_port)
+        await node.server.serve_forever()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+def _wait_for_port(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((HOST, port), timeout=0.2):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def start_cluster(nodes, base_port=BASE_PORT, m=NET_M, r=R, period=NET_MAINTENANCE_PERIOD, seed=None):
+    """Start one process per node on consecutive ports; returns [(process, node id, port)]."""
+    ctx = multiprocessing.get_context('spawn')
+    rng = random.Random(seed)
+    ids = rng.sample(range(2 ** m), nodes) if 2 ** m <= 1 << 62 else [rng.getrandbits(m) for _ in range(nodes)]
+    cluster = []
+    for i, node_id in enumerate(ids):
+        port = base_port + i
+        bootstrap = base_port if i else None
+        proc = ctx.Process(target=run_node, args=(node_id, port, bootstrap, m, r, period), daemon=True)
+        proc.start()
+        if not _wait_for_port(port):
+            stop_cluster(cluster + [(proc, node_id, port)])
+            raise RPCError(f"Node {node_id} did not start on port {port}.")
+        cluster.append((proc, node_id, port))
+    return cluster
+
+
+def stop_cluster(cluster):
+    for proc, _, _ in cluster:
+        proc.terminate()
+    for proc, _, _ in cluster:
+        proc.join(timeout=5)
+
+
+class ClusterClient:
+    """Client for a running cluster; routes through any node over pooled connections."""
+
+    def __init__(self, ports, m=NET_M, pool_size=POOL_SIZE, seed=None):
+        self.ports = list(ports)
+        self.m = m
+        self.pool = ConnectionPool(pool_size)
+        self.rng = random.Random(seed)
+        self._last_version = 0
+
+    def next_version(self):
+        """Return a write version: wall-clock nanoseconds, strictly increasing (as DHT.next_version)."""
+        self._last_version = max(time.time_ns(), self._last_version + 1)
+        return self._last_version
+
+    async def owner(self, key_id):
+        return _ref(await self.pool.call(self.rng.choice(self.ports), 'find_successor', key_id))
+
+    async def store(self, key, value):
+        key_id = hash_key(key, self.m)
+        owner = await self.owner(key_id)
+        return await self.pool.call(owner[1], 'put', key, self.next_version(), value, key_id)
+
+    async def retrieve(self, key):
+        owner = await self.owner(hash_key(key, self.m))
+        return await self.pool.call(owner[1], 'get', key)
+
+    async def _group(self, key_ids):
+        """Group sorted key ids by owner: one lookup plus one state call per owner range."""
+        groups = []
+        low = owner = None
+        for key_id in sorted(key_ids):
+            if owner is None or not in_interval(low, owner[0], key_id, inclusive_end=True):
+                owner = await self.owner(key_id)
+                pred = _ref((await self.pool.call(owner[1], 'state'))[2])
+                low = pred[0] if pred else (key_id - 1) % (2 ** self.m)
+                groups.append((owner, []))
+            groups[-1][1].append(key_id)
+        return groups
+
+    async def multi_store(self, items):
+        if hasattr(items, 'items'):
+            items = items.items()
+        version = self.next_version()
+        by_id = {}
+        for k, v in items:
+            by_id.setdefault(hash_key(k, self.m), []).append((k, v))
+        calls = []
+        for owner, key_ids in await self._group(by_id):
+            rows = [[k, version, v, key_id] for key_id in key_ids for k, v in by_id[key_id]]
+            calls.append(self.pool.call(owner[1], 'put_many', rows))
+        await asyncio.gather(*calls)
+        return True
+
+    async def multi_get(self, keys):
+        keys = list(keys)
+        by_id = {}
+        for k in keys:
+            by_id.setdefault(hash_key(k, self.m), []).append(k)
+        result = dict.fromkeys(keys)
+        groups = await self._group(by_id)
+        replies = await asyncio.gather(*(
+            self.pool.call(owner[1], 'get_many', [k for key_id in key_ids for k in by_id[key_id]])
+            for owner, key_ids in groups))
+        for found in replies:
+            result.update(found)
+        return result
+
+    async def stats(self):
+        return await asyncio.gather(*(self.pool.call(port, 'stats') for port in self.ports))
+
+    def close(self):
+        self.pool.close()
+
+
+async def _bench(ports, keys, m, concurrency):
+    client = ClusterClient(ports, m, seed=1)
+    names = [f"key-{i}" for i in range(keys)]
+    report = {'nodes': len(ports), 'keys': keys, 'concurrency': concurrency}
+
+    async def run_ops(fn):
+        queue = iter(names)
+        latencies = []
+
+        async def worker():
+            for k in queue:
+                t = time.perf_counter()
+                await fn(k)
+                latencies.append(time.perf_counter() - t)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {'ops_per_s': len(names) / elapsed,
+                'p50_ms': latencies[len(latencies) // 2] * 1000,
+                'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000}
+
+    report['store'] = await run_ops(lambda k: client.store(k, k))
+    report['retrieve'] = await run_ops(client.retrieve)
+    t = time.perf_counter()
+    await client.multi_store({k: k for k in names})
+    report['multi_store_keys_per_s'] = keys / (time.perf_counter() - t)
+    t = time.perf_counter()
+    found = await client.multi_get(names)
+    report['multi_get_keys_per_s'] = keys / (time.perf_counter() - t)
+    report['missing'] = sum(1 for k in names if found[k] != k)
+    stats = await client.stats()
+    report['rpcs_served'] = sum(sum(s['served'].values()) for s in stats)
+    report['client_rpcs'] = client.pool.calls
+    client.close()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Chord nodes as local TCP servers.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name in ('cluster', 'bench'):
+        p = sub.add_parser(name)
+        p.add_argument('--nodes', type=int, default=8)
+        p.add_argument('--base-port', type=int, default=BASE_PORT)
+        p.add_argument('--m', type=int, default=NET_M)
+        p.add_argument('--r', type=int, default=R)
+        p.add_argument('--period', type=float, default=NET_MAINTENANCE_PERIOD)
+        p.add_argument('--seed', type=int, default=1)
+    bench = sub.choices['bench']
+    bench.add_argument('--keys', type=int, default=2000)
+    bench.add_argument('--concurrency', type=int, default=16)
+    bench.add_argument('--settle', type=float, default=3.0, help="seconds to let the ring stabilize")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s %(levelname)s:%(message)s')
+    cluster = start_cluster(args.nodes, args.base_port, args.m, args.r, args.period, args.seed)
+    ports = [port for _, _, port in cluster]
+    try:
+        if args.command == 'cluster':
+            print(f"Cluster running on ports {ports[0]}-{ports[-1]}; Ctrl-C to stop.", file=sys.stderr)
+            while True:
+                time.sleep(1)
+        time.sleep(args.settle)
+        report = asyncio.run(_bench(ports, args.keys, args.m, args.concurrency))
+        print(json.dumps(report, indent=2, sort_keys=True))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_cluster(cluster)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+# chord_quorum.py
+"""Consistency levels, hedged replica reads and read repair.
+
+Every value the DHT writes is wrapped in a Versioned carrying a timestamp
+version, and nodes never replace a newer version with an older one, so
+whichever replica holds the highest version has the latest write.
+
+Reads ask the first `needed` replicas at once. A replica that is free right
+now (its lock can be taken without waiting) answers inline, which keeps the
+common in-memory read cheap; a busy one is read on a shared worker pool, in
+parallel with the others. If they have not all answered within a latency
+threshold (a high percentile of recent replica reads), one more replica is
+asked, so a single slow replica no longer adds its full delay. The newest version among the answers wins, and
+replicas that answered with an older version are repaired in the background.
+Writes are applied synchronously to the first `needed` live replicas and
+handed to the pool for the rest.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from chord_metrics import percentile
+from chord_storage import version_of
+
+# Consistency levels: how many of the R replicas must answer.
+ONE = 'one'
+QUORUM = 'quorum'
+ALL = 'all'
+
+HEDGE_PERCENTILE = 0.95  # Replica read latency percentile that triggers a hedged request
+HEDGE_DEFAULT_DELAY = 0.002  # Seconds to wait before hedging until enough samples exist
+HEDGE_MIN_DELAY = 0.0001  # Never hedge sooner than this
+LATENCY_WINDOW = 1024  # Recent replica read latencies kept for the threshold
+REPLICA_WORKERS = 8  # Threads shared by all replica reads and background writes
+
+
+class ReplicaUnavailable(Exception):
+    """Raised by a replica that cannot serve a request (e.g. a failed node)."""
+
+
+class ReplicaBusy(Exception):
+    """Raised by a non-blocking replica read when the replica is locked."""
+
+
+def required(level, replicas):
+    """Number of replicas out of `replicas` that must answer at `level`."""
+    if level == ONE:
+        return min(1, replicas)
+    if level == QUORUM:
+        return replicas // 2 + 1
+    if level == ALL:
+        return replicas
+    raise ValueError(f"Unknown consistency level {level!r}.")
+
+
+class LatencyTracker:
+    """Sliding window of latencies with a cached percentile."""
+
+    def __init__(self, percentile=HEDGE_PERCENTILE, window=LATENCY_WINDOW):
+        self.percentile = percentile
+        self._samples = deque(maxlen=window)
+        self._threshold = HEDGE_DEFAULT_DELAY
+        self._since_update = 0
+
+    def record(self, seconds):
+        self._samples.append(seconds)
+        self._since_update += 1
+        if self._since_update >= 64:
+            self._since_update = 0
+            self._threshold = max(HEDGE_MIN_DELAY, percentile(self._samples, self.percentile))
+
+    def threshold(self):
+        return self._threshold
+
+
+class InlineExecutor:
+    """Executor that runs every task immediately in the caller, for deterministic runs."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except BaseException as exc:
+            future.set_exception(exc)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class ReplicaCoordinator:
+    """Runs consistency-level reads and writes against a replica set."""
+
+    def __init__(self, metrics, workers=REPLICA_WORKERS, percentile=HEDGE_PERCENTILE, executor=None):
+        self.metrics = metrics
+        self.workers = workers
+        self.latency = LatencyTracker(percentile)
+        self._pool = executor  # Created on first use unless one is supplied
+        self._pool_lock = threading.Lock()
+        self._busy = 0  # Reads running on the pool
+        r = metrics.registry
+        self.hedged = r.counter('chord_hedged_reads_total', "Extra replica reads sent after the hedge threshold.")
+        self.repairs = r.counter('chord_read_repairs_total', "Stale replicas rewritten after a read.")
+
+    def _executor(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='chord-replica')
+        return self._pool
+
+    def _read_one(self, node, key):
+        started = time.perf_counter()
+        stored = node.read(key)
+        self.latency.record(time.perf_counter() - started)
+        return stored
+
+    def _pooled_read(self, node, key):
+        try:
+            return self._read_one(node, key)
+        finally:
+            with self._pool_lock:
+                self._busy -= 1
+
+    def read(self, replicas, key, key_id, needed):
+        """Return the newest stored value (a Versioned, plain value or None).
+
+        Waits for `needed` answers; if they all lack the key, the remaining
+        replicas are asked too, matching the old first-non-None behaviour.
+        """
+        queue = list(replicas)
+        pending = {}
+        answers = []
+
+        def launch(may_inline=True):
+            # Keep starting replicas until one is in flight or has answered.
+            while queue:
+                node = queue.pop(0)
+                started = time.perf_counter()
+                try:
+                    answers.append((node, node.read(key, blocking=False)))
+                    self.latency.record(time.perf_counter() - started)
+                    return
+                except ReplicaBusy:
+                    pass
+                except ReplicaUnavailable:
+                    continue
+                with self._pool_lock:
+                    inline = may_inline and self._busy >= self.workers
+                    if not inline:
+                        self._busy += 1
+                if not inline:
+                    pending[self._executor().submit(self._pooled_read, node, key)] = node
+                    return
+                try:
+                    answers.append((node, self._read_one(node, key)))
+                    return
+                except ReplicaUnavailable:
+                    continue
+
+        def enough():
+            return len(answers) >= needed and (
+                not queue or any(stored is not None for _, stored in answers))
+
+        for _ in range(min(needed, len(queue))):
+            launch(may_inline=False)
+        hedge_at = time.monotonic() + self.latency.threshold()
+        hedged = False
+        while not enough():
+            if not pending:
+                if not queue:
+                    break
+                launch()
+                continue
+            timeout = None if hedged or not queue else max(0.0, hedge_at - time.monotonic())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                self.hedged.inc()
+                launch()
+                continue
+            for future in done:
+                node = pending.pop(future)
+                try:
+                    answers.append((node, future.result()))
+                except ReplicaUnavailable:
+                    launch()
+
+        if len(answers) < needed:
+            raise ReplicaUnavailable(f"Only {len(answers)} of {needed} replicas answered.")
+        best = max((stored for _, stored in answers), key=version_of, default=None)
+        if best is not None:
+            newest = version_of(best)
+            for node, stored in answers:
+                if version_of(stored) < newest:
+                    self.repairs.inc()
+                    self._executor().submit(self._repair, node, key, best, key_id)
+        return best
+
+    def _repair(self, node, key, stored, key_id):
+        if node.alive:
+            node.store(key, stored, key_id)
+
+    def write(self, replicas, key, stored, key_id, needed):
+        """Write to `needed` live replicas now and the rest in the background.
+
+        Returns the number of synchronous acknowledgements.
+        """
+        acks = 0
+        rest = []
+        for node in replicas:
+            if acks < needed and node.alive:
+                node.store(key, stored, key_id)
+                acks += 1
+            else:
+                rest.append(node)
+        if rest:
+            pool = self._executor()
+            for node in rest:
+                pool.submit(self._repair, node, key, stored, key_id)
+        return acks
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
@@ -0,0 +1,150 @@
+# chord_scheduler.py
+"""Maintenance schedulers that drive periodic Chord upkeep for every node.
+
+Nodes no longer own a thread. Instead the DHT hands each node to a scheduler,
+which calls ``node.maintain()`` (stabilize, fix_fingers, check_predecessor)
+once per period. Any object with ``register``/``unregister``/``stop`` can be
+plugged into ``DHT(scheduler=...)``.
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger('chord.maintenance')
+
+MAINTENANCE_PERIOD = 1.0  # Seconds between maintenance rounds of one node
+MAINTENANCE_JITTER = 0.2  # Fractional +/- jitter applied to every period
+MAINTENANCE_WORKERS = 4  # Worker threads shared by all nodes
+
+
+class MaintenanceScheduler:
+    """Interface for objects that run node maintenance rounds."""
+
+    def register(self, node, period=None):
+        raise NotImplementedError
+
+    def unregister(self, node):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+
+class ManualScheduler(MaintenanceScheduler):
+    """Runs no background work; maintenance happens only when run_round() is called.
+
+    Useful for batch jobs and tests that want to step the ring deterministically.
+    """
+
+    def __init__(self):
+        self.nodes = []
+
+    def register(self, node, period=None):
+        self.nodes.append(node)
+
+    def unregister(self, node):
+        if node in self.nodes:
+            self.nodes.remove(node)
+
+    def run_round(self, rounds=1):
+        """Run `rounds` maintenance rounds over every live registered node."""
+        for _ in range(rounds):
+            for node in list(self.nodes):
+                if node.alive:
+                    node.maintain()
+
+
+class ThreadPoolScheduler(MaintenanceScheduler):
+    """Timer-heap scheduler feeding a bounded worker pool.
+
+    A single dispatcher thread pops due nodes off a heap ordered by deadline and
+    submits their maintenance round to a fixed-size pool. Each node's next
+    deadline is only set once its current round has finished, so a node never
+    has two rounds in flight, and every period is jittered so rounds spread out
+    instead of firing in synchronized bursts.
+    """
+
+    def __init__(self, period=MAINTENANCE_PERIOD, jitter=MAINTENANCE_JITTER,
+                 workers=MAINTENANCE_WORKERS, seed=None):
+        self.period = period
+        self.jitter = jitter
+        self.workers = workers
+        self.rng = random.Random(seed)
+        self._periods = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._pool = None
+        self._dispatcher = None
+        self._stopped = False
+
+    def _next_delay(self, node):
+        period = self._periods[node]
+        return period * self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _push(self, node, delay):
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), node))
+
+    def _ensure_started(self):
+        if self._dispatcher is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix='chord-maint')
+            self._dispatcher = threading.Thread(target=self._dispatch_loop,
+                                                name='chord-maint-dispatch', daemon=True)
+            self._dispatcher.start()
+
+    def register(self, node, period=None):
+        with self._cond:
+            if self._stopped:
+                return
+            self._periods[node] = period if period is not None else self.period
+            # Random initial phase so nodes added together do not tick together.
+            self._push(node, self.rng.uniform(0, self._periods[node]))
+            self._ensure_started()
+            self._cond.notify()
+
+    def unregister(self, node):
+        with self._cond:
+            self._periods.pop(node, None)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._heap.clear()
+            self._periods.clear()
+            self._cond.notify()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+    def _dispatch_loop(self):
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, _, node = self._heap[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                if node not in self._periods or not node.alive:
+                    self._periods.pop(node, None)
+                    continue
+                self._pool.submit(self._run_round, node)
+
+    def _run_round(self, node):
+        try:
+            node.maintain()
+        except Exception:
+            log.exception("Scheduler: Maintenance of Node %s failed.", node.id)
+        finally:
+            with self._cond:
+                if not self._stopped and node in self._periods and node.alive:
+                    self._push(node, self._next_delay(node))
+                    self._cond.notify()
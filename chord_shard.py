@@ -0,0 +1,409 @@
+# chord_shard.py
+"""Multi-process sharded simulation of a large Chord ring.
+
+The identifier space is cut into one contiguous arc per worker process, chosen
+so every arc starts with roughly the same number of nodes. A worker owns the
+key stores of the nodes in its arc and a copy of the membership view (the
+sorted node ids), which it uses to route lookups along ideal finger tables and
+to place replicas without asking anyone.
+
+Work proceeds in rounds. In a workload round each worker generates its share of
+client operations, routes them, and sends each operation to the worker owning
+the target node; owners then send replica writes to the workers holding the
+successors. Cross-shard traffic travels over one multiprocessing queue per
+worker, one batch per (round, phase, peer). The coordinator only keeps the
+membership view and broadcasts joins and leaves, after which workers hand keys
+to new owners the same way. There is no global lock: each worker is a single
+thread over its own stores, so throughput scales with the number of cores.
+
+    python chord_shard.py --nodes 50000 --ops 200000 --workers 1,2,4
+"""
+
+import argparse
+import bisect
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+import traceback
+
+from chord_dht import R, hash_key, in_interval
+from chord_storage import KeyStore
+
+SHARD_M = 32  # Identifier bits for sharded rings; large enough for 50k+ nodes
+
+
+def shard_bounds(node_ids, shards):
+    """Arc start ids splitting sorted node_ids into `shards` equal-count arcs."""
+    n = len(node_ids)
+    return [0] + [node_ids[k * n // shards] for k in range(1, shards)]
+
+
+class _Shard:
+    """State and round logic of one worker process."""
+
+    def __init__(self, index, bounds, node_ids, m, r, inboxes, seed):
+        self.index = index
+        self.bounds = bounds
+        self.ids = list(node_ids)
+        self.m = m
+        self.r = r
+        self.space = 2 ** m
+        self.inboxes = inboxes
+        self.inbox = inboxes[index]
+        self.rng = random.Random(None if seed is None else seed + index)
+        self.stores = {nid: KeyStore() for nid in self.ids if self.shard_of(nid) == index}
+        self.local = sorted(self.stores)
+        self.round = 0
+        self.messages = 0
+        self._early = {}  # (round, phase) -> batches that arrived before we asked
+
+    def shard_of(self, node_id):
+        return bisect.bisect_right(self.bounds, node_id) - 1
+
+    def successor_index(self, key_id):
+        return bisect.bisect_left(self.ids, key_id) % len(self.ids)
+
+    def window_start(self, node_id):
+        """Start of the replica window (start, node_id] of a node: its r-th predecessor."""
+        idx = bisect.bisect_left(self.ids, node_id)
+        return self.ids[(idx - self.r) % len(self.ids)]
+
+    def route(self, start, key_id):
+        """Route from node index `start` to key_id's owner; returns (owner index, hops)."""
+        ids = self.ids
+        n = len(ids)
+        idx = start
+        hops = 0
+        while True:
+            cur = ids[idx]
+            if key_id == cur:
+                return idx, hops
+            succ = (idx + 1) % n
+            if n == 1 or in_interval(cur, ids[succ], key_id, inclusive_end=True):
+                return succ, hops
+            # Closest preceding finger: the highest finger start below key_id
+            # whose successor still precedes it.
+            nxt = succ
+            for i in range(((key_id - cur) % self.space - 1).bit_length() - 1, -1, -1):
+                f = bisect.bisect_left(ids, (cur + (1 << i)) % self.space) % n
+                if in_interval(cur, key_id, ids[f]):
+                    nxt = f
+                    break
+            idx = nxt
+            hops += 1
+
+    def exchange(self, phase, outgoing):
+        """Send one (possibly empty) batch to every peer and return all batches for us."""
+        tag = (self.round, phase)
+        for dest, inbox in enumerate(self.inboxes):
+            if dest != self.index:
+                batch = outgoing.get(dest, [])
+                inbox.put((tag, batch))
+                if batch:
+                    self.messages += 1
+        received = self._early.pop(tag, [])
+        while len(received) < len(self.inboxes) - 1:
+            t, batch = self.inbox.get()
+            if t == tag:
+                received.append(batch)
+            else:
+                self._early.setdefault(t, []).append(batch)
+        items = list(outgoing.get(self.index, []))
+        for batch in received:
+            items.extend(batch)
+        return items
+
+    def run_ops(self, ops, collect=False):
+        """Execute client ops [(kind, key, value)] originating here ('s' store, 'g' get)."""
+        self.round += 1
+        ids = self.ids
+        n = len(ids)
+        starts = [bisect.bisect_left(ids, nid) for nid in self.local] or range(n)
+        out = {}
+        hops = 0
+        for kind, key, value in ops:
+            key_id = hash_key(key, self.m)
+            owner, h = self.route(self.rng.choice(starts), key_id)
+            hops += h
+            owner_id = ids[owner]
+            out.setdefault(self.shard_of(owner_id), []).append((kind, key, value, key_id, owner_id))
+
+        writes = {}
+        found = {}
+        hits = 0
+        served = self.exchange('ops', out)
+        for kind, key, value, key_id, owner_id in served:
+            if kind == 's':
+                idx = bisect.bisect_left(ids, owner_id)
+                for j in range(min(self.r, n)):
+                    node_id = ids[(idx + j) % n]
+                    writes.setdefault(self.shard_of(node_id), []).append((node_id, key, value, key_id))
+            else:
+                value = self.stores[owner_id].get(key)
+                if value is not None:
+                    hits += 1
+                if collect:
+                    found[key] = value
+
+        by_node = {}
+        for node_id, key, value, key_id in self.exchange('replicas', writes):
+            by_node.setdefault(node_id, []).append((key, value, key_id))
+        for node_id, entries in by_node.items():
+            self.stores[node_id].put_many(entries)
+        return {'ops': len(ops), 'served': len(served), 'hops': hops, 'hits': hits,
+                'found': found}
+
+    def workload(self, count, key_space, store_ratio, seed):
+        rng = random.Random(seed)
+        ops = []
+        for i in range(count):
+            key = f"key-{rng.randrange(key_space)}"
+            ops.append(('s' if rng.random() < store_ratio else 'g', key, i))
+        return self.run_ops(ops)
+
+    def change_membership(self, joins, leaves):
+        """Apply leaves, then joins, handing keys to their new holders after each."""
+        self.round += 1
+        old = set(self.ids)
+        leaves = old.intersection(leaves)
+        joined = set(joins) - (old - leaves)  # a node may leave and rejoin in one round
+        moved = 0
+
+        # A leaving node's keys go to the r nodes after it, which covers every
+        # replica set it was part of; trimming below drops the surplus.
+        self.ids = sorted(old - leaves)
+        out = {}
+        for x in leaves:
+            store = self.stores.pop(x, None)
+            if store is None or not self.ids:
+                continue
+            entries = store.range_items(x, x)
+            idx = self.successor_index(x)
+            for j in range(min(self.r, len(self.ids))):
+                succ = self.ids[(idx + j) % len(self.ids)]
+                out.setdefault(self.shard_of(succ), []).append((succ, entries))
+        moved += self._apply_transfers('leave', out)
+
+        ids = self.ids = sorted(set(self.ids) | joined)
+        n = len(ids)
+        out = {}
+        for x in joined:
+            if self.shard_of(x) == self.index:
+                self.stores[x] = KeyStore()
+        for x in joined:
+            # The first node after x that was already in the ring holds x's keys.
+            idx = bisect.bisect_right(ids, x) % n
+            while ids[idx] in joined and ids[idx] != x:
+                idx = (idx + 1) % n
+            holder = ids[idx]
+            if holder != x and holder in self.stores:
+                entries = self.stores[holder].range_items(self.window_start(x), x)
+                out.setdefault(self.shard_of(x), []).append((x, entries))
+        moved += self._apply_transfers('join', out)
+
+        if n > self.r:
+            for node_id, store in self.stores.items():
+                store.pop_range(node_id, self.window_start(node_id))
+        self.local = sorted(self.stores)
+        return {'moved': moved}
+
+    def _apply_transfers(self, phase, outgoing):
+        moved = 0
+        for node_id, entries in self.exchange(phase, outgoing):
+            self.stores[node_id].put_many(entries)
+            moved += len(entries)
+        return moved
+
+    def key_counts(self):
+        return {node_id: len(store) for node_id, store in self.stores.items()}
+
+    def stats(self):
+        return {'shard': self.index, 'nodes': len(self.stores),
+                'keys': sum(len(s) for s in self.stores.values()), 'messages': self.messages}
+
+
+def _shard_main(index, bounds, node_ids, m, r, inboxes, conn, seed):
+    shard = _Shard(index, bounds, node_ids, m, r, inboxes, seed)
+    while True:
+        op, args = conn.recv()
+        if op == 'stop':
+            break
+        try:
+            conn.send((True, getattr(shard, op)(*args)))
+        except Exception:
+            conn.send((False, traceback.format_exc()))
+
+
+class ShardedDHT:
+    """Coordinator of a ring split across worker processes.
+
+    Holds the membership view and drives rounds; all key storage and routing
+    happens in the workers.
+    """
+
+    def __init__(self, node_ids, workers=None, m=SHARD_M, r=R, seed=None):
+        self.m = m
+        self.r = r
+        self.node_ids = sorted(set(node_ids))
+        self.workers = max(1, min(workers or os.cpu_count() or 1, len(self.node_ids)))
+        self.bounds = shard_bounds(self.node_ids, self.workers)
+        ctx = multiprocessing.get_context('spawn')
+        # Kept on self: the workers unpickle these after __init__ returns.
+        self._inboxes = [ctx.Queue() for _ in range(self.workers)]
+        self._conns = []
+        self._procs = []
+        for i in range(self.workers):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_shard_main, daemon=True,
+                               args=(i, self.bounds, self.node_ids, m, r, self._inboxes, child, seed))
+            proc.start()
+            self._conns.append(parent)
+            self._procs.append(proc)
+
+    @classmethod
+    def random(cls, nodes, workers=None, m=SHARD_M, r=R, seed=None):
+        """Build a ring of `nodes` distinct random ids."""
+        rng = random.Random(seed)
+        ids = set()
+        while len(ids) < nodes:
+            ids.add(rng.getrandbits(m))
+        return cls(ids, workers, m, r, seed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _round(self, op, per_worker_args):
+        """Send op to every worker and wait for all results."""
+        for conn, args in zip(self._conns, per_worker_args):
+            conn.send((op, args))
+        results = []
+        for conn in self._conns:
+            ok, result = conn.recv()
+            if not ok:
+                raise RuntimeError(f"Shard worker failed:\n{result}")
+            results.append(result)
+        return results
+
+    def _split(self, seq):
+        return [(seq[i::self.workers],) for i in range(self.workers)]
+
+    def add_nodes(self, node_ids):
+        return self.change_membership(joins=node_ids)
+
+    def remove_nodes(self, node_ids):
+        return self.change_membership(leaves=node_ids)
+
+    def change_membership(self, joins=(), leaves=()):
+        """Join and remove nodes in one round; returns the number of entries moved."""
+        joins, leaves = list(joins), list(leaves)
+        members = set(self.node_ids)
+        members.difference_update(leaves)
+        members.update(joins)
+        if not members:
+            raise ValueError("Cannot remove every node from the ring.")
+        self.node_ids = sorted(members)
+        results = self._round('change_membership', [(joins, leaves)] * self.workers)
+        return sum(res['moved'] for res in results)
+
+    def multi_store(self, items):
+        if hasattr(items, 'items'):
+            items = items.items()
+        ops = [('s', k, v) for k, v in items]
+        self._round('run_ops', self._split(ops))
+
+    def multi_get(self, keys):
+        keys = list(keys)
+        ops = [('g', k, None) for k in keys]
+        result = dict.fromkeys(keys)
+        for res in self._round('run_ops', [args + (True,) for args in self._split(ops)]):
+            result.update(res['found'])
+        return result
+
+    def run_workload(self, ops, key_space=100000, store_ratio=0.5, seed=0):
+        """Run `ops` random store/retrieve operations spread over all workers."""
+        counts = [ops // self.workers + (i < ops % self.workers) for i in range(self.workers)]
+        start = time.perf_counter()
+        results = self._round('workload', [(c, key_space, store_ratio, seed * 1000003 + i)
+                                           for i, c in enumerate(counts)])
+        elapsed = time.perf_counter() - start
+        return {'ops': ops, 'workers': self.workers, 'seconds': elapsed,
+                'ops_per_s': ops / elapsed if elapsed else 0.0,
+                'avg_hops': sum(res['hops'] for res in results) / ops if ops else 0.0,
+                'hits': sum(res['hits'] for res in results),
+                'served': sum(res['served'] for res in results)}
+
+    def key_counts(self):
+        counts = {}
+        for res in self._round('key_counts', [()] * self.workers):
+            counts.update(res)
+        return counts
+
+    def stats(self):
+        return self._round('stats', [()] * self.workers)
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(('stop', ()))
+            except OSError:
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        self._conns = []
+        self._procs = []
+
+
+def bench(nodes, ops, worker_counts, churn=0, seed=1, m=SHARD_M, r=R):
+    """Measure workload throughput for each worker count; returns a JSON-able dict."""
+    report = {'nodes': nodes, 'ops': ops, 'churn': churn, 'cpus': os.cpu_count(), 'runs': []}
+    base = None
+    for workers in worker_counts:
+        with ShardedDHT.random(nodes, workers, m, r, seed) as dht:
+            dht.multi_store({f"key-{i}": i for i in range(ops // 10)})
+            run = dht.run_workload(ops, key_space=ops // 10, seed=seed)
+            if churn:
+                rng = random.Random(seed)
+                leaves = rng.sample(dht.node_ids, churn)
+                joins = [rng.getrandbits(m) for _ in range(churn)]
+                t = time.perf_counter()
+                run['churn_moved'] = dht.change_membership(joins, leaves)
+                run['churn_seconds'] = time.perf_counter() - t
+            run['messages'] = sum(s['messages'] for s in dht.stats())
+        base = base or run['ops_per_s']
+        run['speedup'] = run['ops_per_s'] / base
+        report['runs'].append(run)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded multi-process Chord simulation.")
+    parser.add_argument('--nodes', type=int, default=50000)
+    parser.add_argument('--ops', type=int, default=200000)
+    parser.add_argument('--workers', default=None,
+                        help="comma-separated worker counts to compare (default: 1 and all cores)")
+    parser.add_argument('--churn', type=int, default=0, help="nodes to join and leave after the workload")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    cpus = os.cpu_count() or 1
+    counts = [int(w) for w in args.workers.split(',')] if args.workers else sorted({1, cpus})
+    report = bench(args.nodes, args.ops, counts, args.churn, args.seed)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+# chord_sim.py
+"""Deterministic discrete-event simulation of a Chord ring on a virtual clock.
+
+Simulator keeps an event heap and a virtual clock that jumps from one event
+to the next, so simulated hours cost only the work done in them. The DHT is
+plugged in with SimScheduler (node maintenance as jittered periodic events),
+a seeded Random for node ids and entry nodes, the virtual clock for write
+versions, and an inline replica executor, so nothing depends on threads or
+wall-clock time and the same seed reproduces the same run.
+
+Simulation drives a scenario on top: Poisson client stores/retrieves, node
+joins, crashes and graceful leaves. Every event executes atomically at its
+virtual time; a latency model (per pair of endpoints) turns the lookup path
+and replica fan-out of each client operation into a simulated latency.
+
+Usage: python chord_sim.py [--nodes N] [--days D] [--seed S] [--latency region]
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import logging
+import random
+import sys
+import time
+
+from chord_dht import DHT, R
+from chord_metrics import percentile
+from chord_quorum import InlineExecutor
+from chord_scheduler import MAINTENANCE_JITTER, MaintenanceScheduler
+
+SIM_M = 32  # Identifier bits for simulated rings
+SIM_MAINTENANCE_PERIOD = 60.0  # Virtual seconds between maintenance rounds of one node
+SIM_SAMPLE_PERIOD = 3600.0  # Virtual seconds between report samples
+MIN_NODES = R + 1  # Crashes and leaves never shrink the ring below this
+
+
+class Simulator:
+    """Event heap with a virtual clock; events run in (time, insertion) order."""
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self.now = 0.0
+        self.events = 0
+        self._heap = []
+        self._seq = itertools.count()
+
+    def time(self):
+        return self.now
+
+    def rng(self, stream):
+        """Independent Random for one named stream, so streams do not perturb each other."""
+        return random.Random(f"{self.seed}:{stream}")
+
+    def schedule(self, delay, fn, *args):
+        heapq.heappush(self._heap, (self.now + delay, next(self._seq), fn, args))
+
+    def run(self, until):
+        """Run every event due up to virtual time `until`, then advance the clock to it."""
+        heap = self._heap
+        while heap and heap[0][0] <= until:
+            self.now, _, fn, args = heapq.heappop(heap)
+            fn(*args)
+            self.events += 1
+        self.now = max(self.now, until)
+
+
+class SimScheduler(MaintenanceScheduler):
+    """Runs node maintenance as periodic events on a Simulator, with jittered periods."""
+
+    def __init__(self, sim, period=SIM_MAINTENANCE_PERIOD, jitter=MAINTENANCE_JITTER):
+        self.sim = sim
+        self.period = period
+        self.jitter = jitter
+        self.rng = sim.rng('maintenance')
+        self._periods = {}
+
+    def register(self, node, period=None):
+        self._periods[node] = period if period is not None else self.period
+        # Random initial phase so nodes added together do not tick together.
+        self.sim.schedule(self.rng.uniform(0, self._periods[node]), self._tick, node)
+
+    def unregister(self, node):
+        self._periods.pop(node, None)
+
+    def stop(self):
+        self._periods.clear()
+
+    def _tick(self, node):
+        period = self._periods.get(node)
+        if period is None or not node.alive:
+            self._periods.pop(node, None)
+            return
+        node.maintain()
+        self.sim.schedule(period * self.rng.uniform(1 - self.jitter, 1 + self.jitter), self._tick, node)
+
+
+class ConstantLatency:
+    """Every message takes the same time."""
+
+    def __init__(self, seconds=0.01):
+        self.seconds = seconds
+
+    def delay(self, a, b, rng):
+        return self.seconds
+
+
+class UniformLatency:
+    """Message delays drawn uniformly from [low, high]."""
+
+    def __init__(self, low=0.001, high=0.05):
+        self.low = low
+        self.high = high
+
+    def delay(self, a, b, rng):
+        return rng.uniform(self.low, self.high)
+
+
+class RegionLatency:
+    """Nodes sit in `regions` regions (by id); messages between regions are slower.
+
+    The client counts as being in region 0. Delays vary by +/- jitter.
+    """
+
+    def __init__(self, regions=3, local=0.002, remote=0.08, jitter=0.2):
+        self.regions = regions
+        self.local = local
+        self.remote = remote
+        self.jitter = jitter
+
+    def region(self, endpoint):
+        return 0 if endpoint is None else endpoint.id % self.regions
+
+    def delay(self, a, b, rng):
+        base = self.local if self.region(a) == self.region(b) else self.remote
+        return base * rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+LATENCY_MODELS = {'constant': ConstantLatency, 'uniform': UniformLatency, 'region': RegionLatency}
+
+
+class Simulation:
+    """A seeded churn and workload scenario against a DHT on a Simulator.
+
+    Rates are events per virtual second. Keys are key-0 .. key-{keys - 1},
+    preloaded with their index; reads are checked against the last value
+    written, so `missing` and `stale` count reads that lost data.
+    """
+
+    def __init__(self, nodes=1000, seed=0, m=SIM_M, r=R, latency=None,
+                 period=SIM_MAINTENANCE_PERIOD, keys=10000, op_rate=10.0, store_ratio=0.1,
+                 join_rate=0.0, fail_rate=0.0, leave_rate=0.0, sample_period=SIM_SAMPLE_PERIOD):
+        self.sim = Simulator(seed)
+        self.latency = latency if latency is not None else ConstantLatency()
+        self.keys = keys
+        self.op_rate = op_rate
+        self.store_ratio = store_ratio
+        self.rates = {'join': join_rate, 'fail': fail_rate, 'leave': leave_rate}
+        self.sample_period = sample_period
+        self._ops_rng = self.sim.rng('ops')
+        self._churn_rng = self.sim.rng('churn')
+        self._latency_rng = self.sim.rng('latency')
+        self.dht = DHT(m=m, r=r, scheduler=SimScheduler(self.sim, period), rng=self.sim.rng('dht'),
+                       clock=self.sim.time, replica_executor=InlineExecutor())
+        self.expected = {f"key-{i}": i for i in range(keys)}
+        self.dht.add_nodes(nodes, self.expected)
+        self.samples = []
+        self._window = self._empty_window()
+        self._writes = 0
+
+    @staticmethod
+    def _empty_window():
+        return {'stores': 0, 'retrieves': 0, 'missing': 0, 'stale': 0, 'failed_stores': 0,
+                'joins': 0, 'fails': 0, 'leaves': 0, 'hops': 0, 'latencies': []}
+
+    def _delay(self, a, b):
+        return self.latency.delay(a, b, self._latency_rng)
+
+    def _client_op(self):
+        rng = self._ops_rng
+        key = f"key-{rng.randrange(self.keys)}"
+        dht = self.dht
+        path = []
+        _, owner = dht.locate(dht.key_id(key), path)
+        # Client -> entry node -> hops -> owner -> client.
+        hops = path + [owner] if path else [owner]
+        seconds = self._delay(None, hops[0]) + self._delay(owner, None)
+        seconds += sum(self._delay(a, b) for a, b in zip(hops, hops[1:]))
+        window = self._window
+        window['hops'] += len(path)
+        if rng.random() < self.store_ratio:
+            self._writes += 1
+            value = self.keys + self._writes
+            replicas = dht._replica_set(owner, min(dht.r, len(dht.membership)))
+            # The owner writes its replicas in parallel and waits for the slowest ack.
+            seconds += max((self._delay(owner, n) + self._delay(n, owner) for n in replicas[1:]), default=0.0)
+            window['stores'] += 1
+            if dht.store(key, value):
+                self.expected[key] = value
+            else:
+                window['failed_stores'] += 1
+        else:
+            window['retrieves'] += 1
+            value = dht.retrieve(key)
+            if value is None:
+                window['missing'] += 1
+            elif value != self.expected[key]:
+                window['stale'] += 1
+        window['latencies'].append(seconds)
+        self._next(self.op_rate, self._ops_rng, self._client_op)
+
+    def _churn(self, kind):
+        dht = self.dht
+        rng = self._churn_rng
+        if kind == 'join':
+            dht.add_node()
+            self._window['joins'] += 1
+        elif len(dht.membership) > MIN_NODES:
+            node_id = dht.membership.ids[rng.randrange(len(dht.membership))]
+            if kind == 'fail':
+                dht.fail_node(node_id)
+                self._window['fails'] += 1
+            else:
+                dht.remove_node(node_id)
+                self._window['leaves'] += 1
+        self._next(self.rates[kind], rng, self._churn, kind)
+
+    def _next(self, rate, rng, fn, *args):
+        if rate > 0:
+            self.sim.schedule(rng.expovariate(rate), fn, *args)
+
+    def _sample(self):
+        self._flush()
+        self.sim.schedule(self.sample_period, self._sample)
+
+    def _flush(self):
+        """Close the current window and append it to the samples."""
+        window = self._window
+        latencies = window.pop('latencies')
+        ops = window['stores'] + window['retrieves']
+        window.update({
+            'time': self.sim.now,
+            'nodes': len(self.dht.membership),
+            'events': self.sim.events,
+            'mean_hops': window['hops'] / ops if ops else 0.0,
+            'latency_p50': percentile(latencies, 0.50),
+            'latency_p99': percentile(latencies, 0.99),
+        })
+        self.samples.append(window)
+        self._window = self._empty_window()
+
+    def run(self, duration):
+        """Simulate `duration` virtual seconds; returns a JSON-able report.
+
+        Everything except `wall_seconds` is identical for identical arguments.
+        """
+        started = time.perf_counter()
+        if not self.sim.events:
+            self._next(self.op_rate, self._ops_rng, self._client_op)
+            for kind, rate in self.rates.items():
+                self._next(rate, self._churn_rng, self._churn, kind)
+            self.sim.schedule(self.sample_period, self._sample)
+        self.sim.run(self.sim.now + duration)
+        window = self._window
+        if window['latencies'] or window['joins'] or window['fails'] or window['leaves']:
+            self._flush()  # The tail since the last sample, shorter than sample_period
+        totals = {}
+        for sample in self.samples:
+            for name in ('stores', 'retrieves', 'missing', 'stale', 'failed_stores',
+                         'joins', 'fails', 'leaves'):
+                totals[name] = totals.get(name, 0) + sample[name]
+        return {
+            'seed': self.sim.seed,
+            'virtual_seconds': self.sim.now,
+            'events': self.sim.events,
+            'nodes': len(self.dht.membership),
+            'totals': totals,
+            'samples': self.samples,
+            'wall_seconds': time.perf_counter() - started,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deterministic discrete-event Chord simulation.")
+    parser.add_argument('--nodes', type=int, default=10000)
+    parser.add_argument('--days', type=float, default=1.0, help="virtual days to simulate")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--period', type=float, default=SIM_MAINTENANCE_PERIOD,
+                        help="virtual seconds between maintenance rounds of a node")
+    parser.add_argument('--keys', type=int, default=10000)
+    parser.add_argument('--op-rate', type=float, default=1.0, help="client operations per virtual second")
+    parser.add_argument('--store-ratio', type=float, default=0.1)
+    parser.add_argument('--join-rate', type=float, default=1 / 600, help="joins per virtual second")
+    parser.add_argument('--fail-rate', type=float, default=1 / 1200, help="crashes per virtual second")
+    parser.add_argument('--leave-rate', type=float, default=1 / 1200, help="graceful leaves per virtual second")
+    parser.add_argument('--latency', choices=sorted(LATENCY_MODELS), default='region')
+    parser.add_argument('--output', help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    # Lost keys are counted in the report; do not log a warning for every one.
+    logging.basicConfig(level=logging.ERROR, format='%(asctime)s %(levelname)s:%(message)s')
+    simulation = Simulation(args.nodes, args.seed, period=args.period, keys=args.keys,
+                            op_rate=args.op_rate, store_ratio=args.store_ratio,
+                            join_rate=args.join_rate, fail_rate=args.fail_rate,
+                            leave_rate=args.leave_rate, latency=LATENCY_MODELS[args.latency]())
+    report = simulation.run(args.days * 86400)
+    simulation.dht.shutdown()
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
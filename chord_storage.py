@@ -0,0 +1,761 @@
+# chord_storage.py
+"""Per-node key/value storage kept in ring order.
+
+Every key is stored together with its ring id (computed once, when the key is
+first written), and a sorted index of (ring_id, key) pairs lets a node answer
+"which keys fall in (a, b]" with a bisect and a slice instead of rehashing its
+whole store whenever membership changes.
+
+KeyStore keeps everything in memory and is the default. DurableKeyStore keeps
+the same interface on disk: writes go to an append-only log of bounded size,
+which a background thread compacts into a snapshot whose index (sorted by ring
+id) is memory-mapped, so reopening a store only replays the log tail and values
+are read lazily.
+"""
+
+import bisect
+import heapq
+import itertools
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+
+from chord_codec import decode, encode
+
+
+class Versioned:
+    """A stored value tagged with the version it was written under; newer versions win."""
+
+    __slots__ = ('version', 'value')
+
+    def __init__(self, version, value):
+        self.version = version
+        self.value = value
+
+    def __eq__(self, other):
+        return (isinstance(other, Versioned)
+                and self.version == other.version and self.value == other.value)
+
+    def __repr__(self):
+        return f"Versioned({self.version!r}, {self.value!r})"
+
+
+def version_of(stored):
+    """Version of a stored value: -1 if missing, 0 if it was written without one."""
+    if stored is None:
+        return -1
+    return stored.version if isinstance(stored, Versioned) else 0
+
+
+def plain(stored):
+    """The user value of a stored value, without its version."""
+    return stored.value if isinstance(stored, Versioned) else stored
+
+
+def newer_entries(store, entries):
+    """The (key, value, ring_id) entries of a batch that survive last-writer-wins.
+
+    A Versioned entry older than the copy in `store` (or than an earlier entry
+    for the same key in the batch) is skipped, so the result is what storing
+    the entries one by one would leave behind.
+    """
+    accepted = {}
+    for entry in entries:
+        key, value = entry[0], entry[1]
+        current = accepted[key][1] if key in accepted else store.get(key)
+        if not isinstance(value, Versioned) or version_of(current) <= value.version:
+            accepted[key] = entry
+    return list(accepted.values())
+
+
+def _chunk_slices(start, end, after):
+    """_ring_slices of (start, end] from the piece holding cursor `after` onwards.
+
+    Yields (lo, hi, cursor) where cursor is `after` for the piece it lies in
+    and None for the pieces after it.
+    """
+    skipping = after is not None
+    for lo, hi in _ring_slices(start, end):
+        if skipping:
+            if not (lo < after[0] and (hi is None or after[0] <= hi)):
+                continue
+            skipping = False
+            yield lo, hi, after
+        else:
+            yield lo, hi, None
+
+
+def _ring_slices(start, end):
+    """Split the ring interval (start, end] into at most two non-wrapping (lo, hi] pieces.
+
+    Ids are non-negative, so -1 stands for "before the smallest id" and None for
+    "past the largest id". start == end denotes the entire ring.
+    """
+    if start == end:
+        return [(-1, None)]
+    if start < end:
+        return [(start, end)]
+    return [(start, None), (-1, end)]
+
+
+class KeyStore:
+    """In-memory key/value store with a ring-ordered index over cached key ids.
+
+    Supports the read-only mapping protocol (`in`, `len`, iteration, `get`,
+    `items`, `[]`) so callers that only read node data keep working; writes go
+    through put/delete so the index stays consistent.
+
+    A write stores the value with a single dict assignment after the index is
+    updated, so `get`/`[]`/`in` are safe to call without the node lock while a
+    writer holds it (concurrent_reads).
+    """
+
+    concurrent_reads = True
+
+    def __init__(self):
+        self._values = {}  # key -> value
+        self._ids = {}  # key -> ring id
+        self._index = []  # sorted list of (ring id, key)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def keys(self):
+        return self._values.keys()
+
+    def items(self):
+        return self._values.items()
+
+    def ring_id(self, key):
+        """Return the cached ring id of a stored key, or None."""
+        return self._ids.get(key)
+
+    def put(self, key, value, ring_id):
+        old_id = self._ids.get(key)
+        if old_id != ring_id:
+            if old_id is not None:
+                self._unindex(key, old_id)
+            bisect.insort(self._index, (ring_id, key))
+            self._ids[key] = ring_id
+        self._values[key] = value
+
+    def put_many(self, entries):
+        """Store an iterable of (key, value, ring_id) triples."""
+        entries = list(entries)
+        if len(entries) > len(self._index) // 8:
+            # Large batch: append then re-sort once instead of many insorts.
+            added = []
+            for key, value, ring_id in entries:
+                old_id = self._ids.get(key)
+                if old_id != ring_id:
+                    if old_id is not None:
+                        self._unindex(key, old_id)
+                    added.append((ring_id, key))
+                    self._ids[key] = ring_id
+                self._values[key] = value
+            self._index.extend(added)
+            self._index.sort()
+        else:
+            for key, value, ring_id in entries:
+                self.put(key, value, ring_id)
+
+    def delete(self, key):
+        """Remove a key; returns True if it was present."""
+        ring_id = self._ids.pop(key, None)
+        if ring_id is None:
+            return False
+        self._unindex(key, ring_id)
+        del self._values[key]
+        return True
+
+    def _unindex(self, key, ring_id):
+        pos = bisect.bisect_left(self._index, (ring_id, key))
+        if pos < len(self._index) and self._index[pos] == (ring_id, key):
+            del self._index[pos]
+
+    def _bounds(self, lo, hi):
+        first = bisect.bisect_left(self._index, (lo + 1,))
+        last = len(self._index) if hi is None else bisect.bisect_left(self._index, (hi + 1,))
+        return first, last
+
+    def range_items(self, start, end):
+        """Return [(key, value, ring_id)] for keys whose ring id lies in (start, end]."""
+        result = []
+        for lo, hi in _ring_slices(start, end):
+            first, last = self._bounds(lo, hi)
+            for ring_id, key in self._index[first:last]:
+                result.append((key, self._values[key], ring_id))
+        return result
+
+    def range_chunk(self, start, end, after=None, limit=1000):
+        """Return up to `limit` (key, value, ring_id) entries of (start, end] in ring order.
+
+        `after` is the (ring_id, key) of the last entry of the previous chunk,
+        so a range can be paged through while it is being written to.
+        """
+        result = []
+        for lo, hi, cursor in _chunk_slices(start, end, after):
+            first, last = self._bounds(lo, hi)
+            if cursor is not None:
+                first = max(first, bisect.bisect_right(self._index, cursor))
+            for ring_id, key in self._index[first:min(last, first + limit - len(result))]:
+                result.append((key, self._values[key], ring_id))
+            if len(result) >= limit:
+                break
+        return result
+
+    def count_range(self, start, end):
+        """Number of keys whose ring id lies in (start, end]."""
+        total = 0
+        for lo, hi in _ring_slices(start, end):
+            first, last = self._bounds(lo, hi)
+            total += last - first
+        return total
+
+    def pop_range(self, start, end):
+        """Remove and return [(key, value, ring_id)] for keys in (start, end]."""
+        result = []
+        for lo, hi in _ring_slices(start, end):
+            first, last = self._bounds(lo, hi)
+            for ring_id, key in self._index[first:last]:
+                result.append((key, self._values.pop(key), ring_id))
+                del self._ids[key]
+            del self._index[first:last]
+        return result
+
+    def close(self):
+        pass
+
+
+RID_BYTES = 20  # Ring ids up to 160 bits, big-endian so byte order is numeric order
+COMPACT_LOG_BYTES = 16 * 1024 * 1024  # Log size that starts a background snapshot; bounds reopen replay
+
+_INDEX = struct.Struct(f'>{RID_BYTES}sQ')  # ring id, record offset in the snapshot data
+_RECORD = struct.Struct('>II')  # snapshot record: key length, value length
+_CRC = struct.Struct('>I')
+_LOG = struct.Struct('>BII')  # log record after its CRC: op, key length, value length
+_PUT = 1
+_DELETE = 2
+_TOMBSTONE = object()  # Overlay marker for a key deleted since the snapshot
+_FILE = re.compile(r'(snapshot|log)-(\d+)\.(dat|idx|wal)$')
+
+
+def _pack_value(value):
+    if isinstance(value, Versioned):
+        return b'v' + encode([value.version, value.value])
+    return b'p' + encode(value)
+
+
+def _unpack_value(data):
+    value = decode(data[1:])
+    if data[:1] == b'v':
+        return Versioned(*value)
+    return value
+
+
+class DurableKeyStore:
+    """On-disk node store with the same interface as KeyStore.
+
+    Files in `path` (one directory per node):
+
+        CURRENT          generation number of the live snapshot
+        snapshot-N.dat   records: key length, value length, key, value
+        snapshot-N.idx   fixed-width (ring id, record offset) entries sorted by
+                         (ring id, key); memory-mapped and binary searched
+        log-K.wal        CRC-checked put/delete records; every log with K >= N
+                         is replayed, in order, on top of snapshot N
+
+    Changes since the last snapshot live in an in-memory overlay. Once the log
+    reaches `compact_bytes`, the overlay is frozen, writes move on to a fresh
+    log-(K+1) and overlay, and a background thread merges the snapshot with
+    the frozen overlay into snapshot-(K+1). The next write (or close) installs
+    it: CURRENT moves on and the older files are deleted. A crash before that
+    leaves snapshot N and both logs, which reopening replays; the unfinished
+    snapshot is discarded. Should writes outrun the thread, a write waits for
+    it once the new log reaches twice `compact_bytes`, so reopening never
+    replays more than about three times `compact_bytes` of log, however large
+    the snapshot. Snapshot values are only read when asked for. Keys must be
+    strings and `key_id` must map a key to the ring id it is stored under;
+    values (plain or Versioned) are encoded with chord_codec. With `fsync`
+    every write batch is synced to disk, otherwise it is only flushed to the OS.
+
+    Installing a snapshot swaps and closes the memory maps, so readers must
+    hold the node lock (concurrent_reads is False).
+    """
+
+    concurrent_reads = False
+
+    def __init__(self, path, key_id, compact_bytes=COMPACT_LOG_BYTES, fsync=False):
+        self.path = path
+        self.key_id = key_id
+        self.compact_bytes = compact_bytes
+        self.fsync = fsync
+        os.makedirs(path, exist_ok=True)
+        self._gen = self._read_current()
+        self._overlay = {}  # key -> (ring id, value or _TOMBSTONE)
+        self._overlay_index = []  # sorted (ring id, key) for the overlay
+        self._frozen = None  # (overlay, index) being compacted in the background
+        self._compactor = None
+        self._compact_error = None
+        self._open_snapshot()
+        logs = self._clean_files()
+        self._log_gen = logs[-1] if logs else self._gen
+        self._log_bytes = self._replay_logs(logs)
+        self._log = open(self._file('log', 'wal', self._log_gen), 'ab')
+
+    # -- Files -----------------------------------------------------------
+
+    def _file(self, name, ext, gen=None):
+        return os.path.join(self.path, f"{name}-{self._gen if gen is None else gen}.{ext}")
+
+    def _clean_files(self, before=None):
+        """Delete files a finished or abandoned compaction left; returns the live log generations.
+
+        Logs older than `before` (default: the snapshot) and snapshots other
+        than the current one go.
+        """
+        before = self._gen if before is None else before
+        logs = []
+        for name in os.listdir(self.path):
+            match = _FILE.match(name)
+            if not match:
+                continue
+            gen = int(match.group(2))
+            if match.group(1) == 'log' and gen >= before:
+                logs.append(gen)
+            elif gen != self._gen or match.group(1) == 'log':
+                os.remove(os.path.join(self.path, name))
+        return sorted(logs)
+
+    def _read_current(self):
+        try:
+            with open(os.path.join(self.path, 'CURRENT')) as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return 0
+
+    def _open_snapshot(self):
+        self._snap_files = []
+        self._dat = self._idx = None
+        self._snap_count = 0
+        self._snap_bytes = 0
+        if not self._gen:
+            return
+        maps = []
+        for ext in ('dat', 'idx'):
+            f = open(self._file('snapshot', ext), 'rb')
+            self._snap_files.append(f)
+            size = os.fstat(f.fileno()).st_size
+            maps.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b'')
+        self._dat, self._idx = maps
+        self._snap_count = len(self._idx) // _INDEX.size
+        self._snap_bytes = len(self._dat) + len(self._idx)
+
+    def _close_snapshot(self):
+        for m in (self._dat, self._idx):
+            if isinstance(m, mmap.mmap):
+                m.close()
+        for f in self._snap_files:
+            f.close()
+        self._snap_files = []
+
+    def _replay_logs(self, gens):
+        """Rebuild the overlay from the logs; returns their total size.
+
+        Records are collected last-writer-wins into the overlay, then counted
+        against the snapshot and indexed with a single sort.
+        """
+        total = sum(self._replay_log(gen) for gen in gens)
+        count = self._snap_count
+        for key, (ring_id, value) in list(self._overlay.items()):
+            in_snapshot = self._snap_find(key) is not None
+            if value is _TOMBSTONE:
+                if in_snapshot:
+                    count -= 1
+                else:
+                    del self._overlay[key]
+            elif not in_snapshot:
+                count += 1
+        self._count = count
+        self._overlay_index = sorted((ring_id, key) for key, (ring_id, _) in self._overlay.items())
+        return total
+
+    def _replay_log(self, gen):
+        """Read one log into the overlay; a torn record at the tail is cut off."""
+        path = self._file('log', 'wal', gen)
+        with open(path, 'rb') as f:
+            data = f.read()
+        overlay = self._overlay
+        pos = 0
+        while pos + _CRC.size + _LOG.size <= len(data):
+            (crc,) = _CRC.unpack_from(data, pos)
+            body = pos + _CRC.size
+            op, klen, vlen = _LOG.unpack_from(data, body)
+            end = body + _LOG.size + RID_BYTES + klen + vlen
+            if end > len(data) or zlib.crc32(data[body:end]) != crc:
+                break
+            rid_at = body + _LOG.size
+            ring_id = int.from_bytes(data[rid_at:rid_at + RID_BYTES], 'big')
+            key = data[rid_at + RID_BYTES:rid_at + RID_BYTES + klen].decode('utf-8')
+            overlay[key] = (ring_id, _unpack_value(data[end - vlen:end]) if op == _PUT else _TOMBSTONE)
+            pos = end
+        if pos < len(data):
+            with open(path, 'r+b') as f:
+                f.truncate(pos)
+        return pos
+
+    def _write_log(self, records):
+        chunks = []
+        for op, key, ring_id, payload in records:
+            raw = key.encode('utf-8')
+            body = _LOG.pack(op, len(raw), len(payload)) + ring_id.to_bytes(RID_BYTES, 'big') + raw + payload
+            chunks.append(_CRC.pack(zlib.crc32(body)))
+            chunks.append(body)
+        data = b''.join(chunks)
+        self._log.write(data)
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self._log_bytes += len(data)
+
+    # -- Snapshot lookups ------------------------------------------------
+
+    def _snap_bisect(self, ring_id):
+        """Index of the first snapshot entry whose ring id is >= ring_id."""
+        target = ring_id.to_bytes(RID_BYTES, 'big')
+        lo, hi = 0, self._snap_count
+        idx = self._idx
+        while lo < hi:
+            mid = (lo + hi) // 2
+            at = mid * _INDEX.size
+            if idx[at:at + RID_BYTES] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _snap_entry(self, i):
+        """(ring id, key, value offset, value length) of snapshot entry i."""
+        rid, off = _INDEX.unpack_from(self._idx, i * _INDEX.size)
+        klen, vlen = _RECORD.unpack_from(self._dat, off)
+        start = off + _RECORD.size
+        key = bytes(self._dat[start:start + klen]).decode('utf-8')
+        return int.from_bytes(rid, 'big'), key, start + klen, vlen
+
+    def _snap_find(self, key):
+        """(value offset, value length) of key in the snapshot, or None."""
+        if not self._snap_count:
+            return None
+        ring_id = self.key_id(key)
+        i = self._snap_bisect(ring_id)
+        while i < self._snap_count:
+            rid, k, voff, vlen = self._snap_entry(i)
+            if rid != ring_id:
+                break
+            if k == key:
+                return voff, vlen
+            i += 1
+        return None
+
+    def _snap_value(self, voff, vlen):
+        return _unpack_value(self._dat[voff:voff + vlen])
+
+    # -- Overlay ---------------------------------------------------------
+
+    def _layers(self):
+        """The overlays as (entries, index) pairs, newest first."""
+        if self._frozen is None:
+            return [(self._overlay, self._overlay_index)]
+        return [(self._overlay, self._overlay_index), self._frozen]
+
+    def _entry(self, key):
+        """(ring id, value or _TOMBSTONE) from the newest overlay holding key, or None."""
+        entry = self._overlay.get(key)
+        if entry is None and self._frozen is not None:
+            entry = self._frozen[0].get(key)
+        return entry
+
+    def _exists(self, key):
+        entry = self._entry(key)
+        if entry is not None:
+            return entry[1] is not _TOMBSTONE
+        return self._snap_find(key) is not None
+
+    def _below(self, key):
+        """Whether key is live under the active overlay (frozen overlay or snapshot)."""
+        if self._frozen is not None:
+            entry = self._frozen[0].get(key)
+            if entry is not None:
+                return entry[1] is not _TOMBSTONE
+        return self._snap_find(key) is not None
+
+    def _apply(self, key, ring_id, value):
+        existed = self._exists(key)
+        old = self._overlay.get(key)
+        if old is not None and old[0] != ring_id:
+            pos = bisect.bisect_left(self._overlay_index, (old[0], key))
+            del self._overlay_index[pos]
+        if value is _TOMBSTONE and not self._below(key):
+            # Nothing underneath to mask: forget the key instead of keeping a tombstone.
+            if old is not None:
+                if old[0] == ring_id:
+                    pos = bisect.bisect_left(self._overlay_index, (ring_id, key))
+                    del self._overlay_index[pos]
+                del self._overlay[key]
+        else:
+            if old is None or old[0] != ring_id:
+                bisect.insort(self._overlay_index, (ring_id, key))
+            self._overlay[key] = (ring_id, value)
+        self._count += (value is not _TOMBSTONE) - existed
+
+    def _maybe_compact(self):
+        if self._compactor is not None:
+            if self._compactor.is_alive() and self._log_bytes < 2 * self.compact_bytes:
+                return
+            self._finish_compaction()
+        if self._log_bytes >= self.compact_bytes:
+            self._start_compaction()
+
+    # -- Mapping protocol ------------------------------------------------
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key):
+        return self._exists(key)
+
+    def __iter__(self):
+        return (key for _, key, _ in self._scan(-1, -1))
+
+    def __getitem__(self, key):
+        entry = self._entry(key)
+        if entry is not None:
+            if entry[1] is _TOMBSTONE:
+                raise KeyError(key)
+            return entry[1]
+        found = self._snap_find(key)
+        if found is None:
+            raise KeyError(key)
+        return self._snap_value(*found)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(key, value) for key, value, _ in self.range_items(-1, -1)]
+
+    def ring_id(self, key):
+        entry = self._entry(key)
+        if entry is not None:
+            return entry[0] if entry[1] is not _TOMBSTONE else None
+        return self.key_id(key) if self._snap_find(key) is not None else None
+
+    # -- Writes ----------------------------------------------------------
+
+    def put(self, key, value, ring_id):
+        self._write_log([(_PUT, key, ring_id, _pack_value(value))])
+        self._apply(key, ring_id, value)
+        self._maybe_compact()
+
+    def put_many(self, entries):
+        """Store an iterable of (key, value, ring_id) triples with one log write."""
+        entries = list(entries)
+        if not entries:
+            return
+        self._write_log([(_PUT, key, ring_id, _pack_value(value)) for key, value, ring_id in entries])
+        for key, value, ring_id in entries:
+            self._apply(key, ring_id, value)
+        self._maybe_compact()
+
+    def delete(self, key):
+        """Remove a key; returns True if it was present."""
+        ring_id = self.ring_id(key)
+        if ring_id is None:
+            return False
+        self._write_log([(_DELETE, key, ring_id, b'')])
+        self._apply(key, ring_id, _TOMBSTONE)
+        self._maybe_compact()
+        return True
+
+    # -- Ranges ----------------------------------------------------------
+
+    def _scan(self, start, end, after=None, layers=None):
+        """Yield (ring id, key, source) in ring order for live keys in (start, end].
+
+        source is ('s', offset, length) for a snapshot value or ('o', value).
+        With `after` = (ring id, key), the scan resumes just past that entry.
+        `layers` are the overlays to merge over the snapshot (default: all).
+        """
+        layers = self._layers() if layers is None else layers
+        for lo, hi, cursor in _chunk_slices(start, end, after):
+            if cursor is not None:
+                lo = cursor[0] - 1
+            first = self._snap_bisect(lo + 1) if self._snap_count else 0
+            last = self._snap_count if hi is None else (self._snap_bisect(hi + 1) if self._snap_count else 0)
+            snap = ((rid, key, ('s', voff, vlen))
+                    for rid, key, voff, vlen in map(self._snap_entry, range(first, last))
+                    if not any(key in entries for entries, _ in layers))
+            sources = [snap]
+            for i, (entries, index) in enumerate(layers):
+                ofirst = bisect.bisect_left(index, (lo + 1,))
+                olast = len(index) if hi is None else bisect.bisect_left(index, (hi + 1,))
+                sources.append(_overlay_entries(entries, index[ofirst:olast], layers[:i]))
+            merged = heapq.merge(*sources, key=lambda e: (e[0], e[1]))
+            if cursor is not None:
+                merged = itertools.dropwhile(lambda e: (e[0], e[1]) <= cursor, merged)
+            yield from merged
+
+    def range_items(self, start, end):
+        """Return [(key, value, ring_id)] for keys whose ring id lies in (start, end]."""
+        return [(key, self._snap_value(src[1], src[2]) if src[0] == 's' else src[1], rid)
+                for rid, key, src in self._scan(start, end)]
+
+    def range_chunk(self, start, end, after=None, limit=1000):
+        """Return up to `limit` entries of (start, end] following cursor `after`; see KeyStore."""
+        return [(key, self._snap_value(src[1], src[2]) if src[0] == 's' else src[1], rid)
+                for rid, key, src in itertools.islice(self._scan(start, end, after), limit)]
+
+    def count_range(self, start, end):
+        """Number of keys whose ring id lies in (start, end]; walks the index, not the values."""
+        return sum(1 for _ in self._scan(start, end))
+
+    def pop_range(self, start, end):
+        """Remove and return [(key, value, ring_id)] for keys in (start, end]."""
+        result = self.range_items(start, end)
+        if result:
+            self._write_log([(_DELETE, key, ring_id, b'') for key, _, ring_id in result])
+            for key, _, ring_id in result:
+                self._apply(key, ring_id, _TOMBSTONE)
+            self._maybe_compact()
+        return result
+
+    # -- Snapshots -------------------------------------------------------
+
+    def _start_compaction(self):
+        """Freeze the overlay, move writes to a fresh log and snapshot in the background."""
+        gen = self._log_gen + 1
+        self._log.close()
+        self._frozen = (self._overlay, self._overlay_index)
+        self._overlay, self._overlay_index = {}, []
+        self._log_gen = gen
+        self._log = open(self._file('log', 'wal', gen), 'ab')
+        self._log_bytes = 0
+        self._compactor = threading.Thread(target=self._write_snapshot, args=(gen,),
+                                           name=f"compact-{os.path.basename(self.path)}", daemon=True)
+        self._compactor.start()
+
+    def _write_snapshot(self, gen):
+        """Compactor thread: merge the snapshot and the frozen overlay into snapshot-gen.
+
+        Both inputs are immutable until _finish_compaction() joins this thread.
+        """
+        try:
+            with open(self._file('snapshot', 'dat', gen), 'wb') as dat, \
+                    open(self._file('snapshot', 'idx', gen), 'wb') as idx:
+                offset = 0
+                for rid, key, src in self._scan(-1, -1, layers=[self._frozen]):
+                    raw = key.encode('utf-8')
+                    value = self._dat[src[1]:src[1] + src[2]] if src[0] == 's' else _pack_value(src[1])
+                    dat.write(_RECORD.pack(len(raw), len(value)))
+                    dat.write(raw)
+                    dat.write(value)
+                    idx.write(_INDEX.pack(rid.to_bytes(RID_BYTES, 'big'), offset))
+                    offset += _RECORD.size + len(raw) + len(value)
+                for f in (dat, idx):
+                    f.flush()
+                    os.fsync(f.fileno())
+        except Exception as exc:
+            self._compact_error = exc
+
+    def _finish_compaction(self):
+        """Wait for the compactor and install its snapshot.
+
+        If it failed, the frozen overlay is merged back under the active one
+        (its logs are all still on disk) and the error is raised.
+        """
+        self._compactor.join()
+        self._compactor = None
+        gen = self._log_gen
+        if self._compact_error is not None:
+            error, self._compact_error = self._compact_error, None
+            entries = self._frozen[0]
+            entries.update(self._overlay)
+            self._overlay = entries
+            self._overlay_index = sorted((ring_id, key) for key, (ring_id, _) in entries.items())
+            self._frozen = None
+            for ext in ('dat', 'idx'):
+                try:
+                    os.remove(self._file('snapshot', ext, gen))
+                except FileNotFoundError:
+                    pass
+            raise error
+        current = os.path.join(self.path, 'CURRENT')
+        with open(current + '.tmp', 'w') as f:
+            f.write(str(gen))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(current + '.tmp', current)
+        self._close_snapshot()
+        self._gen = gen
+        self._frozen = None
+        self._open_snapshot()
+        self._clean_files()
+
+    def snapshot(self):
+        """Write the live data as a new snapshot now and start an empty log."""
+        if self._compactor is not None:
+            self._finish_compaction()
+        self._start_compaction()
+        self._finish_compaction()
+
+    def close(self):
+        """Finish a running compaction, flush the log and release file handles.
+
+        The store can be reopened later.
+        """
+        if self._log.closed:
+            return
+        try:
+            if self._compactor is not None:
+                self._finish_compaction()
+        finally:
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._log.close()
+            self._close_snapshot()
+
+
+def _overlay_entries(entries, index, above):
+    """Scan source for one overlay: its live (ring id, key) slice, minus keys newer layers hold."""
+    for rid, key in index:
+        value = entries[key][1]
+        if value is not _TOMBSTONE and not any(key in newer for newer, _ in above):
+            yield rid, key, ('o', value)
+
+
+def durable_storage(root, **options):
+    """Storage factory for DHT(storage=...): one DurableKeyStore per node under root."""
+    def factory(node_id, key_id):
+        return DurableKeyStore(os.path.join(root, f"node-{node_id}"), key_id, **options)
+    return factory
@@ -0,0 +1,599 @@
+# chord_workload.py
+"""Synthetic workloads and operation traces: generate, record and replay.
+
+A Workload draws a stream of client operations: gets and puts over keys
+key-0 .. key-{keys - 1}, chosen by a key distribution (UniformKeys, ZipfKeys
+or HotspotKeys), with a read/write mix, value sizes, optional Poisson arrival
+times and a churn schedule of node joins and leaves. RecordingDHT wraps a live
+DHT and records the operations made through it instead.
+
+Either way the operations go to a trace file: a header block with the ring
+setup (identifier bits, replication factor, node count or ids), then blocks of
+records [dt_us, op, key, arg], each block chord_codec-encoded and zlib
+compressed. Values are not stored, only their sizes; replay writes
+placeholder bytes of the same size. replay() rebuilds the ring, loads the
+setup keys and runs the records against the DHT flat out or at a multiple of
+the recorded pace, reporting per-operation latency and throughput.
+
+Usage: python chord_workload.py generate TRACE [--ops N] [--distribution zipf] ...
+       python chord_workload.py replay TRACE [--speed X]
+       python chord_workload.py info TRACE
+"""
+
+import argparse
+import bisect
+import json
+import random
+import struct
+import sys
+import threading
+import time
+import zlib
+
+from chord_codec import decode, encode
+from chord_dht import BATCH_SIZE, DHT, R
+from chord_metrics import percentile
+from chord_quorum import InlineExecutor
+from chord_scheduler import ManualScheduler
+from chord_storage import plain
+
+TRACE_MAGIC = b'CHORDTRACE1\n'  # First bytes of every trace file
+TRACE_BLOCK = 4096  # Records per compressed block
+WORKLOAD_M = 32  # Identifier bits for generated workloads
+
+# Record operations: a record is [dt_us, op, key, arg], dt_us being the
+# microseconds since the previous record.
+GET = 'g'  # key; arg is 1/0 for found/missing when recorded, else None
+PUT = 'p'  # key; arg is the value size in bytes
+JOIN = 'j'  # key is the node id, or None for a random one
+LEAVE = 'l'  # key is the node id, or None for a random one
+FAIL = 'f'  # key is the node id, or None for a random one
+OP_NAMES = {GET: 'get', PUT: 'put', JOIN: 'join', LEAVE: 'leave', FAIL: 'fail'}
+
+_BLOCK_HEADER = struct.Struct('>I')
+
+
+class UniformKeys:
+    """Every key is equally likely."""
+
+    def __init__(self, keys):
+        self.keys = keys
+
+    def sample(self, rng):
+        return rng.randrange(self.keys)
+
+
+class ZipfKeys:
+    """Key i is drawn with probability proportional to 1 / (i + 1)^s."""
+
+    def __init__(self, keys, s=1.0):
+        self.keys = keys
+        self.s = s
+        self.cumulative = []
+        total = 0.0
+        for i in range(keys):
+            total += 1.0 / (i + 1) ** s
+            self.cumulative.append(total)
+
+    def sample(self, rng):
+        return min(bisect.bisect(self.cumulative, rng.random() * self.cumulative[-1]), self.keys - 1)
+
+
+class HotspotKeys:
+    """A `hot_fraction` of the keys receives `hot_ops` of the operations."""
+
+    def __init__(self, keys, hot_fraction=0.01, hot_ops=0.9):
+        self.keys = keys
+        self.hot = max(1, min(keys, int(keys * hot_fraction)))
+        self.hot_ops = hot_ops
+
+    def sample(self, rng):
+        if self.hot == self.keys or rng.random() < self.hot_ops:
+            return rng.randrange(self.hot)
+        return rng.randrange(self.hot, self.keys)
+
+
+DISTRIBUTIONS = {'uniform': UniformKeys, 'zipf': ZipfKeys, 'hotspot': HotspotKeys}
+
+
+def value_size(value):
+    """Bytes a value is recorded as: its length for str/bytes, else the length of its repr."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    return len(repr(value))
+
+
+def payload(size):
+    """Placeholder value of `size` bytes written on replay."""
+    return b'v' * size
+
+
+class Workload:
+    """A seeded stream of client operations and churn; see the module docstring.
+
+    `distribution` is a key distribution instance or a DISTRIBUTIONS name.
+    `value_size` is a byte count or a (low, high) range. `rate` is operations
+    per second with Poisson arrivals; None records no pacing. A join is made
+    every `join_every` operations and a leave every `leave_every` (0 is never).
+    """
+
+    def __init__(self, keys=10000, distribution='zipf', read_ratio=0.9, value_size=100,
+                 rate=None, join_every=0, leave_every=0, nodes=64, m=WORKLOAD_M, r=None, seed=0):
+        self.keys = keys
+        if isinstance(distribution, str):
+            distribution = DISTRIBUTIONS[distribution](keys)
+        self.distribution = distribution
+        self.read_ratio = read_ratio
+        self.value_size = value_size
+        self.rate = rate
+        self.join_every = join_every
+        self.leave_every = leave_every
+        self.nodes = nodes
+        self.m = m
+        self.r = r
+        self.seed = seed
+
+    def _size(self, rng):
+        if isinstance(self.value_size, int):
+            return self.value_size
+        return rng.randint(*self.value_size)
+
+    def meta(self):
+        return {
+            'source': 'generated',
+            'm': self.m,
+            'r': self.r,
+            'nodes': self.nodes,
+            'seed': self.seed,
+            'keys': self.keys,
+            'distribution': type(self.distribution).__name__,
+            'read_ratio': self.read_ratio,
+        }
+
+    def setup(self):
+        """PUT records that load every key before the timed operations."""
+        rng = random.Random(f"{self.seed}:setup")
+        for i in range(self.keys):
+            yield [0, PUT, f"key-{i}", self._size(rng)]
+
+    def operations(self, ops):
+        """Yield `ops` client operation records, with churn records interleaved."""
+        rng = random.Random(f"{self.seed}:ops")
+        for n in range(1, ops + 1):
+            dt = round(rng.expovariate(self.rate) * 1e6) if self.rate else 0
+            key = f"key-{self.distribution.sample(rng)}"
+            if rng.random() < self.read_ratio:
+                yield [dt, GET, key, None]
+            else:
+                yield [dt, PUT, key, self._size(rng)]
+            if self.join_every and n % self.join_every == 0:
+                yield [0, JOIN, None, None]
+            if self.leave_every and n % self.leave_every == 0:
+                yield [0, LEAVE, None, None]
+
+
+class TraceWriter:
+    """Appends records to a trace file in compressed blocks; use as a context manager."""
+
+    def __init__(self, path, meta):
+        self.file = open(path, 'wb')
+        self.file.write(TRACE_MAGIC)
+        self._block = []
+        self.records = 0
+        self._write_block(meta)
+
+    def _write_block(self, obj):
+        data = zlib.compress(encode(obj), 6)
+        self.file.write(_BLOCK_HEADER.pack(len(data)))
+        self.file.write(data)
+
+    def write(self, record):
+        self._block.append(record)
+        self.records += 1
+        if len(self._block) >= TRACE_BLOCK:
+            self.flush()
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        if self._block:
+            self._write_block(self._block)
+            self._block = []
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TraceReader:
+    """Reads a trace file: `meta` is its header, iterating yields its records."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+                raise ValueError(f"{path} is not a Chord trace file.")
+            self.meta = self._read_block(f)
+            if not isinstance(self.meta, dict):
+                raise ValueError(f"{path} has no trace header.")
+
+    @staticmethod
+    def _read_block(f):
+        header = f.read(_BLOCK_HEADER.size)
+        if not header:
+            return None
+        if len(header) < _BLOCK_HEADER.size:
+            raise ValueError("Truncated trace block header.")
+        (size,) = _BLOCK_HEADER.unpack(header)
+        data = f.read(size)
+        if len(data) < size:
+            raise ValueError("Truncated trace block.")
+        return decode(zlib.decompress(data))
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            f.seek(len(TRACE_MAGIC))
+            self._read_block(f)
+            while True:
+                block = self._read_block(f)
+                if block is None:
+                    return
+                yield from block
+
+
+def write_workload(path, workload, ops):
+    """Write the setup and `ops` operations of a Workload to a trace file; returns the record count."""
+    meta = workload.meta()
+    setup = list(workload.setup())
+    meta['setup'] = len(setup)
+    with TraceWriter(path, meta) as writer:
+        writer.write_many(setup)
+        writer.write_many(workload.operations(ops))
+        return writer.records
+
+
+class RecordingDHT:
+    """Wraps a DHT and records every store, retrieve and membership change made through it.
+
+    The ring's node ids and the keys it already holds (as setup records) are
+    written first, so a replay starts from the same state. Batch calls are
+    recorded key by key (and bootstrap or add_host node by node), all stamped
+    with the batch's start. Data attributes and read-only methods are passed
+    through to the wrapped DHT; any other method raises AttributeError instead
+    of silently bypassing the trace. Call close() to finish the trace.
+    """
+
+    # Wrapped-DHT methods that neither write keys nor change membership.
+    PASSTHROUGH = frozenset({'key_id', 'locate', 'handoff_progress', 'routing_stats', 'host_weight',
+                             'host_nodes', 'get_ring', 'get_finger_table', 'shutdown'})
+
+    def __init__(self, dht, path):
+        self.dht = dht
+        self._lock = threading.Lock()
+        snapshot = dht.membership
+        setup = []
+        for i, node in enumerate(snapshot.nodes):
+            with node.lock:
+                entries = node.data.range_items(snapshot.ids[i - 1], node.id)
+            setup.extend([0, PUT, key, value_size(plain(value))]
+                         for key, value, _ in entries)
+        meta = {'source': 'recorded', 'm': dht.m, 'r': dht.r, 'nodes': list(snapshot.ids),
+                'setup': len(setup)}
+        self.writer = TraceWriter(path, meta)
+        self.writer.write_many(setup)
+        self._last = time.monotonic()
+
+    def _record(self, op, key, arg, started):
+        self._record_many([(op, key, arg)], started)
+
+    def _record_many(self, records, started):
+        """Append (op, key, arg) records that all started at `started`."""
+        if not records:
+            return
+        with self._lock:
+            # Records are stamped with their start time, so replay keeps the pacing of the calls.
+            dt = max(0, round((started - self._last) * 1e6))
+            self._last = max(self._last, started)
+            self.writer.write_many([[dt if i == 0 else 0, op, key, arg]
+                                    for i, (op, key, arg) in enumerate(records)])
+
+    def store(self, key, value, consistency=None):
+        started = time.monotonic()
+        result = self.dht.store(key, value, consistency)
+        self._record(PUT, key, value_size(value), started)
+        return result
+
+    def retrieve(self, key, consistency=None):
+        started = time.monotonic()
+        value = self.dht.retrieve(key, consistency)
+        self._record(GET, key, int(value is not None), started)
+        return value
+
+    def multi_store(self, items):
+        if hasattr(items, 'items'):
+            items = items.items()
+        items = list(items)
+        started = time.monotonic()
+        result = self.dht.multi_store(items)
+        self._record_many([(PUT, key, value_size(value)) for key, value in items], started)
+        return result
+
+    def multi_get(self, keys):
+        started = time.monotonic()
+        found = self.dht.multi_get(keys)
+        self._record_many([(GET, key, int(value is not None)) for key, value in found.items()], started)
+        return found
+
+    def iter_multi_get(self, keys, batch_size=BATCH_SIZE):
+        """Stream (key, value) pairs like DHT.iter_multi_get, recording each batch."""
+        batch = []
+        for key in keys:
+            batch.append(key)
+            if len(batch) >= batch_size:
+                yield from self.multi_get(batch).items()
+                batch = []
+        if batch:
+            yield from self.multi_get(batch).items()
+
+    def _record_joins(self, nodes, items, started):
+        records = [(JOIN, node.id, None) for node in nodes]
+        if items is not None:
+            if hasattr(items, 'items'):
+                items = items.items()
+            records.extend((PUT, key, value_size(value)) for key, value in items)
+        self._record_many(records, started)
+
+    def add_node(self, node_id=None, host=None):
+        started = time.monotonic()
+        node = self.dht.add_node(node_id, host)
+        self._record(JOIN, node.id, None, started)
+        return node
+
+    def add_nodes(self, count, items=None):
+        if items is not None and not hasattr(items, 'items'):
+            items = list(items)
+        started = time.monotonic()
+        nodes = self.dht.add_nodes(count, items)
+        self._record_joins(nodes, items, started)
+        return nodes
+
+    def bootstrap(self, node_ids, items=None):
+        if items is not None and not hasattr(items, 'items'):
+            items = list(items)
+        started = time.monotonic()
+        nodes = self.dht.bootstrap(node_ids, items)
+        self._record_joins(nodes, items, started)
+        return nodes
+
+    def add_host(self, host=None, weight=1.0, vnodes=None):
+        started = time.monotonic()
+        nodes = self.dht.add_host(host, weight, vnodes)
+        self._record_joins(nodes, None, started)
+        return nodes
+
+    def remove_node(self, node_id):
+        started = time.monotonic()
+        self.dht.remove_node(node_id)
+        self._record(LEAVE, node_id, None, started)
+
+    def remove_host(self, host):
+        node_ids = [node.id for node in self.dht.host_nodes().get(host, [])]
+        started = time.monotonic()
+        self.dht.remove_host(host)
+        self._record_many([(LEAVE, node_id, None) for node_id in node_ids], started)
+
+    def fail_node(self, node_id):
+        started = time.monotonic()
+        self.dht.fail_node(node_id)
+        self._record(FAIL, node_id, None, started)
+
+    def close(self):
+        with self._lock:
+            self.writer.close()
+
+    def __getattr__(self, name):
+        attr = getattr(self.dht, name)
+        if getattr(attr, '__self__', None) is self.dht and name not in self.PASSTHROUGH:
+            raise AttributeError(f"RecordingDHT does not record {name}(); "
+                                 f"call it on .dht to bypass the trace")
+        return attr
+
+
+def build_dht(meta, seed=0, **kwargs):
+    """A manually scheduled DHT with the ring a trace header describes."""
+    dht = DHT(m=meta['m'], r=meta.get('r') or R, scheduler=ManualScheduler(),
+              rng=random.Random(f"{seed}:dht"), replica_executor=InlineExecutor(), **kwargs)
+    if isinstance(meta['nodes'], list):
+        dht.bootstrap(meta['nodes'])
+    else:
+        dht.add_nodes(meta['nodes'])
+    return dht
+
+
+def replay(dht, trace, speed=None, seed=0, maintain_every=0):
+    """Run a trace's records against `dht`; returns a JSON-able report.
+
+    The setup records are loaded with multi_store() and are not timed. With
+    `speed` None the operations run back to back; otherwise each starts at its
+    recorded time divided by `speed` (2.0 is twice as fast), and `behind`
+    reports how late the slowest one started. Joins and leaves without a node
+    id pick a random one from a `seed`ed stream. With `maintain_every` N, a
+    round of the DHT's ManualScheduler runs after every N operations.
+    """
+    rng = random.Random(f"{seed}:churn")
+    setup = trace.meta.get('setup', 0)
+    records = iter(trace)
+    batch = {}
+    for _, _, key, size in (next(records) for _ in range(setup)):
+        batch[key] = payload(size)
+    if batch:
+        dht.multi_store(batch)
+    del batch
+
+    latencies = {name: [] for name in OP_NAMES.values()}
+    missing = 0
+    mismatched = 0
+    behind = 0.0
+    done = 0
+    due = 0.0
+    started = time.perf_counter()
+    for dt, op, key, arg in records:
+        if speed:
+            due += dt / 1e6 / speed
+            lag = time.perf_counter() - started - due
+            if lag < 0:
+                time.sleep(-lag)
+            else:
+                behind = max(behind, lag)
+        t0 = time.perf_counter()
+        if op == GET:
+            found = dht.retrieve(key) is not None
+            missing += not found
+            mismatched += arg is not None and found != bool(arg)
+        elif op == PUT:
+            dht.store(key, payload(arg))
+        elif op == JOIN:
+            if key is None or key not in dht.nodes:
+                dht.add_node(key)
+        elif key is not None or len(dht.membership) > dht.r + 1:
+            if key is None:
+                key = dht.membership.ids[rng.randrange(len(dht.membership))]
+            if op == LEAVE:
+                dht.remove_node(key)
+            else:
+                dht.fail_node(key)
+        latencies[OP_NAMES[op]].append(time.perf_counter() - t0)
+        done += 1
+        if maintain_every and done % maintain_every == 0:
+            dht.scheduler.run_round()
+    elapsed = time.perf_counter() - started
+    return {
+        'operations': done,
+        'seconds': elapsed,
+        'ops_per_second': done / elapsed if elapsed else 0.0,
+        'speed': speed,
+        'behind_seconds': behind,
+        'missing': missing,
+        'found_mismatches': mismatched,
+        'nodes': len(dht.membership),
+        'latency_ms': {
+            name: {
+                'count': len(values),
+                'p50': percentile(values, 0.50) * 1e3,
+                'p95': percentile(values, 0.95) * 1e3,
+                'p99': percentile(values, 0.99) * 1e3,
+                'max': max(values) * 1e3,
+            }
+            for name, values in latencies.items() if values
+        },
+    }
+
+
+def trace_info(trace):
+    """Header, operation counts, recorded duration and key skew of a trace."""
+    setup = trace.meta.get('setup', 0)
+    counts = {}
+    keys = {}
+    micros = 0
+    for n, (dt, op, key, _) in enumerate(trace):
+        if n < setup:
+            continue
+        micros += dt
+        counts[OP_NAMES[op]] = counts.get(OP_NAMES[op], 0) + 1
+        if op in (GET, PUT):
+            keys[key] = keys.get(key, 0) + 1
+    accesses = sum(keys.values())
+    top = sorted(keys.values(), reverse=True)[:max(1, len(keys) // 100)]
+    meta = dict(trace.meta)
+    if isinstance(meta['nodes'], list):
+        meta['nodes'] = len(meta['nodes'])
+    return {
+        'meta': meta,
+        'operations': counts,
+        'recorded_seconds': micros / 1e6,
+        'distinct_keys': len(keys),
+        'top_1pct_key_share': sum(top) / accesses if accesses else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate, inspect and replay Chord operation traces.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    gen = commands.add_parser('generate', help="write a synthetic workload trace")
+    gen.add_argument('trace')
+    gen.add_argument('--ops', type=int, default=100000)
+    gen.add_argument('--keys', type=int, default=10000)
+    gen.add_argument('--distribution', choices=sorted(DISTRIBUTIONS), default='zipf')
+    gen.add_argument('--zipf-s', type=float, default=1.0, help="zipf exponent")
+    gen.add_argument('--hot-fraction', type=float, default=0.01, help="share of keys that are hot")
+    gen.add_argument('--hot-ops', type=float, default=0.9, help="share of operations on hot keys")
+    gen.add_argument('--read-ratio', type=float, default=0.9)
+    gen.add_argument('--value-size', type=int, nargs='+', default=[100], metavar='BYTES',
+                     help="value size, or a low and high bound")
+    gen.add_argument('--rate', type=float, help="operations per second (Poisson); default unpaced")
+    gen.add_argument('--join-every', type=int, default=0, help="operations between joins")
+    gen.add_argument('--leave-every', type=int, default=0, help="operations between leaves")
+    gen.add_argument('--nodes', type=int, default=64)
+    gen.add_argument('--m', type=int, default=WORKLOAD_M)
+    gen.add_argument('--seed', type=int, default=1)
+
+    rep = commands.add_parser('replay', help="replay a trace against an in-process DHT")
+    rep.add_argument('trace')
+    rep.add_argument('--speed', type=float, help="multiple of the recorded pace; default flat out")
+    rep.add_argument('--maintain-every', type=int, default=1000,
+                     help="operations between maintenance rounds (0 is never)")
+    rep.add_argument('--seed', type=int, default=1)
+    rep.add_argument('--output', help="write JSON here instead of stdout")
+
+    info = commands.add_parser('info', help="summarize a trace")
+    info.add_argument('trace')
+    info.add_argument('--output', help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.command == 'generate':
+        if args.distribution == 'zipf':
+            distribution = ZipfKeys(args.keys, args.zipf_s)
+        elif args.distribution == 'hotspot':
+            distribution = HotspotKeys(args.keys, args.hot_fraction, args.hot_ops)
+        else:
+            distribution = UniformKeys(args.keys)
+        size = args.value_size[0] if len(args.value_size) == 1 else tuple(args.value_size[:2])
+        workload = Workload(args.keys, distribution, args.read_ratio, size, args.rate,
+                            args.join_every, args.leave_every, args.nodes, args.m, seed=args.seed)
+        records = write_workload(args.trace, workload, args.ops)
+        print(f"Wrote {records} records to {args.trace}.")
+        return 0
+
+    trace = TraceReader(args.trace)
+    if args.command == 'replay':
+        dht = build_dht(trace.meta, args.seed)
+        try:
+            report = replay(dht, trace, args.speed, args.seed, args.maintain_every)
+        finally:
+            dht.shutdown()
+    else:
+        report = trace_info(trace)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
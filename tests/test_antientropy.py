@@ -0,0 +1,79 @@
+# test_antientropy.py
+"""Merkle anti-entropy: one sync makes diverged replicas agree, equal trees ship nothing."""
+
+import random
+
+import pytest
+
+from chord_antientropy import AntiEntropy, merkle_storage
+from chord_dht import DHT
+from chord_scheduler import ManualScheduler
+from chord_storage import Versioned
+
+M = 16
+KEYS = [f"key-{i}" for i in range(300)]
+
+
+def make_dht(nodes):
+    random.seed(4)
+    dht = DHT(m=M, r=3, storage=merkle_storage(M), scheduler=ManualScheduler())
+    dht.add_nodes(nodes)
+    dht.multi_store({key: key for key in KEYS})
+    return dht
+
+
+def range_of(dht, node):
+    ids = dht.membership.ids
+    return ids[ids.index(node.id) - 1], node.id
+
+
+def contents(node, start, end):
+    return {key: value for key, value, _ in node.data.range_items(start, end)}
+
+
+@pytest.fixture
+def dht():
+    dht = make_dht(8)
+    yield dht
+    dht.shutdown()
+
+
+def test_diverged_replicas_agree_after_one_sync(dht):
+    a = dht.membership.nodes[3]
+    b = a.successor
+    start, end = range_of(dht, a)
+    keys = sorted(contents(a, start, end), key=dht.key_id)
+    assert len(keys) >= 3
+    newer_on_a, missing_on_b, newer_on_b = keys[:3]
+    newer_a = Versioned(a.data[newer_on_a].version + 1, 'a')
+    newer_b = Versioned(b.data[newer_on_b].version + 1, 'b')
+    a.data.put(newer_on_a, newer_a, dht.key_id(newer_on_a))
+    b.data.delete(missing_on_b)
+    b.data.put(newer_on_b, newer_b, dht.key_id(newer_on_b))
+    assert contents(a, start, end) != contents(b, start, end)
+
+    compared, repaired = AntiEntropy(dht).sync_pair(a, b, start, end)
+
+    assert repaired == 3
+    assert compared < 2 ** 11 - 1  # Only the differing paths were descended
+    assert contents(a, start, end) == contents(b, start, end)
+    assert b.data[newer_on_a] == newer_a
+    assert a.data[newer_on_b] == newer_b
+    assert missing_on_b in b.data
+    assert AntiEntropy(dht).sync_pair(a, b, start, end)[1] == 0
+
+
+def test_in_sync_replicas_transfer_nothing(dht):
+    entropy = AntiEntropy(dht)
+    assert entropy.run_round()['repaired'] == 0
+    assert entropy.repaired.value == 0
+
+
+def test_identical_trees_compare_only_the_root():
+    dht = make_dht(3)  # r == 3: every node holds every key
+    try:
+        a, b = dht.membership.nodes[:2]
+        assert a.data.tree.root == b.data.tree.root
+        assert AntiEntropy(dht).sync_pair(a, b, *range_of(dht, a)) == (1, 0)
+    finally:
+        dht.shutdown()
@@ -0,0 +1,92 @@
+# test_balance.py
+"""Virtual node hosts: rebalancing evens load, splits take the right range, hosts leave cleanly."""
+
+import bisect
+import random
+
+import pytest
+
+from chord_balance import Rebalancer, _owned_keys, load_report
+from chord_dht import DHT
+from chord_scheduler import ManualScheduler
+
+KEYS = [f"key-{i}" for i in range(2000)]
+
+
+def make_dht(seed, vnodes):
+    random.seed(seed)
+    return DHT(m=32, vnodes=vnodes, scheduler=ManualScheduler())
+
+
+def owner_errors(dht):
+    """Count keys whose owner (first node at or after the key id) does not hold them."""
+    snapshot = dht.membership
+    owned = _owned_keys(dht)
+    misplaced = 0
+    for node in snapshot.nodes:
+        for ring_id in owned[node]:
+            if snapshot.nodes[bisect.bisect_left(snapshot.ids, ring_id) % len(snapshot)] is not node:
+                misplaced += 1
+    held = sum(len(ids) for ids in owned.values())
+    return misplaced + len(KEYS) - held
+
+
+@pytest.fixture
+def hosts():
+    dht = make_dht(seed=3, vnodes=2)
+    for _ in range(8):
+        dht.add_host()
+    dht.multi_store({key: key for key in KEYS})
+    yield dht
+    dht.shutdown()
+
+
+def test_rebalance_lowers_key_imbalance(hosts):
+    before = load_report(hosts)['keys']['max_over_fair']
+    moves = Rebalancer(hosts, key_weight=1.0).rebalance()
+    after = load_report(hosts)['keys']['max_over_fair']
+    assert moves
+    assert after < before
+    assert after <= 1.25
+    assert owner_errors(hosts) == 0
+    assert hosts.multi_get(KEYS) == {key: key for key in KEYS}
+
+
+def test_split_position_takes_the_start_of_the_heavy_range():
+    dht = make_dht(seed=5, vnodes=1)
+    try:
+        dht.add_host('a')
+        dht.add_host('b')
+        dht.multi_store({key: key for key in KEYS})
+        owned = _owned_keys(dht)
+        heavy = max(owned, key=lambda n: len(owned[n]))
+        light_host = 'b' if heavy.host == 'a' else 'a'
+        heavy_ids = owned[heavy]
+
+        moves = Rebalancer(dht, key_weight=1.0).rebalance(max_moves=1)
+
+        assert [move['kind'] for move in moves] == ['split']
+        new = dht.membership.get(moves[0]['node'])
+        assert new.host == light_host
+        assert new.predecessor.successor is new and new.successor is heavy
+        taken = moves[0]['keys']
+        after = _owned_keys(dht)
+        assert after[new] == heavy_ids[:taken]
+        assert after[heavy] == heavy_ids[taken:]
+        # The light host's old position plus the split now hold as many keys as the heavy one.
+        assert abs(len(after[new]) + len(owned[new.predecessor]) - len(after[heavy])) <= 1
+        assert owner_errors(dht) == 0
+    finally:
+        dht.shutdown()
+
+
+def test_remove_host_drops_every_position_and_keeps_keys(hosts):
+    gone = hosts.membership.nodes[0].host
+    count = len(hosts.host_nodes()[gone])
+    total = len(hosts.membership)
+    hosts.remove_host(gone)
+    assert gone not in hosts.host_nodes()
+    assert gone not in hosts.hosts
+    assert len(hosts.membership) == total - count
+    assert owner_errors(hosts) == 0
+    assert hosts.multi_get(KEYS) == {key: key for key in KEYS}
@@ -0,0 +1,93 @@
+# test_fingers.py
+"""Incremental finger repair and the configurable identifier width."""
+
+import bisect
+import math
+import random
+
+import pytest
+
+from chord_dht import DHT, MAX_M, hash_key
+from chord_scheduler import ManualScheduler
+
+NODES = 40
+
+
+def ring(dht):
+    return [dht.nodes[node_id] for node_id in sorted(dht.nodes)]
+
+
+def expected_fingers(dht, node):
+    ids = sorted(dht.nodes)
+    space = 1 << dht.m
+    return [ids[bisect.bisect_left(ids, (node.id + (1 << i)) % space) % len(ids)]
+            for i in range(dht.m)]
+
+
+def finger_errors(dht):
+    return sum(f.id != e for node in ring(dht)
+               for f, e in zip(node.finger, expected_fingers(dht, node)))
+
+
+@pytest.fixture
+def wide_ring():
+    random.seed(11)
+    dht = DHT(m=MAX_M, scheduler=ManualScheduler(), fingers_per_round=3)
+    for _ in range(NODES):
+        dht.add_node()
+    # Stabilize links the joined nodes into the ring one round at a time.
+    dht.scheduler.run_round(2 * NODES)
+    yield dht
+    dht.shutdown()
+
+
+def counting_lookups(node):
+    calls = [0]
+    find = node.find_successor
+
+    def find_successor(id_):
+        calls[0] += 1
+        return find(id_)
+    node.find_successor = find_successor
+    return calls
+
+
+def test_fingers_converge_on_a_160_bit_ring_with_bounded_lookups(wide_ring):
+    dht = wide_ring
+    assert all(node.id < 1 << MAX_M for node in ring(dht))
+    for node in ring(dht):
+        node.finger = [node.successor] * dht.m
+        node.next_finger = 0
+    assert finger_errors(dht)
+    counters = {node: counting_lookups(node) for node in ring(dht)}
+    # Only the ~log2(N) distinct fingers past the successor need a lookup.
+    budget = 2 * math.ceil(math.log2(NODES) / dht.fingers_per_round) + 2
+    for _ in range(budget):
+        for node, calls in counters.items():
+            calls[0] = 0
+            node.fix_fingers()
+            assert calls[0] <= dht.fingers_per_round
+        if not finger_errors(dht):
+            break
+    assert finger_errors(dht) == 0
+
+
+def test_converged_fingers_cost_no_lookups(wide_ring):
+    dht = wide_ring
+    dht.scheduler.run_round(10)
+    assert finger_errors(dht) == 0
+    counters = {node: counting_lookups(node) for node in ring(dht)}
+    for node in ring(dht):
+        node.fix_fingers()
+    assert sum(calls[0] for calls in counters.values()) == 0
+
+
+@pytest.mark.parametrize('m', [0, -1, MAX_M + 1])
+def test_out_of_range_identifier_width_is_rejected(m):
+    with pytest.raises(ValueError):
+        DHT(m=m, scheduler=ManualScheduler())
+
+
+def test_keys_hash_into_the_dht_width():
+    assert all(hash_key(f"k{i}", 8) < 256 for i in range(200))
+    assert max(hash_key(f"k{i}", MAX_M) for i in range(200)).bit_length() > 150
@@ -0,0 +1,97 @@
+# test_handoff.py
+"""Key handoff: forwarding between source and target while a range is being streamed."""
+
+import random
+import threading
+
+import pytest
+
+from chord_dht import DHT
+from chord_scheduler import ManualScheduler
+from chord_storage import Versioned
+
+
+@pytest.fixture
+def ring():
+    random.seed(3)
+    dht = DHT(m=16, scheduler=ManualScheduler(), r=1)
+    source = dht.add_node(40000)
+    target = dht.add_node(20000)
+    dht.multi_store({f"key-{i}": i for i in range(200)})
+    yield dht, source, target
+    dht.shutdown()
+
+
+def keys_in(dht, start, end, count=200):
+    return [k for k in (f"key-{i}" for i in range(count)) if start < dht.key_id(k) <= end]
+
+
+def test_target_forwards_misses_to_source(ring):
+    dht, source, target = ring
+    # Give the target's range back to the source, then open a handoff without copying.
+    owned = [key for key, _, _ in target.data.range_items(source.id, target.id)]
+    entries = target.data.pop_range(0, 0)
+    source.store_many(entries)
+    handoff = dht.handoff(source, target, source.id, target.id, 'move_keys')
+    handoff.begin()
+    key = owned[0]
+    assert key not in target.data
+    assert target.retrieve(key) is not None
+    assert target.read(key) is not None
+    handoff.commit()
+    assert target.retrieve(key) is None
+
+
+def test_writes_to_target_reach_source_until_commit(ring):
+    dht, source, target = ring
+    handoff = dht.handoff(source, target, source.id, target.id, 'move_keys')
+    handoff.begin()
+    key = keys_in(dht, -1, 20000)[0]
+    target.store(key, Versioned(10 ** 20, 'new'))
+    assert source.data.get(key) == Versioned(10 ** 20, 'new')
+    handoff.run()
+    target.store(key, Versioned(10 ** 20 + 1, 'newer'))
+    assert source.data.get(key) == Versioned(10 ** 20, 'new')
+
+
+def test_chunks_never_roll_back_newer_writes(ring):
+    dht, source, target = ring
+    key = next(k for k in (f"fresh-{i}" for i in range(1000)) if dht.key_id(k) <= 20000)
+    source.store(key, Versioned(1, 'old'))
+    target.store(key, Versioned(2, 'new'))
+    dht.handoff(source, target, source.id, target.id, 'move_keys').run()
+    assert target.data.get(key) == Versioned(2, 'new')
+
+
+def test_join_under_concurrent_writes_keeps_every_write():
+    # A throttled join takes about half a second; a writer keeps overwriting
+    # every key meanwhile, through whichever node the ring routes it to.
+    random.seed(5)
+    dht = DHT(m=16, scheduler=ManualScheduler(), handoff_chunk=50, handoff_rate=2000)
+    try:
+        dht.add_nodes(4)
+        keys = [f"key-{i}" for i in range(1000)]
+        dht.multi_store({key: 0 for key in keys})
+        last = {}
+        stop = threading.Event()
+
+        def writer():
+            round_ = 1
+            while not stop.is_set():
+                for key in keys:
+                    if dht.store(key, round_):
+                        last[key] = round_
+                round_ += 1
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            new = dht.add_node()
+        finally:
+            stop.set()
+            thread.join()
+        assert new.outgoing == [] and new.incoming == [] and dht.handoffs == []
+        stale = [key for key in keys if dht.retrieve(key) != last.get(key, 0)]
+        assert stale == []
+    finally:
+        dht.shutdown()
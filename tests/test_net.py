@@ -0,0 +1,88 @@
+# test_net.py
+"""Networked mode: versioned writes survive joins and graceful leaves."""
+
+import asyncio
+import random
+import socket
+
+from chord_net import ClusterClient, NetNode, RPCError, _from_wire, _to_wire
+from chord_storage import Versioned
+
+M = 16
+PERIOD = 0.05
+KEYS = [f"key-{i}" for i in range(120)]
+WRITERS = 12
+
+
+def free_ports(count):
+    socks = []
+    for _ in range(count):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        socks.append(sock)
+    ports = [sock.getsockname()[1] for sock in socks]
+    for sock in socks:
+        sock.close()
+    return ports
+
+
+def test_copies_never_roll_back_newer_versions():
+    node = NetNode(5, 0, m=M)
+    node.store_many(_from_wire([['k', 7, 'new', 3]]))
+    asyncio.run(node.rpc_store_many(_to_wire([('k', Versioned(6, 'old'), 3)])))
+    assert node.data.get('k') == Versioned(7, 'new')
+    assert node.rpc_retrieve('k') == 'new'
+    # A batch repeating a key keeps its newest entry.
+    node.store_many([('j', Versioned(2, 'b'), 9), ('j', Versioned(1, 'a'), 9)])
+    assert node.rpc_retrieve('j') == 'b'
+
+
+async def churn(seed):
+    rng = random.Random(seed)
+    ports = free_ports(6)
+    ids = rng.sample(range(2 ** M), len(ports))
+    nodes = [NetNode(node_id, port, m=M, r=3, period=PERIOD) for node_id, port in zip(ids, ports)]
+    await nodes[0].start()
+    for node in nodes[1:4]:
+        await node.start(ports[0])
+    await asyncio.sleep(20 * PERIOD)
+    client = ClusterClient(ports[:1], m=M, seed=seed)
+    latest = {}
+    lost = []
+
+    async def writer(keys, version):
+        for key in keys:
+            value = f"{key}@{version}"
+            try:
+                if await client.store(key, value):
+                    latest[key] = value
+            except RPCError:
+                pass  # Unacknowledged writes may or may not be kept
+
+    def write_all(version):
+        # One writer per key, so the last acknowledged value is the newest.
+        return asyncio.gather(*(writer(KEYS[i::WRITERS], version) for i in range(WRITERS)))
+
+    steps = [lambda: nodes[4].start(ports[0]), nodes[2].leave, lambda: nodes[5].start(ports[0])]
+    try:
+        await write_all(0)
+        # Each churn step races one round of newer writes; any key whose last
+        # acknowledged write was overwritten by a stale copy stays wrong.
+        for version, step in enumerate(steps, 1):
+            await asyncio.gather(step(), write_all(version))
+            await asyncio.sleep(10 * PERIOD)
+            found = await client.multi_get(KEYS)
+            lost.extend(key for key in KEYS if found[key] != latest.get(key))
+    finally:
+        client.close()
+        for i, node in enumerate(nodes):
+            if i != 2:
+                await node.stop()
+    return len(latest), lost
+
+
+def test_join_and_leave_keep_the_newest_writes():
+    for seed in range(2):
+        written, lost = asyncio.run(churn(seed))
+        assert written == len(KEYS)
+        assert lost == []
@@ -0,0 +1,152 @@
+# test_placement.py
+"""Key placement: every key lives on its owner and the next R - 1 nodes, through churn."""
+
+import bisect
+import random
+
+import pytest
+
+from chord_dht import DHT, hash_key
+from chord_scheduler import ManualScheduler
+from chord_storage import Versioned, plain
+
+KEYS = [f"key-{i}" for i in range(400)]
+
+
+def ring(dht):
+    """Return (ids, nodes) of the published ring in id order."""
+    snapshot = dht.membership
+    return snapshot.ids, snapshot.nodes
+
+
+def placement(dht):
+    """Return (missing, surplus): replica copies that should exist but don't, and copies that shouldn't."""
+    ids, nodes = ring(dht)
+    n = len(ids)
+    wanted = {node: set() for node in nodes}
+    for key in KEYS:
+        owner = bisect.bisect_left(ids, hash_key(key, dht.m)) % n
+        for j in range(min(dht.r, n)):
+            wanted[nodes[(owner + j) % n]].add(key)
+    missing = sum(len(keys - set(node.data)) for node, keys in wanted.items())
+    surplus = sum(len(set(node.data) - keys) for node, keys in wanted.items())
+    return missing, surplus
+
+
+@pytest.fixture
+def dht():
+    random.seed(7)
+    dht = DHT(m=16, scheduler=ManualScheduler())
+    for _ in range(12):
+        dht.add_node()
+    dht.scheduler.run_round(5)  # Fill in successor lists and fingers
+    for key in KEYS:
+        assert dht.store(key, key)
+    assert placement(dht) == (0, 0)
+    yield dht
+    dht.shutdown()
+
+
+def test_join_moves_keys_and_trims_replicas(dht):
+    # Back to back, with no maintenance to refresh successor lists in between.
+    for _ in range(4):
+        dht.add_node()
+        assert placement(dht) == (0, 0)
+    assert all(dht.retrieve(key) == key for key in KEYS)
+
+
+def test_writes_after_a_join_reach_the_new_replica(dht):
+    # No maintenance either: successor lists still skip the new node.
+    dht.add_node()
+    for key in KEYS:
+        assert dht.store(key, key + '-new')
+    assert placement(dht) == (0, 0)
+    assert all(plain(node.data[key]) == key + '-new' for node in dht.nodes.values() for key in node.data)
+
+
+def ring_pointer_errors(dht):
+    _, nodes = ring(dht)
+    return sum(node.successor is not nodes[(i + 1) % len(nodes)] or node.predecessor is not nodes[i - 1]
+               for i, node in enumerate(nodes))
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_interleaved_joins_and_leaves_without_maintenance(dht, seed):
+    rng = random.Random(seed)
+    for i in range(20):
+        if i % 2 == 0:
+            dht.add_node()
+        else:
+            ids, _ = ring(dht)
+            dht.remove_node(ids[rng.randrange(len(ids))])
+        assert ring_pointer_errors(dht) == 0
+    assert placement(dht) == (0, 0)
+    assert all(dht.retrieve(key) == key for key in KEYS)
+
+
+def test_leave_hands_off_and_keeps_replication(dht):
+    for i in range(4):
+        dht.remove_node(ring(dht)[0][2 * i])
+        assert placement(dht) == (0, 0)
+    dht.scheduler.run_round(3)
+    assert placement(dht) == (0, 0)
+    assert all(dht.retrieve(key) == key for key in KEYS)
+
+
+def test_join_at_ring_wrap(dht):
+    first = ring(dht)[0][0]
+    dht.add_node(first // 2)
+    assert ring(dht)[0][0] == first // 2
+    assert placement(dht) == (0, 0)
+
+
+def test_fail_keeps_keys_on_new_owner(dht):
+    # Non-adjacent crashes: each key still has a surviving replica, which is
+    # the new owner once the ring has stabilized.
+    for i in range(3):
+        dht.fail_node(ring(dht)[0][4 * i])
+    dht.scheduler.run_round(3)
+    ids, nodes = ring(dht)
+    for key in KEYS:
+        owner = nodes[bisect.bisect_left(ids, hash_key(key, dht.m)) % len(ids)]
+        assert key in owner.data
+        assert dht.retrieve(key) == key
+
+
+def test_small_ring_holds_everything():
+    dht = DHT(m=8, scheduler=ManualScheduler())
+    try:
+        for node_id in (10, 100, 200):
+            dht.add_node(node_id)
+        dht.multi_store({key: key for key in KEYS[:50]})
+        dht.remove_node(100)
+        for node in dht.nodes.values():
+            assert len(node.data) == 50
+    finally:
+        dht.shutdown()
+
+
+def test_bootstrap_places_keys_and_keeps_newest_copy(dht):
+    key = KEYS[0]
+    # Only the first holder bootstrap reads keeps the current copy; the stale
+    # ones read after it must not win.
+    holders = [node for node in dht.nodes.values() if key in node.data]
+    for node in holders[1:]:
+        node.data.put(key, Versioned(1, 'stale'), dht.key_id(key))
+    dht.bootstrap([i * 5000 + 17 for i in range(13)])
+    assert placement(dht) == (0, 0)
+    assert all(dht.retrieve(k) == k for k in KEYS)
+
+
+def test_bootstrap_drops_keys_only_after_publishing_the_new_ring(dht):
+    # Every pop_range must happen while the published ring still finds every
+    # key on its owner and replicas, as lock-free readers would look for it.
+    checked = []
+    for node in dht.nodes.values():
+        def pop_range(start, end, pop=node.data.pop_range):
+            checked.append(placement(dht)[0])
+            return pop(start, end)
+        node.data.pop_range = pop_range
+    dht.bootstrap([i * 5000 + 17 for i in range(13)])
+    assert checked and not any(checked)
+    assert placement(dht) == (0, 0)
@@ -0,0 +1,113 @@
+# test_quorum.py
+"""Consistency-level reads and writes, hedged reads and read repair against stub replicas."""
+
+import time
+
+import pytest
+
+from chord_metrics import ChordMetrics
+from chord_quorum import (ALL, ONE, QUORUM, LatencyTracker, ReplicaBusy, ReplicaCoordinator,
+                          ReplicaUnavailable, required)
+from chord_storage import Versioned
+
+
+class Replica:
+    def __init__(self, stored=None, alive=True, busy_for=0.0):
+        self.alive = alive
+        self.data = {} if stored is None else {'k': stored}
+        self.busy_for = busy_for  # A blocking read takes this long; non-blocking ones fail
+        self.reads = 0
+
+    def read(self, key, blocking=True):
+        if not self.alive:
+            raise ReplicaUnavailable()
+        if self.busy_for:
+            if not blocking:
+                raise ReplicaBusy()
+            time.sleep(self.busy_for)
+        self.reads += 1
+        return self.data.get(key)
+
+    def store(self, key, stored, key_id):
+        self.data[key] = stored
+
+
+@pytest.fixture
+def coordinator():
+    coordinator = ReplicaCoordinator(ChordMetrics())
+    yield coordinator
+    coordinator.shutdown()
+
+
+def drain(coordinator):
+    """Wait for the background copies and repairs handed to the pool."""
+    if coordinator._pool is not None:
+        coordinator._pool.shutdown(wait=True)
+
+
+@pytest.mark.parametrize('level, counts', [(ONE, [1, 1, 1, 1, 1]), (QUORUM, [1, 2, 2, 3, 3]),
+                                           (ALL, [1, 2, 3, 4, 5])])
+def test_required(level, counts):
+    assert [required(level, r) for r in range(1, 6)] == counts
+
+
+def test_unknown_level_is_rejected():
+    with pytest.raises(ValueError):
+        required('most', 3)
+
+
+@pytest.mark.parametrize('level, acks', [(ONE, 1), (QUORUM, 2), (ALL, 2)])
+def test_write_acks_and_background_copies(coordinator, level, acks):
+    replicas = [Replica(), Replica(alive=False), Replica()]
+    value = Versioned(1, 'v')
+    assert coordinator.write(replicas, 'k', value, 0, required(level, 3)) == acks
+    # The rest were handed to the pool; the dead replica is skipped.
+    drain(coordinator)
+    assert [r.data.get('k') for r in replicas] == [value, None, value]
+
+
+def test_read_fails_when_too_few_replicas_answer(coordinator):
+    replicas = [Replica(Versioned(1, 'a')), Replica(alive=False), Replica(Versioned(1, 'a'))]
+    assert coordinator.read(replicas, 'k', 0, required(QUORUM, 3)) == Versioned(1, 'a')
+    with pytest.raises(ReplicaUnavailable):
+        coordinator.read(replicas, 'k', 0, required(ALL, 3))
+
+
+def test_one_read_asks_further_replicas_only_on_a_miss(coordinator):
+    replicas = [Replica(), Replica(Versioned(2, 'b')), Replica(Versioned(1, 'a'))]
+    assert coordinator.read(replicas, 'k', 0, 1) == Versioned(2, 'b')
+    assert replicas[2].reads == 0
+
+
+def test_read_repair_writes_newest_version_back(coordinator):
+    replicas = [Replica(Versioned(1, 'old')), Replica(Versioned(3, 'new')), Replica()]
+    assert coordinator.read(replicas, 'k', 0, required(ALL, 3)) == Versioned(3, 'new')
+    drain(coordinator)
+    assert all(r.data['k'] == Versioned(3, 'new') for r in replicas)
+    assert coordinator.repairs.value == 2
+
+
+def test_latency_tracker_threshold_follows_percentile():
+    tracker = LatencyTracker(percentile=0.9)
+    for i in range(100):
+        tracker.record(0.05 if i % 20 == 0 else 0.001)  # 5% slow: below p90
+    assert tracker.threshold() == pytest.approx(0.001)
+    for _ in range(64):
+        tracker.record(0.05)
+    assert tracker.threshold() == pytest.approx(0.05)
+
+
+def test_hedged_read_fires_after_the_tracked_percentile():
+    coordinator = ReplicaCoordinator(ChordMetrics(), workers=2)
+    try:
+        for _ in range(64):
+            coordinator.latency.record(0.02)
+        slow = Replica(Versioned(1, 'slow'), busy_for=0.5)
+        fast = Replica(Versioned(1, 'fast'))
+        started = time.perf_counter()
+        assert coordinator.read([slow, fast], 'k', 0, 1) == Versioned(1, 'fast')
+        elapsed = time.perf_counter() - started
+        assert coordinator.hedged.value == 1
+        assert 0.02 <= elapsed < 0.4
+    finally:
+        coordinator.shutdown()
@@ -0,0 +1,104 @@
+# test_routing_cache.py
+"""Client routing cache: hits, CLOCK eviction, epoch invalidation, and agreement with the ring."""
+
+import bisect
+import random
+
+import pytest
+
+from chord_dht import DHT, RoutingCache
+from chord_scheduler import ManualScheduler
+
+
+class Owner:
+    def __init__(self, node_id):
+        self.id = node_id
+        self.alive = True
+
+
+def test_hit_and_miss():
+    cache = RoutingCache(capacity=8)
+    owner = Owner(500)
+    cache.put(100, owner, 3, epoch=1)
+    assert cache.get(300, 1) == (100, owner)
+    assert cache.get(500, 1) == (100, owner)  # Ranges include their end...
+    assert cache.get(100, 1) is None  # ...but not their start
+    assert cache.get(600, 1) is None
+    owner.alive = False
+    assert cache.get(300, 1) is None
+    assert (cache.hits, cache.misses, cache.hops_saved) == (2, 3, 6)
+
+
+def test_clock_eviction_gives_referenced_entries_a_second_chance():
+    cache = RoutingCache(capacity=3)
+    owners = [Owner(i) for i in (100, 200, 300, 400)]
+    for low, owner in zip((0, 100, 200), owners):
+        cache.put(low, owner, 1, epoch=1)
+    assert cache.get(50, 1)  # References the oldest entry, (0, 100]
+    cache.put(300, owners[3], 1, epoch=1)
+    assert len(cache) == 3
+    assert cache.get(150, 1) is None  # (100, 200] was the first unreferenced one
+    assert cache.get(50, 1) and cache.get(250, 1) and cache.get(350, 1)
+
+
+def test_epoch_bump_invalidates_and_stale_results_are_not_cached():
+    cache = RoutingCache(capacity=8)
+    cache.put(0, Owner(100), 1, epoch=1)
+    assert cache.get(50, 2) is None
+    cache.put(100, Owner(200), 1, epoch=2)
+    assert len(cache) == 1 and cache.invalidations == 1
+    assert cache.get(50, 2) is None and cache.get(150, 2)
+    cache.put(200, Owner(300), 1, epoch=1)  # Resolved against the old membership
+    assert len(cache) == 1
+
+
+def test_key_past_the_largest_end_resolves_to_the_wrapping_range():
+    cache = RoutingCache(capacity=8)
+    first, last = Owner(100), Owner(40000)
+    cache.put(60000, first, 2, epoch=1)  # (60000, 100] wraps past zero
+    cache.put(20000, last, 2, epoch=1)
+    assert cache.get(65000, 1) == (60000, first)
+    assert cache.get(7, 1) == (60000, first)
+    assert cache.get(50000, 1) is None  # Past 40000 but before 60000: not cached
+
+
+@pytest.fixture
+def dht():
+    random.seed(9)
+    dht = DHT(m=16, scheduler=ManualScheduler())
+    for _ in range(16):
+        dht.add_node()
+    converge(dht)
+    yield dht
+    dht.shutdown()
+
+
+def converge(dht):
+    # Lookups only find the right owner once stabilize has linked the ring.
+    dht.scheduler.run_round(2 * len(dht.nodes))
+
+
+def expected_owner(dht, key_id):
+    ids = sorted(dht.nodes)
+    return ids[bisect.bisect_left(ids, key_id) % len(ids)]
+
+
+def test_cache_agrees_with_membership_through_churn(dht):
+    key_ids = [random.Random(i).randrange(1 << 16) for i in range(300)]
+
+    def check():
+        for _ in range(2):  # The second pass is served from the cache
+            assert all(dht.locate(k)[1].id == expected_owner(dht, k) for k in key_ids)
+
+    check()
+    assert dht.routing_cache.hits >= len(key_ids)
+    dht.add_node()
+    converge(dht)
+    check()
+    dht.remove_node(sorted(dht.nodes)[3])
+    converge(dht)
+    check()
+    dht.fail_node(sorted(dht.nodes)[7])
+    converge(dht)
+    check()
+    assert dht.routing_cache.invalidations >= 3
@@ -0,0 +1,80 @@
+# test_scheduler.py
+"""Maintenance schedulers: jittered periods, a bounded worker pool, and unregistering."""
+
+import statistics
+import threading
+import time
+
+from chord_scheduler import ManualScheduler, ThreadPoolScheduler
+
+PERIOD = 0.02
+
+
+class FakeNode:
+    def __init__(self, node_id):
+        self.id = node_id
+        self.alive = True
+        self.rounds = []  # (monotonic time, worker thread name)
+
+    def maintain(self):
+        self.rounds.append((time.monotonic(), threading.current_thread().name))
+
+
+def run_for(scheduler, nodes, seconds):
+    for node in nodes:
+        scheduler.register(node)
+    time.sleep(seconds)
+    scheduler.stop()
+
+
+def test_jitter_spreads_rounds():
+    nodes = [FakeNode(i) for i in range(20)]
+    run_for(ThreadPoolScheduler(period=PERIOD, jitter=0.2, workers=2, seed=1), nodes, 0.4)
+    firsts = [node.rounds[0][0] for node in nodes]
+    assert len({round(t, 4) for t in firsts}) > 10  # Random initial phases
+    gaps = [b[0] - a[0] for node in nodes for a, b in zip(node.rounds, node.rounds[1:])]
+    assert len(gaps) > 50
+    assert statistics.pstdev(gaps) > 0.02 * PERIOD
+    assert statistics.median(gaps) > 0.8 * PERIOD
+
+
+def test_workers_are_bounded_not_one_thread_per_node():
+    nodes = [FakeNode(i) for i in range(200)]
+    before = threading.active_count()
+    scheduler = ThreadPoolScheduler(period=PERIOD, workers=3, seed=2)
+    for node in nodes:
+        scheduler.register(node)
+    time.sleep(0.2)
+    during = threading.active_count()
+    scheduler.stop()
+    assert during - before <= 3 + 1  # Pool plus the dispatcher
+    workers = {name for node in nodes for _, name in node.rounds}
+    assert 0 < len(workers) <= 3
+    assert all(node.rounds for node in nodes)
+
+
+def test_unregister_and_death_cancel_the_timer():
+    gone, dead, kept = FakeNode(1), FakeNode(2), FakeNode(3)
+    scheduler = ThreadPoolScheduler(period=PERIOD, workers=2, seed=3)
+    for node in (gone, dead, kept):
+        scheduler.register(node)
+    time.sleep(0.1)
+    scheduler.unregister(gone)
+    dead.alive = False
+    time.sleep(2 * PERIOD)  # Let rounds already submitted finish
+    counts = len(gone.rounds), len(dead.rounds), len(kept.rounds)
+    time.sleep(0.15)
+    scheduler.stop()
+    assert (len(gone.rounds), len(dead.rounds)) == counts[:2]
+    assert len(kept.rounds) > counts[2]
+
+
+def test_manual_scheduler_runs_live_nodes_only():
+    scheduler = ManualScheduler()
+    nodes = [FakeNode(i) for i in range(3)]
+    for node in nodes:
+        scheduler.register(node)
+    nodes[1].alive = False
+    scheduler.unregister(nodes[2])
+    scheduler.run_round(4)
+    assert [len(node.rounds) for node in nodes] == [4, 0, 0]
@@ -0,0 +1,264 @@
+# test_storage.py
+"""KeyStore and DurableKeyStore: the ring-range API both stores share, and reopening."""
+
+import os
+import shutil
+import threading
+
+import pytest
+
+from chord_dht import hash_key
+from chord_storage import DurableKeyStore, KeyStore, Versioned
+
+M = 16
+
+
+def key_id(key):
+    return hash_key(key, M)
+
+
+@pytest.fixture(params=['memory', 'durable'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        s = KeyStore()
+    else:
+        s = DurableKeyStore(str(tmp_path / 'node'), key_id)
+    yield s
+    s.close()
+
+
+def fill(store, count=300):
+    entries = [(f"key-{i}", i, key_id(f"key-{i}")) for i in range(count)]
+    store.put_many(entries)
+    return {key: (value, ring_id) for key, value, ring_id in entries}
+
+
+def in_range(start, end, ring_id):
+    if start == end:
+        return True
+    if start < end:
+        return start < ring_id <= end
+    return ring_id > start or ring_id <= end
+
+
+@pytest.mark.parametrize('start, end', [(1000, 40000), (50000, 9000), (0, 0), (20000, 20000)])
+def test_range_items_and_count(store, start, end):
+    expected = fill(store)
+    got = store.range_items(start, end)
+    assert {key for key, _, _ in got} == {k for k, (_, rid) in expected.items() if in_range(start, end, rid)}
+    assert all(expected[key] == (value, rid) for key, value, rid in got)
+    assert store.count_range(start, end) == len(got)
+    # Ring order from start (wrapped ranges list the ids past start first);
+    # the whole ring is listed from id 0.
+    origin = start if start != end else -1
+    order = [(rid - origin - 1) % (1 << M) for _, _, rid in got]
+    assert order == sorted(order)
+
+
+def test_range_chunk_pages_through_whole_range(store):
+    fill(store)
+    everything = store.range_items(50000, 9000)
+    paged = []
+    after = None
+    while True:
+        chunk = store.range_chunk(50000, 9000, after, limit=7)
+        if not chunk:
+            break
+        assert len(chunk) <= 7
+        paged.extend(chunk)
+        after = (chunk[-1][2], chunk[-1][0])
+    assert paged == everything
+
+
+def test_range_chunk_sees_writes_behind_and_ahead_of_cursor(store):
+    fill(store, 50)
+    first = store.range_chunk(0, 0, None, limit=10)
+    cursor = (first[-1][2], first[-1][0])
+    behind = next(k for k in ('x' + str(i) for i in range(1000)) if key_id(k) < cursor[0])
+    ahead = next(k for k in ('y' + str(i) for i in range(1000)) if key_id(k) > cursor[0])
+    store.put(behind, 'b', key_id(behind))
+    store.put(ahead, 'a', key_id(ahead))
+    rest = [key for key, _, _ in store.range_chunk(0, 0, cursor, limit=1000)]
+    assert ahead in rest and behind not in rest
+    assert len(first) + len(rest) == 51
+
+
+def test_pop_range_and_delete(store):
+    expected = fill(store)
+    popped = store.pop_range(10000, 30000)
+    assert {key for key, _, _ in popped} == {k for k, (_, rid) in expected.items() if 10000 < rid <= 30000}
+    assert store.count_range(10000, 30000) == 0
+    assert len(store) == len(expected) - len(popped)
+    key = store.range_items(30000, 10000)[0][0]
+    assert store.delete(key) and not store.delete(key)
+    assert key not in store and store.get(key) is None and store.ring_id(key) is None
+
+
+def test_put_replaces_value_and_keeps_one_index_entry(store):
+    store.put('a', 1, key_id('a'))
+    store.put('a', Versioned(5, 2), key_id('a'))
+    assert store['a'] == Versioned(5, 2)
+    assert len(store) == 1 and store.count_range(0, 0) == 1
+
+
+def test_durable_store_reopens_with_the_same_contents(tmp_path):
+    path = str(tmp_path / 'node')
+    store = DurableKeyStore(path, key_id)
+    expected = fill(store)
+    store.snapshot()
+    store.put('late', Versioned(3, 'v'), key_id('late'))
+    store.delete('key-0')
+    store.close()
+
+    reopened = DurableKeyStore(path, key_id)
+    try:
+        assert len(reopened) == len(expected)
+        assert reopened['late'] == Versioned(3, 'v')
+        assert 'key-0' not in reopened
+        assert reopened.range_items(0, 0) == sorted(reopened.range_items(0, 0), key=lambda e: (e[2], e[0]))
+        assert reopened['key-1'] == 1
+    finally:
+        reopened.close()
+
+
+def test_durable_store_replays_log_without_snapshot(tmp_path):
+    path = str(tmp_path / 'node')
+    store = DurableKeyStore(path, key_id)
+    expected = fill(store, 100)
+    store.put('key-5', Versioned(9, 'new'), key_id('key-5'))
+    store.pop_range(0, 20000)
+    store.close()
+
+    reopened = DurableKeyStore(path, key_id)
+    try:
+        live = {k for k, (_, rid) in expected.items() if not 0 < rid <= 20000}
+        assert set(reopened) == live
+        if 'key-5' in live:
+            assert reopened['key-5'] == Versioned(9, 'new')
+    finally:
+        reopened.close()
+
+
+def test_durable_store_cuts_torn_log_tail(tmp_path):
+    path = str(tmp_path / 'node')
+    store = DurableKeyStore(path, key_id)
+    store.put('a', 1, key_id('a'))
+    store.put('b', 2, key_id('b'))
+    store.close()
+    log_path = tmp_path / 'node' / 'log-0.wal'
+    whole = log_path.stat().st_size
+    with open(log_path, 'r+b') as f:
+        f.truncate(whole - 3)  # Crash in the middle of writing 'b'
+
+    reopened = DurableKeyStore(path, key_id)
+    assert reopened['a'] == 1 and 'b' not in reopened and len(reopened) == 1
+    reopened.put('c', 3, key_id('c'))  # Appends after the cut, not after the garbage
+    reopened.close()
+    again = DurableKeyStore(path, key_id)
+    try:
+        assert sorted(again.items()) == [('a', 1), ('c', 3)]
+    finally:
+        again.close()
+
+
+def disk_bytes(path, suffix):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path) if name.endswith(suffix))
+
+
+def test_durable_reopen_replays_a_bounded_log(tmp_path):
+    path = str(tmp_path / 'node')
+    store = DurableKeyStore(path, key_id, compact_bytes=4096)
+    expected = {}
+    for batch in range(150):
+        entries = [(f"key-{batch}-{i}", batch, key_id(f"key-{batch}-{i}")) for i in range(40)]
+        store.put_many(entries)
+        expected.update((key, value) for key, value, _ in entries)
+    store.close()
+    # The snapshot keeps growing; the log that reopening replays does not.
+    assert disk_bytes(path, '.dat') > 25 * 4096
+    assert disk_bytes(path, '.wal') < 3 * 4096
+
+    reopened = DurableKeyStore(path, key_id, compact_bytes=4096)
+    try:
+        assert len(reopened._overlay) < 2 * 4096 // 40
+        assert len(reopened) == len(expected)
+        assert dict(reopened.items()) == expected
+    finally:
+        reopened.close()
+
+
+def hold_compaction(store, monkeypatch):
+    """Make the store's compactor thread wait for the returned event."""
+    gate = threading.Event()
+    write = store._write_snapshot
+
+    def held(gen):
+        gate.wait(10)
+        write(gen)
+    monkeypatch.setattr(store, '_write_snapshot', held)
+    return gate
+
+
+def test_durable_writes_proceed_during_compaction(tmp_path, monkeypatch):
+    path = str(tmp_path / 'node')
+    store = DurableKeyStore(path, key_id, compact_bytes=2048)
+    gate = hold_compaction(store, monkeypatch)
+    expected = {key: value for key, (value, _) in fill(store, 100).items()}
+    assert store._compactor.is_alive()  # The batch crossed compact_bytes
+
+    store.put('key-1', Versioned(5, 'new'), key_id('key-1'))
+    store.delete('key-2')
+    store.put('extra', 1, key_id('extra'))
+    expected.update({'key-1': Versioned(5, 'new'), 'extra': 1})
+    del expected['key-2']
+    assert store._gen == 0  # Nothing installed while the compactor runs
+    assert dict(store.items()) == expected and len(store) == len(expected)
+
+    gate.set()
+    store._compactor.join()
+    store.put('after', 2, key_id('after'))  # Installs the finished snapshot
+    expected['after'] = 2
+    assert store._gen == 1 and store._frozen is None
+    assert dict(store.items()) == expected
+    store.close()
+    assert sorted(os.listdir(path)) == ['CURRENT', 'log-1.wal', 'snapshot-1.dat', 'snapshot-1.idx']
+    reopened = DurableKeyStore(path, key_id)
+    try:
+        assert dict(reopened.items()) == expected
+    finally:
+        reopened.close()
+
+
+def test_durable_store_recovers_from_a_crash_mid_compaction(tmp_path, monkeypatch):
+    path = str(tmp_path / 'node')
+    store = DurableKeyStore(path, key_id, compact_bytes=2048)
+    gate = hold_compaction(store, monkeypatch)
+    expected = {key: value for key, (value, _) in fill(store, 100).items()}
+    store.put('key-1', 'newer', key_id('key-1'))
+    store.delete('key-2')
+    expected['key-1'] = 'newer'
+    del expected['key-2']
+    # Crash: the logs are on disk, the new snapshot is half written.
+    crashed = str(tmp_path / 'crashed')
+    shutil.copytree(path, crashed)
+    with open(os.path.join(crashed, 'snapshot-1.dat'), 'wb') as f:
+        f.write(b'\x00\x00\x00\x05ke')
+    gate.set()
+    store.close()
+
+    reopened = DurableKeyStore(crashed, key_id, compact_bytes=2048)
+    try:
+        assert dict(reopened.items()) == expected and len(reopened) == len(expected)
+        assert sorted(os.listdir(crashed)) == ['log-0.wal', 'log-1.wal']
+        reopened.put('later', 3, key_id('later'))
+        expected['later'] = 3
+        reopened.snapshot()
+        gen = reopened._gen
+        assert sorted(os.listdir(crashed)) == ['CURRENT', f'log-{gen}.wal', f'snapshot-{gen}.dat', f'snapshot-{gen}.idx']
+    finally:
+        reopened.close()
+    again = DurableKeyStore(crashed, key_id)
+    try:
+        assert dict(again.items()) == expected
+    finally:
+        again.close()
@@ -0,0 +1,56 @@
+# test_versions.py
+"""Versioned writes: the newest version wins however and in whatever order copies arrive."""
+
+import random
+
+import pytest
+
+from chord_dht import DHT
+from chord_oracle import bulk_load
+from chord_scheduler import ManualScheduler
+from chord_storage import Versioned
+
+
+@pytest.fixture
+def dht():
+    random.seed(3)
+    dht = DHT(m=16, scheduler=ManualScheduler())
+    dht.add_nodes(6)
+    yield dht
+    dht.shutdown()
+
+
+def owner_of(dht, key):
+    return next(iter(dht.nodes.values())).find_successor(dht.key_id(key))
+
+
+@pytest.mark.parametrize('order', [(2, 1), (1, 2), (1, 3, 2)])
+def test_store_many_keeps_newest_version_within_a_batch(dht, order):
+    node = owner_of(dht, 'a')
+    node.store_many([('a', Versioned(v, f"v{v}"), dht.key_id('a')) for v in order])
+    assert node.data['a'] == Versioned(max(order), f"v{max(order)}")
+
+
+def test_store_many_never_rolls_back_a_newer_value(dht):
+    node = owner_of(dht, 'a')
+    node.store('a', Versioned(10, 'new'))
+    node.store_many([('a', Versioned(5, 'old'), dht.key_id('a')), ('b', Versioned(1, 'b'), dht.key_id('b'))])
+    assert node.data['a'] == Versioned(10, 'new')
+    assert node.data['b'] == Versioned(1, 'b')
+
+
+def test_bulk_load_writes_versioned_values(dht):
+    assert bulk_load(dht, {f"k{i}": i for i in range(50)}) == 50
+    for node in dht.nodes.values():
+        assert all(isinstance(node.data[k], Versioned) for k in node.data)
+    assert dht.retrieve('k7') == 7
+    dht.store('k7', 'later')
+    assert dht.retrieve('k7') == 'later'
+
+
+def test_bootstrap_items_are_versioned(dht):
+    dht.add_nodes(3, items={'x': 1, 'y': 2})
+    holders = [node for node in dht.nodes.values() if 'x' in node.data]
+    assert len(holders) == dht.r
+    assert all(isinstance(node.data['x'], Versioned) for node in holders)
+    assert dht.retrieve('y') == 2
@@ -0,0 +1,72 @@
+# test_workload.py
+"""RecordingDHT: every call that reaches the DHT lands in the trace, and replays."""
+
+import random
+
+import pytest
+
+from chord_dht import DHT
+from chord_quorum import InlineExecutor
+from chord_scheduler import ManualScheduler
+from chord_workload import GET, JOIN, LEAVE, PUT, RecordingDHT, TraceReader, build_dht, replay
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    dht = DHT(m=16, scheduler=ManualScheduler(), rng=random.Random(4), replica_executor=InlineExecutor())
+    dht.add_nodes(5)
+    dht.store('setup', 'x')
+    path = str(tmp_path / 'session.trace')
+    recorder = RecordingDHT(dht, path)
+    yield recorder, path
+    dht.shutdown()
+
+
+def operations(path):
+    trace = TraceReader(path)
+    records = list(trace)[trace.meta['setup']:]
+    return [(op, key, arg) for _, op, key, arg in records]
+
+
+def test_batch_calls_are_recorded_key_by_key(recorder):
+    recorder, path = recorder
+    recorder.multi_store({'a': 'one', 'b': 'three'})
+    assert recorder.multi_get(['a', 'missing']) == {'a': 'one', 'missing': None}
+    assert dict(recorder.iter_multi_get(['b'], batch_size=1)) == {'b': 'three'}
+    nodes = recorder.add_nodes(2, items={'c': 'cc'})
+    host_nodes = recorder.add_host('h', vnodes=2)
+    recorder.remove_host('h')
+    recorder.close()
+    assert operations(path) == [
+        (PUT, 'a', 3), (PUT, 'b', 5),
+        (GET, 'a', 1), (GET, 'missing', 0),
+        (GET, 'b', 1),
+        *[(JOIN, node.id, None) for node in nodes], (PUT, 'c', 2),
+        *[(JOIN, node.id, None) for node in host_nodes],
+        *[(LEAVE, node_id, None) for node_id in sorted(node.id for node in host_nodes)],
+    ]
+
+
+def test_unrecorded_methods_raise_instead_of_bypassing_the_trace(recorder):
+    recorder, _ = recorder
+    with pytest.raises(AttributeError, match='handoff'):
+        recorder.handoff
+    assert recorder.get_ring() == recorder.dht.get_ring()
+    assert recorder.membership is recorder.dht.membership
+    recorder.close()
+
+
+def test_recorded_trace_replays(recorder):
+    recorder, path = recorder
+    recorder.multi_store({f"k{i}": i for i in range(20)})
+    recorder.bootstrap([7, 70, 700])
+    recorder.multi_get([f"k{i}" for i in range(20)])
+    recorder.close()
+    trace = TraceReader(path)
+    dht = build_dht(trace.meta)
+    try:
+        report = replay(dht, trace)
+        assert report['operations'] == 43 and report['found_mismatches'] == 0
+        assert {7, 70, 700} <= set(dht.nodes)
+    finally:
+        dht.shutdown()